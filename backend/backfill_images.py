@@ -0,0 +1,118 @@
+"""
+生活照片图片元数据回填
+为已有图片补充宽高、文件大小、EXIF 拍摄时间与低清占位图（新上传的图片由后台任务自动提取）
+
+用法（在 backend 目录下执行）：
+    python backfill_images.py              # 只处理缺少元数据的图片
+    python backfill_images.py --all        # 重新提取全部图片
+    python backfill_images.py --dry-run    # 只统计，不写入
+
+运行中的服务会在响应缓存过期（LIFE_CACHE_TTL）后返回新数据
+"""
+
+import os
+import time
+import asyncio
+import argparse
+import logging
+from typing import Dict, List, Optional
+
+from sqlalchemy import select, update
+
+from config import WORKER_PROCESSES
+from db import AsyncSessionLocal, LifePhotoImage, init_db
+from images import extract_metadata
+from life import get_images_dir
+from media_store import parse_store_url, object_path
+from workers import run_in_process, shutdown_process_pool
+
+logger = logging.getLogger("backfill_images")
+
+# 每批提交的图片数
+COMMIT_BATCH = 50
+
+
+def image_path(url: str, photo_id: int, filename: str) -> Optional[str]:
+    """图片记录对应的本地文件（存储对象或旧版按照片目录存储的文件）"""
+    sha256 = parse_store_url(url)
+    if sha256:
+        return object_path(sha256, os.path.splitext(url)[1])
+    if url.startswith('/images/life/'):
+        return os.path.join(get_images_dir(), str(photo_id), filename)
+    return None
+
+
+async def backfill(refresh_all: bool, dry_run: bool) -> Dict[str, int]:
+    await init_db()
+
+    query = select(LifePhotoImage.url, LifePhotoImage.photo_id, LifePhotoImage.filename)
+    if not refresh_all:
+        query = query.where(LifePhotoImage.placeholder.is_(None))
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(query)).all()
+
+    # 同一文件可能被多条记录引用，只提取一次
+    paths: Dict[str, Optional[str]] = {}
+    for row in rows:
+        paths.setdefault(row.url, image_path(row.url, row.photo_id, row.filename))
+
+    counts = {'records': len(rows), 'files': len(paths), 'updated': 0, 'missing': 0, 'failed': 0}
+    logger.info(f"待处理：{counts['records']} 条记录，{counts['files']} 个文件")
+    if dry_run or not paths:
+        return counts
+
+    semaphore = asyncio.Semaphore(WORKER_PROCESSES)
+
+    async def extract(url: str, path: Optional[str]):
+        if path is None or not os.path.exists(path):
+            counts['missing'] += 1
+            logger.warning(f"文件不存在，跳过：{url}")
+            return None
+        async with semaphore:
+            try:
+                return await run_in_process(extract_metadata, path)
+            except Exception as e:
+                counts['failed'] += 1
+                logger.error(f"提取失败（{url}）: {str(e)}")
+                return None
+
+    urls = list(paths)
+    for start in range(0, len(urls), COMMIT_BATCH):
+        batch: List[str] = urls[start:start + COMMIT_BATCH]
+        results = await asyncio.gather(*[extract(url, paths[url]) for url in batch])
+        async with AsyncSessionLocal() as db:
+            for url, metadata in zip(batch, results):
+                if metadata is None:
+                    continue
+                await db.execute(
+                    update(LifePhotoImage)
+                    .where(LifePhotoImage.url == url)
+                    .values(**metadata)
+                )
+                counts['updated'] += 1
+            await db.commit()
+        logger.info(f"进度：{min(start + COMMIT_BATCH, len(urls))}/{len(urls)}")
+
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回填生活照片图片元数据")
+    parser.add_argument('--all', action='store_true', help="重新提取全部图片（默认只处理缺少元数据的图片）")
+    parser.add_argument('--dry-run', action='store_true', help="只统计待处理数量，不写入")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    started = time.perf_counter()
+    try:
+        counts = asyncio.run(backfill(args.all, args.dry_run))
+    finally:
+        shutdown_process_pool()
+    logger.info(
+        f"完成：更新 {counts['updated']} 个文件（{counts['records']} 条记录），"
+        f"缺失 {counts['missing']}，失败 {counts['failed']}，耗时 {time.perf_counter() - started:.1f} 秒"
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -5,15 +5,61 @@
 
 import os
 import re
-import shutil
+import json
+import uuid
+import time
+import base64
+import asyncio
+import logging
+import posixpath
 from datetime import datetime
-from typing import Optional, List
-from fastapi import APIRouter, HTTPException, Header, UploadFile, File, Form
+from typing import Optional, List, Dict
+from urllib.parse import unquote
+from fastapi import APIRouter, HTTPException, Header, UploadFile, File, Form, Query, Depends, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-
-from config import BLOG_API_KEY, BLOG_CONTENT_DIR, BLOG_IMAGES_DIR
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import (
+    BLOG_API_KEY, BLOG_CONTENT_DIR, BLOG_IMAGES_DIR, BLOG_INDEX_SCAN_INTERVAL,
+    BLOG_SEARCH_INDEX_PATH, BLOG_MANIFEST_PATH, BLOG_RENDER_CACHE_SIZE, BLOG_RELATED_TOP_K, BLOG_IO_WORKERS,
+    BLOG_ARCHIVE_MAX_BYTES, UPLOAD_MAX_REQUEST_BYTES,
+    SITE_URL, SITE_TITLE, SITE_DESCRIPTION, BLOG_FEED_SIZE, BLOG_FEED_CACHE_PATH
+)
+from blog_index import ArticleIndex, ArticleEntry
+from blog_search import SearchIndex, build_doc
+from blog_render import RenderCache
+from blog_related import RelatedIndex
+from blog_feeds import FeedCache, MEDIA_TYPES
+from storage import FileStorage
+from http_cache import make_etag, check_conditional, accepts_gzip
+from blog_archive import (
+    ArchiveFile, extract_archive, find_image_refs, image_candidates, rewrite_image_refs, stream_tar
+)
+from db import get_db, MediaObject, MediaRef
+from uploads import validate_image_type, save_upload
+from images import (
+    VARIANT_SIZES, variant_filename, variant_url, variant_urls, is_variant_file
+)
+from media_store import (
+    StoredImage, store_image, register_object, hash_file, add_ref, remove_refs, sync_refs, delete_objects,
+    find_store_refs, get_store_dir, object_path, object_url, existing_variants, EXT_BY_SUFFIX
+)
+from media_gc import media_collector, find_image_urls
 
 router = APIRouter(prefix="/api/blog", tags=["博客管理"])
+logger = logging.getLogger("blog")
+
+# 后台索引扫描任务
+_index_watcher: Optional[asyncio.Task] = None
+
+# 博客文件读写统一走有界线程池，不阻塞事件循环
+blog_storage = FileStorage("blog", BLOG_IO_WORKERS)
+
+# 启动时解析一次的目录路径
+_blog_dir: Optional[str] = None
+_images_dir: Optional[str] = None
 
 
 # ========== 数据模型 ==========
@@ -28,6 +74,44 @@ class ArticleMeta(BaseModel):
     cover: Optional[str] = None
 
 
+class ArticlePage(BaseModel):
+    """文章分页查询结果"""
+    items: List[ArticleMeta]
+    next_cursor: Optional[str] = None  # 下一页游标，为空表示没有更多
+
+
+class TocItem(BaseModel):
+    """目录项"""
+    level: int
+    id: str
+    title: str
+
+
+class RenderedArticle(ArticleMeta):
+    """渲染后的文章"""
+    html: str
+    toc: List[TocItem]
+    reading_time: str
+
+
+class RelatedArticle(ArticleMeta):
+    """相关文章"""
+    score: float  # 余弦相似度
+
+
+class SearchHit(ArticleMeta):
+    """搜索结果项"""
+    score: float
+    title_highlight: str  # 高亮后的标题（HTML）
+    snippet: str  # 高亮后的正文摘要（HTML）
+
+
+class SearchResult(BaseModel):
+    """搜索结果"""
+    total: int
+    items: List[SearchHit]
+
+
 class ArticleCreate(BaseModel):
     """创建文章请求"""
     slug: str
@@ -58,6 +142,26 @@ class ArticleResponse(BaseModel):
     cover: Optional[str] = None
 
 
+class ImportEntryResult(BaseModel):
+    """导入包中单个条目的处理结果"""
+    name: str  # 归档内路径
+    type: str  # article / image / other
+    status: str  # created / updated / deduplicated / skipped / failed
+    slug: Optional[str] = None
+    url: Optional[str] = None  # 图片的存储 URL
+    error: Optional[str] = None
+
+
+class ImportResult(BaseModel):
+    """批量导入结果"""
+    total: int
+    counts: Dict[str, int]  # 各状态的条目数
+    bytes: int  # 解压后的总字节数
+    elapsed: float  # 总耗时（秒）
+    bytes_per_sec: float  # 吞吐量
+    entries: List[ImportEntryResult]
+
+
 # ========== 工具函数 ==========
 
 def verify_api_key(api_key: str = Header(..., alias="X-API-Key")):
@@ -68,19 +172,28 @@ def verify_api_key(api_key: str = Header(..., alias="X-API-Key")):
 
 
 def get_blog_dir() -> str:
-    """获取博客内容目录的绝对路径"""
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    blog_dir = os.path.normpath(os.path.join(base_dir, BLOG_CONTENT_DIR))
-    os.makedirs(blog_dir, exist_ok=True)
-    return blog_dir
+    """获取博客内容目录的绝对路径（首次调用时解析并创建）"""
+    global _blog_dir
+    if _blog_dir is None:
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        _blog_dir = os.path.normpath(os.path.join(base_dir, BLOG_CONTENT_DIR))
+        os.makedirs(_blog_dir, exist_ok=True)
+    return _blog_dir
 
 
 def get_images_dir() -> str:
-    """获取博客图片目录的绝对路径"""
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    images_dir = os.path.normpath(os.path.join(base_dir, BLOG_IMAGES_DIR))
-    os.makedirs(images_dir, exist_ok=True)
-    return images_dir
+    """获取博客图片目录的绝对路径（首次调用时解析并创建）"""
+    global _images_dir
+    if _images_dir is None:
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        _images_dir = os.path.normpath(os.path.join(base_dir, BLOG_IMAGES_DIR))
+        os.makedirs(_images_dir, exist_ok=True)
+    return _images_dir
+
+
+def article_path(slug: str) -> str:
+    """文章 Markdown 文件路径"""
+    return os.path.join(get_blog_dir(), f'{slug}.md')
 
 
 def slugify(text: str) -> str:
@@ -147,6 +260,41 @@ def parse_frontmatter(content: str) -> tuple[dict, str]:
     return meta, body
 
 
+# 读取 frontmatter 时每次读取的字节数
+_HEADER_CHUNK_SIZE = 4096
+
+
+def read_frontmatter(filepath: str) -> tuple[dict, int]:
+    """
+    只读取文件头部的 frontmatter，不读取正文
+    返回 (元数据, 正文起始字节偏移)；与 parse_frontmatter 的解析结果一致
+    """
+    head = b''
+    with open(filepath, 'rb') as f:
+        while True:
+            chunk = f.read(_HEADER_CHUNK_SIZE)
+            head += chunk
+            if len(head) >= 3 and not head.startswith(b'---'):
+                return {}, 0
+            # '-' 不会出现在 UTF-8 多字节字符内部，可直接按字节查找
+            end = head.find(b'---', 3)
+            if end != -1:
+                end += 3
+                break
+            if not chunk:
+                return {}, 0
+
+    meta, _ = parse_frontmatter(head[:end].decode('utf-8'))
+    return meta, end
+
+
+def read_body(filepath: str, body_offset: int) -> str:
+    """从正文偏移处读取正文，跳过 frontmatter"""
+    with open(filepath, 'rb') as f:
+        f.seek(body_offset)
+        return f.read().decode('utf-8').strip()
+
+
 def create_frontmatter(meta: dict) -> str:
     """创建 Markdown frontmatter"""
     lines = ['---']
@@ -165,92 +313,392 @@ def create_frontmatter(meta: dict) -> str:
     return '\n'.join(lines)
 
 
+def entry_to_meta(entry: ArticleEntry) -> ArticleMeta:
+    """索引条目转换为文章元数据响应"""
+    return ArticleMeta(
+        slug=entry.slug,
+        title=entry.title,
+        date=entry.date,
+        description=entry.description,
+        tags=entry.tags,
+        cover=entry.cover
+    )
+
+
+def encode_cursor(key: tuple) -> str:
+    """将排序键编码为游标字符串"""
+    raw = json.dumps(list(key), ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """解析游标字符串"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        date, slug = json.loads(raw.decode('utf-8'))
+        return str(date), str(slug)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+
+
+async def read_article(slug: str) -> str:
+    """读取文章原文，不存在时返回 404"""
+    try:
+        return await blog_storage.read_text(article_path(slug))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="文章不存在")
+
+
+def list_validators(kind: str, entries: List[ArticleEntry]) -> tuple[str, float]:
+    """
+    文章列表的 ETag 与 Last-Modified，由各文章的文件签名计算，无需序列化响应体
+    Last-Modified 同时考虑最近一次删除，避免删除文章后仍返回 304
+    """
+    etag = make_etag(kind, [(entry.slug, entry.mtime_ns, entry.size) for entry in entries])
+    latest_ns = max([entry.mtime_ns for entry in entries] + [article_index.removed_at_ns])
+    return etag, latest_ns / 1e9
+
+
+async def article_validators(kind: str, slug: str) -> tuple[str, float]:
+    """单篇文章的 ETag 与 Last-Modified，仅 stat 文件，不读取内容；不存在时返回 404"""
+    st = await blog_storage.stat(article_path(slug))
+    if st is None:
+        raise HTTPException(status_code=404, detail="文章不存在")
+    return make_etag(kind, slug, st.st_mtime_ns, st.st_size), st.st_mtime
+
+
+async def sync_article_refs(db: AsyncSession, slug: str, body: str, cover: Optional[str]) -> None:
+    """根据正文和封面中的存储图片 URL 同步文章引用"""
+    shas = find_store_refs(body) | find_store_refs(cover or '')
+    orphans = await sync_refs(db, f"blog:{slug}", shas)
+    await db.commit()
+    await delete_objects(orphans)
+
+
+# 前端改写相对图片路径时去掉的前缀（只去掉一个）
+_RELATIVE_PREFIX_RE = re.compile(r'^\.\.?/')
+
+
+def article_image_urls(slug: str, text: str) -> set:
+    """
+    文章引用的站内图片 URL（已解码，可直接与磁盘路径比较）
+    相对路径与前端（frontend/src/lib/blog.ts）及 blog_render 的改写一致：
+    去掉开头的一个 ./ 或 ../，再拼接到 /images/blog/{slug}/ 之后
+    """
+    urls = find_image_urls(text)
+    for ref in find_image_refs(text):
+        if ref.startswith(('http', '/', 'data:')):
+            continue
+        urls.add(unquote(f"/images/blog/{slug}/{_RELATIVE_PREFIX_RE.sub('', ref, count=1)}"))
+    return urls
+
+
+def _collect_article_image_urls() -> List[str]:
+    """扫描全部文章原文（含 frontmatter）中的图片引用"""
+    blog_dir = get_blog_dir()
+    urls = set()
+    for name in os.listdir(blog_dir):
+        if name.endswith('.md'):
+            with open(os.path.join(blog_dir, name), 'r', encoding='utf-8') as f:
+                urls |= article_image_urls(name[:-3], f.read())
+    return list(urls)
+
+
+async def blog_references() -> List[str]:
+    """文章中引用的图片 URL（供回收任务对账）"""
+    return await blog_storage.run('gc_refs', _collect_article_image_urls)
+
+
+media_collector.add_root('/images/blog', get_images_dir)
+media_collector.add_source('blog', blog_references)
+
+
+# 进程内文章元数据索引
+article_index = ArticleIndex(get_blog_dir, read_frontmatter, blog_storage)
+
+# 全文搜索索引
+search_index = SearchIndex(BLOG_SEARCH_INDEX_PATH)
+
+# Markdown 渲染缓存
+render_cache = RenderCache(BLOG_RENDER_CACHE_SIZE)
+
+# 相关文章推荐
+related_index = RelatedIndex(BLOG_RELATED_TOP_K)
+
+# RSS / Atom / sitemap
+feed_cache = FeedCache(
+    BLOG_FEED_CACHE_PATH, blog_storage, SITE_URL, SITE_TITLE, SITE_DESCRIPTION, BLOG_FEED_SIZE
+)
+
+
+def _sync_search_index(slug: str, entry: Optional[ArticleEntry]) -> None:
+    """文章变更时增量更新搜索索引，文件未变化则跳过分词"""
+    if entry is None:
+        search_index.remove(slug)
+        return
+    if search_index.signature(slug) == entry.signature:
+        return
+
+    # 回调在存储线程中执行，直接使用同步读取；frontmatter 已解析过，只读正文
+    body = blog_storage.run_sync('read_body', read_body, article_path(slug), entry.body_offset)
+
+    search_index.upsert(build_doc(
+        slug, entry.signature, entry.title, entry.description, entry.tags, body
+    ))
+
+
+def _sync_related_index(slug: str, entry: Optional[ArticleEntry]) -> None:
+    """文章变更时增量更新相关文章（在搜索索引之后执行，复用其词频）"""
+    if not related_index.ready:
+        return
+    if entry is None:
+        related_index.remove(slug)
+        return
+    terms = search_index.terms(slug)
+    if terms is not None:
+        related_index.upsert(slug, terms, entry.tags)
+
+
+def _sync_feeds(slug: str, entry: Optional[ArticleEntry]) -> None:
+    """文章变更时只重新生成该文章的订阅源片段"""
+    if entry is None:
+        feed_cache.remove(slug)
+    else:
+        feed_cache.upsert(entry)
+
+
+article_index.subscribe(_sync_search_index)
+article_index.subscribe(_sync_related_index)
+article_index.subscribe(_sync_feeds)
+
+
+def _save_indexes() -> None:
+    """持久化文章清单与搜索索引（均只在有变更时写入）"""
+    article_index.save_manifest(BLOG_MANIFEST_PATH)
+    search_index.save()
+    feed_cache.save()
+
+
+def _load_indexes() -> None:
+    """
+    启动时恢复索引：先加载清单与搜索索引，再扫描目录
+    只有签名变化的文件会被重新读取；清单中未进入搜索索引的文章补做分词
+    """
+    article_index.load_manifest(BLOG_MANIFEST_PATH)
+    search_index.load()
+    feed_cache.load()
+    article_index.refresh()
+    search_index.retain(article_index.slugs())
+    entries = article_index.latest()
+    for entry in entries:
+        _sync_search_index(entry.slug, entry)
+    related_index.load(
+        (entry.slug, search_index.terms(entry.slug) or {}, entry.tags) for entry in entries
+    )
+    feed_cache.sync(entries)
+
+
+# ========== 生命周期 ==========
+
+async def _watch_index():
+    """定时扫描博客目录，同步绕过 API 的文件改动"""
+    while True:
+        await asyncio.sleep(BLOG_INDEX_SCAN_INTERVAL)
+        try:
+            await blog_storage.run('index_refresh', article_index.refresh)
+            await blog_storage.run('index_save', _save_indexes)
+        except Exception as e:
+            logger.error(f"文章索引刷新失败: {str(e)}")
+
+
+async def startup_event():
+    """服务启动时构建文章索引并启动目录监听"""
+    global _index_watcher
+    # 目录只在启动时解析并创建一次
+    await blog_storage.run('mkdir', get_blog_dir)
+    await blog_storage.run('mkdir', get_images_dir)
+    await blog_storage.run('index_load', _load_indexes)
+    await blog_storage.run('index_save', _save_indexes)
+    logger.info(f"文章索引构建完成，共 {len(article_index)} 篇")
+    if BLOG_INDEX_SCAN_INTERVAL > 0:
+        _index_watcher = asyncio.create_task(_watch_index())
+
+
+async def shutdown_event():
+    """服务关闭时停止目录监听"""
+    global _index_watcher
+    if _index_watcher:
+        _index_watcher.cancel()
+        _index_watcher = None
+    await blog_storage.run('index_save', _save_indexes)
+    blog_storage.shutdown()
+
+
 # ========== API 路由 ==========
 
 @router.get("/latest", response_model=List[ArticleMeta])
-async def get_latest_articles(limit: int = 3):
+async def get_latest_articles(request: Request, response: Response, limit: int = 3):
     """获取最新文章（公开接口，无需认证）"""
-    blog_dir = get_blog_dir()
-    articles = []
+    if not article_index.loaded:
+        await blog_storage.run('index_refresh', article_index.ensure_loaded)
 
-    if not os.path.exists(blog_dir):
-        return articles
+    # 索引已按日期降序维护，直接取前N篇
+    entries = article_index.latest(limit)
+    not_modified = check_conditional(request, response, *list_validators('latest', entries))
+    if not_modified:
+        return not_modified
 
-    for filename in os.listdir(blog_dir):
-        if not filename.endswith('.md'):
-            continue
+    return [entry_to_meta(entry) for entry in entries]
 
-        filepath = os.path.join(blog_dir, filename)
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
 
-        meta, _ = parse_frontmatter(content)
-        slug = filename[:-3]
+async def feed_response(request: Request, kind: str) -> Response:
+    """返回订阅源 / sitemap，支持条件请求与 gzip"""
+    if not article_index.loaded:
+        await blog_storage.run('index_refresh', article_index.ensure_loaded)
 
-        articles.append(ArticleMeta(
-            slug=slug,
-            title=meta.get('title', slug),
-            date=meta.get('date', ''),
-            description=meta.get('description', ''),
-            tags=meta.get('tags', []),
-            cover=meta.get('cover')
-        ))
+    document = feed_cache.cached(kind)
+    if document is None:
+        document = await blog_storage.run(
+            'feed_build', feed_cache.document, kind, article_index.latest, article_index.removed_at_ns
+        )
 
-    # 按日期降序排序，取前N篇
-    articles.sort(key=lambda x: x.date, reverse=True)
-    return articles[:limit]
+    response = Response(media_type=MEDIA_TYPES[kind], headers={'Vary': 'Accept-Encoding'})
+    not_modified = check_conditional(
+        request, response, document.etag, document.last_modified, cache_control='public, max-age=300'
+    )
+    if not_modified:
+        not_modified.headers['Vary'] = 'Accept-Encoding'
+        return not_modified
 
+    if accepts_gzip(request):
+        response.body = document.gzipped
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response.body = document.body
+    response.headers['Content-Length'] = str(len(response.body))
+    return response
 
-@router.get("/articles", response_model=List[ArticleMeta])
-async def list_articles(api_key: str = Header(..., alias="X-API-Key")):
-    """获取所有文章列表"""
-    verify_api_key(api_key)
 
-    blog_dir = get_blog_dir()
-    articles = []
+@router.get("/rss.xml")
+async def get_rss(request: Request):
+    """RSS 2.0 订阅源（公开接口，无需认证）"""
+    return await feed_response(request, 'rss')
 
-    if not os.path.exists(blog_dir):
-        return articles
 
-    for filename in os.listdir(blog_dir):
-        if not filename.endswith('.md'):
-            continue
+@router.get("/atom.xml")
+async def get_atom(request: Request):
+    """Atom 订阅源（公开接口，无需认证）"""
+    return await feed_response(request, 'atom')
+
+
+@router.get("/sitemap.xml")
+async def get_sitemap(request: Request):
+    """站点地图（公开接口，无需认证）"""
+    return await feed_response(request, 'sitemap')
 
-        filepath = os.path.join(blog_dir, filename)
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
 
-        meta, _ = parse_frontmatter(content)
-        slug = filename[:-3]  # 移除 .md 后缀
+@router.get("/query", response_model=ArticlePage)
+async def query_articles(
+    tag: List[str] = Query(default=[]),
+    match: str = Query("any", pattern="^(any|all)$"),
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=100)
+):
+    """
+    按标签、日期范围分页查询文章（公开接口，无需认证）
+
+    - tag: 可传多个，match=any 包含任一标签，match=all 同时包含全部标签
+    - date_from / date_to: 日期闭区间，格式 YYYY-MM-DD
+    - cursor: 上一页返回的 next_cursor
+    """
+    if not article_index.loaded:
+        await blog_storage.run('index_refresh', article_index.ensure_loaded)
+
+    after = decode_cursor(cursor) if cursor else None
+    entries, next_key = article_index.query(
+        tags=tag,
+        match_all=match == "all",
+        date_from=date_from,
+        date_to=date_to,
+        after=after,
+        limit=limit
+    )
+
+    return ArticlePage(
+        items=[entry_to_meta(entry) for entry in entries],
+        next_cursor=encode_cursor(next_key) if next_key else None
+    )
+
+
+@router.get("/tags", response_model=Dict[str, int])
+async def list_tags():
+    """获取所有标签及文章数（公开接口，无需认证）"""
+    if not article_index.loaded:
+        await blog_storage.run('index_refresh', article_index.ensure_loaded)
+
+    return dict(sorted(article_index.tags().items(), key=lambda item: (item[0].lower(), item[0])))
 
-        articles.append(ArticleMeta(
-            slug=slug,
-            title=meta.get('title', slug),
-            date=meta.get('date', ''),
-            description=meta.get('description', ''),
-            tags=meta.get('tags', []),
-            cover=meta.get('cover')
+
+@router.get("/search", response_model=SearchResult)
+async def search_articles(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+    offset: int = Query(0, ge=0)
+):
+    """全文搜索文章（公开接口，无需认证）"""
+    if not article_index.loaded:
+        await blog_storage.run('index_refresh', article_index.ensure_loaded)
+
+    total, hits = search_index.search(q, limit=limit, offset=offset)
+
+    items = []
+    for hit in hits:
+        entry = article_index.get(hit['slug'])
+        if entry is None:
+            continue
+        items.append(SearchHit(
+            **entry_to_meta(entry).model_dump(),
+            score=hit['score'],
+            title_highlight=hit['title_highlight'],
+            snippet=hit['snippet']
         ))
 
-    # 按日期降序排序
-    articles.sort(key=lambda x: x.date, reverse=True)
-    return articles
+    return SearchResult(total=total, items=items)
 
 
-@router.get("/articles/{slug}", response_model=ArticleResponse)
-async def get_article(slug: str, api_key: str = Header(..., alias="X-API-Key")):
-    """获取单篇文章"""
+@router.get("/articles", response_model=List[ArticleMeta])
+async def list_articles(request: Request, response: Response, api_key: str = Header(..., alias="X-API-Key")):
+    """获取所有文章列表"""
     verify_api_key(api_key)
 
-    blog_dir = get_blog_dir()
-    filepath = os.path.join(blog_dir, f'{slug}.md')
+    if not article_index.loaded:
+        await blog_storage.run('index_refresh', article_index.ensure_loaded)
 
-    if not os.path.exists(filepath):
-        raise HTTPException(status_code=404, detail="文章不存在")
+    entries = article_index.latest()
+    not_modified = check_conditional(request, response, *list_validators('articles', entries))
+    if not_modified:
+        return not_modified
 
-    with open(filepath, 'r', encoding='utf-8') as f:
-        content = f.read()
+    return [entry_to_meta(entry) for entry in entries]
+
+
+@router.get("/articles/{slug}", response_model=ArticleResponse)
+async def get_article(
+    slug: str,
+    request: Request,
+    response: Response,
+    api_key: str = Header(..., alias="X-API-Key")
+):
+    """获取单篇文章"""
+    verify_api_key(api_key)
 
+    not_modified = check_conditional(request, response, *await article_validators('article', slug))
+    if not_modified:
+        return not_modified
+
+    content = await read_article(slug)
     meta, body = parse_frontmatter(content)
 
     return ArticleResponse(
@@ -264,17 +712,58 @@ async def get_article(slug: str, api_key: str = Header(..., alias="X-API-Key")):
     )
 
 
+@router.get("/articles/{slug}/html", response_model=RenderedArticle)
+async def get_rendered_article(slug: str, request: Request, response: Response):
+    """获取渲染为 HTML 的文章，附带目录和阅读时间（公开接口，无需认证）"""
+    not_modified = check_conditional(request, response, *await article_validators('html', slug))
+    if not_modified:
+        return not_modified
+
+    content = await read_article(slug)
+    meta, body = parse_frontmatter(content)
+    rendered = await render_cache.render(slug, body)
+
+    return RenderedArticle(
+        slug=slug,
+        title=meta.get('title', slug),
+        date=meta.get('date', ''),
+        description=meta.get('description', ''),
+        tags=meta.get('tags', []),
+        cover=meta.get('cover'),
+        html=rendered['html'],
+        toc=rendered['toc'],
+        reading_time=rendered['reading_time']
+    )
+
+
+@router.get("/articles/{slug}/related", response_model=List[RelatedArticle])
+async def get_related_articles(slug: str, limit: int = Query(BLOG_RELATED_TOP_K, ge=1, le=BLOG_RELATED_TOP_K)):
+    """获取相关文章（预先计算，公开接口，无需认证）"""
+    if not article_index.loaded:
+        await blog_storage.run('index_refresh', article_index.ensure_loaded)
+
+    neighbors = related_index.related(slug, limit)
+    if neighbors is None:
+        raise HTTPException(status_code=404, detail="文章不存在")
+
+    results = []
+    for other, score in neighbors:
+        entry = article_index.get(other)
+        if entry is not None:
+            results.append(RelatedArticle(**entry_to_meta(entry).model_dump(), score=score))
+    return results
+
+
 @router.post("/articles", response_model=ArticleResponse)
-async def create_article(article: ArticleCreate, api_key: str = Header(..., alias="X-API-Key")):
+async def create_article(
+    article: ArticleCreate,
+    api_key: str = Header(..., alias="X-API-Key"),
+    db: AsyncSession = Depends(get_db)
+):
     """创建新文章"""
     verify_api_key(api_key)
 
-    blog_dir = get_blog_dir()
     slug = slugify(article.slug)
-    filepath = os.path.join(blog_dir, f'{slug}.md')
-
-    if os.path.exists(filepath):
-        raise HTTPException(status_code=400, detail="文章已存在，请使用不同的 slug")
 
     # 创建 frontmatter
     date = datetime.now().strftime('%Y-%m-%d')
@@ -291,14 +780,15 @@ async def create_article(article: ArticleCreate, api_key: str = Header(..., alia
     frontmatter = create_frontmatter(meta)
     full_content = frontmatter + article.content
 
-    # 写入文件
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write(full_content)
+    # 写入文件（原子写入，文件已存在时不覆盖）
+    if not await blog_storage.create_text(article_path(slug), full_content):
+        raise HTTPException(status_code=400, detail="文章已存在，请使用不同的 slug")
+
+    # 更新文章索引（同时触发搜索索引增量更新）
+    await blog_storage.run('index_put', article_index.put, slug)
 
-    # 创建文章图片目录
-    images_dir = get_images_dir()
-    article_images_dir = os.path.join(images_dir, slug)
-    os.makedirs(article_images_dir, exist_ok=True)
+    # 记录文章引用的存储图片
+    await sync_article_refs(db, slug, article.content, article.cover)
 
     return ArticleResponse(
         slug=slug,
@@ -312,20 +802,17 @@ async def create_article(article: ArticleCreate, api_key: str = Header(..., alia
 
 
 @router.put("/articles/{slug}", response_model=ArticleResponse)
-async def update_article(slug: str, article: ArticleUpdate, api_key: str = Header(..., alias="X-API-Key")):
+async def update_article(
+    slug: str,
+    article: ArticleUpdate,
+    api_key: str = Header(..., alias="X-API-Key"),
+    db: AsyncSession = Depends(get_db)
+):
     """更新文章"""
     verify_api_key(api_key)
 
-    blog_dir = get_blog_dir()
-    filepath = os.path.join(blog_dir, f'{slug}.md')
-
-    if not os.path.exists(filepath):
-        raise HTTPException(status_code=404, detail="文章不存在")
-
     # 读取现有文章
-    with open(filepath, 'r', encoding='utf-8') as f:
-        content = f.read()
-
+    content = await read_article(slug)
     meta, body = parse_frontmatter(content)
 
     # 更新字段
@@ -344,9 +831,14 @@ async def update_article(slug: str, article: ArticleUpdate, api_key: str = Heade
     frontmatter = create_frontmatter(meta)
     full_content = frontmatter + body
 
-    # 写入文件
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write(full_content)
+    # 写入文件（先写临时文件再原子替换，读者不会读到写了一半的文章）
+    await blog_storage.write_text(article_path(slug), full_content)
+
+    # 更新文章索引（同时触发搜索索引增量更新）
+    await blog_storage.run('index_put', article_index.put, slug)
+
+    # 同步文章引用的存储图片，不再被引用的图片引用计数减一
+    await sync_article_refs(db, slug, body, meta.get('cover'))
 
     return ArticleResponse(
         slug=slug,
@@ -360,24 +852,27 @@ async def update_article(slug: str, article: ArticleUpdate, api_key: str = Heade
 
 
 @router.delete("/articles/{slug}")
-async def delete_article(slug: str, api_key: str = Header(..., alias="X-API-Key")):
+async def delete_article(
+    slug: str,
+    api_key: str = Header(..., alias="X-API-Key"),
+    db: AsyncSession = Depends(get_db)
+):
     """删除文章"""
     verify_api_key(api_key)
 
-    blog_dir = get_blog_dir()
-    filepath = os.path.join(blog_dir, f'{slug}.md')
-
-    if not os.path.exists(filepath):
+    # 删除文章文件
+    if not await blog_storage.remove(article_path(slug)):
         raise HTTPException(status_code=404, detail="文章不存在")
+    await blog_storage.run('index_remove', article_index.remove, slug)
 
-    # 删除文章文件
-    os.remove(filepath)
+    # 释放文章对存储图片的引用
+    orphans = await remove_refs(db, f"blog:{slug}")
+    orphans += await remove_refs(db, f"blog_upload:{slug}")
+    await db.commit()
+    await delete_objects(orphans)
 
-    # 删除文章图片目录（如果存在）
-    images_dir = get_images_dir()
-    article_images_dir = os.path.join(images_dir, slug)
-    if os.path.exists(article_images_dir):
-        shutil.rmtree(article_images_dir)
+    # 旧版文章图片目录交由回收任务删除（仍被其他文章引用的图片会保留）
+    media_collector.enqueue(os.path.join(get_images_dir(), slug))
 
     return {"success": True, "message": f"文章 '{slug}' 已删除"}
 
@@ -386,22 +881,16 @@ async def delete_article(slug: str, api_key: str = Header(..., alias="X-API-Key"
 async def upload_image(
     slug: str,
     file: UploadFile = File(...),
-    api_key: str = Header(..., alias="X-API-Key")
+    api_key: str = Header(..., alias="X-API-Key"),
+    db: AsyncSession = Depends(get_db)
 ):
     """上传文章图片"""
     verify_api_key(api_key)
 
     # 验证文件类型
-    allowed_types = ['image/jpeg', 'image/png', 'image/gif', 'image/webp']
-    if file.content_type not in allowed_types:
-        raise HTTPException(status_code=400, detail="不支持的图片格式，仅支持 JPEG、PNG、GIF、WebP")
-
-    # 确保图片目录存在
-    images_dir = get_images_dir()
-    article_images_dir = os.path.join(images_dir, slug)
-    os.makedirs(article_images_dir, exist_ok=True)
+    validate_image_type(file)
 
-    # 生成安全的文件名
+    # 生成安全的文件名（仅用于展示，实际按内容哈希存储）
     filename = file.filename
     if filename:
         # 移除不安全字符
@@ -410,57 +899,377 @@ async def upload_image(
         ext = file.content_type.split('/')[-1]
         filename = f"image_{datetime.now().strftime('%Y%m%d%H%M%S')}.{ext}"
 
-    filepath = os.path.join(article_images_dir, filename)
+    # 流式保存到内容寻址存储（重复内容不会重复占用空间）
+    stored = await store_image(db, file)
+    await add_ref(db, stored.sha256, f"blog_upload:{slug}", filename)
+    await db.commit()
 
-    # 保存文件
-    with open(filepath, 'wb') as f:
-        content = await file.read()
-        f.write(content)
-
-    # 返回图片 URL
-    image_url = f"/images/blog/{slug}/{filename}"
+    # 返回图片 URL（内容不变则 URL 不变，可永久缓存）
+    image_url = stored.url
 
     return {
         "success": True,
         "filename": filename,
         "url": image_url,
+        "size": stored.size,
+        "sha256": stored.sha256,
+        "deduplicated": not stored.created,
+        "variants": variant_urls(image_url),
+        "job_id": stored.job_id,
         "markdown": f"![{filename}]({image_url})"
     }
 
 
 @router.get("/articles/{slug}/images")
-async def list_images(slug: str, api_key: str = Header(..., alias="X-API-Key")):
+async def list_images(
+    slug: str,
+    api_key: str = Header(..., alias="X-API-Key"),
+    db: AsyncSession = Depends(get_db)
+):
     """获取文章的所有图片"""
     verify_api_key(api_key)
 
-    images_dir = get_images_dir()
-    article_images_dir = os.path.join(images_dir, slug)
-
-    if not os.path.exists(article_images_dir):
-        return {"images": []}
-
     images = []
-    for filename in os.listdir(article_images_dir):
-        if filename.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.webp')):
-            images.append({
-                "filename": filename,
-                "url": f"/images/blog/{slug}/{filename}"
-            })
+
+    # 旧版按文章目录存储的图片
+    files = set(await blog_storage.listdir(os.path.join(get_images_dir(), slug)))
+    if files:
+        for filename in sorted(files):
+            if is_variant_file(filename):
+                continue
+            if filename.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.webp')):
+                url = f"/images/blog/{slug}/{filename}"
+                images.append({
+                    "filename": filename,
+                    "url": url,
+                    "variants": {
+                        variant: variant_url(url, variant)
+                        for variant in VARIANT_SIZES
+                        if variant_filename(filename, variant) in files
+                    }
+                })
+
+    # 内容寻址存储中的图片
+    result = await db.execute(
+        select(MediaRef.filename, MediaObject.sha256, MediaObject.ext)
+        .join(MediaObject, MediaObject.sha256 == MediaRef.sha256)
+        .where(MediaRef.owner == f"blog_upload:{slug}")
+        .order_by(MediaRef.created_at)
+    )
+    rows = result.all()
+    variants = await blog_storage.run(
+        'stat', lambda: [existing_variants(sha256, ext) for _, sha256, ext in rows]
+    )
+    for (filename, sha256, ext), found in zip(rows, variants):
+        images.append({
+            "filename": filename,
+            "url": object_url(sha256, ext),
+            "variants": found
+        })
 
     return {"images": images}
 
 
 @router.delete("/articles/{slug}/images/{filename}")
-async def delete_image(slug: str, filename: str, api_key: str = Header(..., alias="X-API-Key")):
+async def delete_image(
+    slug: str,
+    filename: str,
+    api_key: str = Header(..., alias="X-API-Key"),
+    db: AsyncSession = Depends(get_db)
+):
     """删除文章图片"""
     verify_api_key(api_key)
 
-    images_dir = get_images_dir()
-    filepath = os.path.join(images_dir, slug, filename)
+    filepath = os.path.join(get_images_dir(), slug, filename)
 
-    if not os.path.exists(filepath):
+    # 旧版图片交由回收任务删除；若正文仍引用该图片，文件会保留
+    if await blog_storage.exists(filepath):
+        media_collector.enqueue(filepath)
+        return {"success": True, "message": f"图片 '{filename}' 已删除"}
+
+    # 存储图片释放上传引用；若正文仍引用该图片，文件会保留
+    result = await db.execute(
+        select(MediaRef.id)
+        .where(MediaRef.owner == f"blog_upload:{slug}")
+        .where(MediaRef.filename == filename)
+    )
+    if result.first() is None:
         raise HTTPException(status_code=404, detail="图片不存在")
 
-    os.remove(filepath)
+    orphans = await remove_refs(db, f"blog_upload:{slug}", filename=filename)
+    await db.commit()
+    await delete_objects(orphans)
 
     return {"success": True, "message": f"图片 '{filename}' 已删除"}
+
+
+# ========== 批量导入 / 导出 ==========
+
+def _parse_import_article(path: str) -> tuple[dict, str]:
+    """读取并校验导入包中的文章"""
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    meta, body = parse_frontmatter(content)
+    if not meta:
+        raise ValueError("缺少 frontmatter")
+    if not meta.get('title'):
+        raise ValueError("frontmatter 缺少 title")
+    return meta, body
+
+
+def _image_resolver(slug: str, article_dir: str, images: dict):
+    """返回将文章中的图片路径解析为导入包内图片的函数"""
+    def resolve(ref: str) -> Optional[str]:
+        for candidate in image_candidates(ref, slug, article_dir):
+            if candidate in images:
+                return candidate
+        return None
+    return resolve
+
+
+@router.post("/import", response_model=ImportResult)
+async def import_articles(
+    file: UploadFile = File(...),
+    overwrite: bool = Form(False),
+    api_key: str = Header(..., alias="X-API-Key"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    批量导入文章与图片（zip / tar 归档）
+    文章并行解析与写入，图片并行计算哈希后存入内容寻址存储，数据库变更在同一事务中提交。
+    已存在的文章默认跳过，overwrite 为 true 时覆盖
+    """
+    verify_api_key(api_key)
+    started = time.perf_counter()
+
+    if not article_index.loaded:
+        await blog_storage.run('index_refresh', article_index.ensure_loaded)
+
+    # 临时目录与存储目录位于同一文件系统，图片可直接重命名入库
+    work_dir = os.path.join(get_store_dir(), '.incoming', f"import-{uuid.uuid4().hex}")
+    files: List[ArchiveFile] = []
+    results: List[ImportEntryResult] = []
+    try:
+        archive_path = os.path.join(work_dir, 'archive')
+        await save_upload(file, archive_path, max_bytes=UPLOAD_MAX_REQUEST_BYTES)
+        try:
+            files, skipped = await blog_storage.run(
+                'extract', extract_archive, archive_path, os.path.join(work_dir, 'files'), BLOG_ARCHIVE_MAX_BYTES
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        results.extend(ImportEntryResult(**item) for item in skipped)
+
+        articles = [f for f in files if f.is_article]
+        images = {f.name: f for f in files if f.is_image}
+
+        # 1. 并行读取并校验文章
+        parsed = await asyncio.gather(
+            *(blog_storage.run('read', _parse_import_article, f.path) for f in articles),
+            return_exceptions=True
+        )
+        accepted = []  # (归档文件, slug, meta, body, 是否已存在)
+        for f, item in zip(articles, parsed):
+            slug = slugify(posixpath.splitext(posixpath.basename(f.name))[0])
+            if isinstance(item, Exception):
+                error = str(item) if isinstance(item, ValueError) else f"读取失败: {str(item)}"
+                results.append(ImportEntryResult(name=f.name, type='article', status='failed', slug=slug, error=error))
+            elif not slug or any(slug == a[1] for a in accepted):
+                results.append(ImportEntryResult(name=f.name, type='article', status='failed', slug=slug, error="slug 为空或重复"))
+            elif slug in article_index and not overwrite:
+                results.append(ImportEntryResult(name=f.name, type='article', status='skipped', slug=slug, error="文章已存在"))
+            else:
+                meta, body = item
+                accepted.append((f, slug, meta, body, slug in article_index))
+
+        # 2. 需要入库的图片：文章引用的图片，以及 images/{slug}/ 目录下的图片
+        wanted = set()
+        uploads: Dict[str, List[str]] = {}  # slug -> 作为文章上传图片登记的图片
+        slugs = {slug for _, slug, _, _, _ in accepted}
+        for f, slug, meta, body, _ in accepted:
+            resolve = _image_resolver(slug, posixpath.dirname(f.name), images)
+            for ref in find_image_refs(body) + [meta.get('cover') or '']:
+                name = resolve(ref) if ref else None
+                if name:
+                    wanted.add(name)
+        for name in images:
+            parts = name.split('/')
+            if len(parts) >= 3 and parts[-3] == 'images' and parts[-2] in slugs:
+                uploads.setdefault(parts[-2], []).append(name)
+                wanted.add(name)
+        for name in sorted(set(images) - wanted):
+            results.append(ImportEntryResult(name=name, type='image', status='skipped', error="未被任何文章引用"))
+
+        # 3. 并行计算哈希，再依次登记到存储（同一数据库会话不可并发）
+        wanted_names = sorted(wanted)
+        hashes = await asyncio.gather(
+            *(blog_storage.run('hash', hash_file, images[name].path) for name in wanted_names),
+            return_exceptions=True
+        )
+        stored: Dict[str, StoredImage] = {}
+        for name, item in zip(wanted_names, hashes):
+            if isinstance(item, Exception):
+                results.append(ImportEntryResult(name=name, type='image', status='failed', error=str(item)))
+                continue
+            sha256, size = item
+            ext = EXT_BY_SUFFIX[posixpath.splitext(name)[1].lower()]
+            image = await register_object(db, images[name].path, sha256, size, ext)
+            stored[name] = image
+            results.append(ImportEntryResult(
+                name=name,
+                type='image',
+                status='created' if image.created else 'deduplicated',
+                url=image.url
+            ))
+
+        # 4. 图片路径改写为存储 URL 后并行写入文章
+        today = datetime.now().strftime('%Y-%m-%d')
+        prepared = []
+        for f, slug, meta, body, exists in accepted:
+            resolve = _image_resolver(slug, posixpath.dirname(f.name), stored)
+
+            def to_url(ref: str, resolve=resolve) -> Optional[str]:
+                name = resolve(ref)
+                return stored[name].url if name else None
+
+            body = rewrite_image_refs(body, to_url)
+            if meta.get('cover'):
+                meta['cover'] = to_url(meta['cover']) or meta['cover']
+            meta.setdefault('date', today)
+            prepared.append((f, slug, meta, body, exists))
+
+        writes = await asyncio.gather(
+            *(
+                blog_storage.write_text(article_path(slug), create_frontmatter(meta) + body)
+                for _, slug, meta, body, _ in prepared
+            ),
+            return_exceptions=True
+        )
+        written = []
+        for (f, slug, meta, body, exists), error in zip(prepared, writes):
+            if isinstance(error, Exception):
+                results.append(ImportEntryResult(name=f.name, type='article', status='failed', slug=slug, error=str(error)))
+            else:
+                written.append((f, slug, meta, body, exists))
+
+        # 5. 更新索引与图片引用，一次提交
+        await asyncio.gather(
+            *(blog_storage.run('index_put', article_index.put, slug) for _, slug, _, _, _ in written)
+        )
+        orphans = []
+        for f, slug, meta, body, exists in written:
+            for name in uploads.get(slug, []):
+                if name in stored:
+                    await add_ref(db, stored[name].sha256, f"blog_upload:{slug}", posixpath.basename(name))
+            shas = find_store_refs(body) | find_store_refs(meta.get('cover') or '')
+            orphans += await sync_refs(db, f"blog:{slug}", shas)
+            results.append(ImportEntryResult(
+                name=f.name, type='article', status='updated' if exists else 'created', slug=slug
+            ))
+
+        # 所属文章写入失败、未被引用的新图片不保留
+        unused = [image for image in stored.values() if image.created]
+        if unused:
+            result = await db.execute(
+                select(MediaObject)
+                .where(MediaObject.sha256.in_([image.sha256 for image in unused]))
+                .where(MediaObject.ref_count <= 0)
+            )
+            for obj in result.scalars().all():
+                orphans.append((obj.sha256, obj.ext))
+                await db.delete(obj)
+
+        await db.commit()
+        await delete_objects(orphans)
+    finally:
+        await blog_storage.rmtree(work_dir)
+
+    elapsed = time.perf_counter() - started
+    total_bytes = sum(f.size for f in files)
+    rate = total_bytes / elapsed if elapsed > 0 else 0.0
+    counts: Dict[str, int] = {}
+    for item in results:
+        counts[item.status] = counts.get(item.status, 0) + 1
+    logger.info(
+        f"导入完成：{len(results)} 个条目 {counts}，{total_bytes} 字节，"
+        f"{elapsed * 1000:.1f} ms，{rate / 1024 / 1024:.2f} MB/s"
+    )
+
+    return ImportResult(
+        total=len(results),
+        counts=counts,
+        bytes=total_bytes,
+        elapsed=round(elapsed, 3),
+        bytes_per_sec=round(rate, 1),
+        entries=results
+    )
+
+
+def _list_legacy_images(slugs: List[str]) -> List[tuple[str, str]]:
+    """旧版按文章目录存储的图片，返回 (slug, 文件名)"""
+    images_dir = get_images_dir()
+    found = []
+    for slug in slugs:
+        article_images_dir = os.path.join(images_dir, slug)
+        if not os.path.isdir(article_images_dir):
+            continue
+        for filename in sorted(os.listdir(article_images_dir)):
+            if not is_variant_file(filename):
+                found.append((slug, filename))
+    return found
+
+
+@router.get("/export")
+async def export_articles(
+    api_key: str = Header(..., alias="X-API-Key"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    导出全部文章与图片为 tar 归档（流式发送，可直接用于导入）
+    布局：{slug}.md 与 images/{slug}/{文件名}
+    """
+    verify_api_key(api_key)
+
+    if not article_index.loaded:
+        await blog_storage.run('index_refresh', article_index.ensure_loaded)
+
+    entries = article_index.latest()
+    members: List[tuple[str, str]] = []
+    seen = set()
+
+    def add(arcname: str, path: str) -> None:
+        if arcname not in seen:
+            seen.add(arcname)
+            members.append((arcname, path))
+
+    for entry in entries:
+        add(f"{entry.slug}.md", article_path(entry.slug))
+
+    legacy = await blog_storage.run('listdir', _list_legacy_images, [entry.slug for entry in entries])
+    for slug, filename in legacy:
+        add(f"images/{slug}/{filename}", os.path.join(get_images_dir(), slug, filename))
+
+    # 存储中的图片：文章上传的图片保留原文件名，仅被正文引用的图片以哈希命名
+    result = await db.execute(
+        select(MediaRef.owner, MediaRef.filename, MediaObject.sha256, MediaObject.ext)
+        .join(MediaObject, MediaObject.sha256 == MediaRef.sha256)
+        .where(MediaRef.owner.like('blog%'))
+        .order_by(MediaRef.owner.desc(), MediaRef.created_at)  # blog_upload: 排在 blog: 之前
+    )
+    exported = set()  # (slug, sha256)
+    for owner, filename, sha256, ext in result.all():
+        kind, slug = owner.split(':', 1)
+        if kind not in ('blog', 'blog_upload') or (slug, sha256) in exported:
+            continue
+        exported.add((slug, sha256))
+        name = filename or f"{sha256}{ext}"
+        arcname = f"images/{slug}/{name}"
+        if arcname in seen:
+            arcname = f"images/{slug}/{sha256[:12]}-{name}"
+        add(arcname, object_path(sha256, ext))
+
+    return StreamingResponse(
+        stream_tar(members),
+        media_type='application/x-tar',
+        headers={'Content-Disposition': f'attachment; filename="blog-export-{datetime.now().strftime("%Y%m%d")}.tar"'}
+    )
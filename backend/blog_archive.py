@@ -0,0 +1,241 @@
+"""
+博客文章批量导入 / 导出
+- 导入包支持 zip 与 tar（含 .tar.gz 等压缩格式），目录布局：
+    {slug}.md                 文章（可位于任意子目录，文件名即 slug）
+    images/{slug}/{文件名}     文章图片
+- 文章中引用的相对路径图片会被存入内容寻址存储，并改写为存储 URL
+- 导出为流式 tar，边打包边发送，不在内存中构建整个归档
+"""
+
+import os
+import re
+import asyncio
+import logging
+import tarfile
+import zipfile
+import posixpath
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger("blog_archive")
+
+# 导入包中识别的图片扩展名
+ARCHIVE_IMAGE_SUFFIXES = ('.jpg', '.jpeg', '.png', '.gif', '.webp')
+
+# 导出时发送队列的最大块数（客户端读取慢时打包线程会等待）
+EXPORT_QUEUE_SIZE = 16
+
+
+# ========== 解压 ==========
+
+@dataclass
+class ArchiveFile:
+    """解压后的单个文件"""
+    name: str  # 归档内的规范化路径（以 / 分隔）
+    path: str  # 解压后的本地路径
+    size: int
+
+    @property
+    def is_article(self) -> bool:
+        return self.name.lower().endswith('.md')
+
+    @property
+    def is_image(self) -> bool:
+        return self.name.lower().endswith(ARCHIVE_IMAGE_SUFFIXES)
+
+
+def safe_member_name(name: str) -> Optional[str]:
+    """规范化归档成员路径，拒绝绝对路径、上级目录与隐藏文件"""
+    parts = [part for part in name.replace('\\', '/').split('/') if part not in ('', '.')]
+    if not parts:
+        return None
+    for part in parts:
+        if part == '..' or part.startswith('.') or part == '__MACOSX':
+            return None
+    return '/'.join(parts)
+
+
+def _iter_members(archive_path: str):
+    """遍历归档中的普通文件，产出 (成员名, 打开函数)"""
+    if zipfile.is_zipfile(archive_path):
+        with zipfile.ZipFile(archive_path) as zf:
+            for info in zf.infolist():
+                if not info.is_dir():
+                    yield info.filename, lambda info=info: zf.open(info)
+    elif tarfile.is_tarfile(archive_path):
+        with tarfile.open(archive_path, 'r:*') as tf:
+            for member in tf:
+                if member.isfile():
+                    yield member.name, lambda member=member: tf.extractfile(member)
+    else:
+        raise ValueError("不支持的归档格式，仅支持 zip 与 tar")
+
+
+def extract_archive(archive_path: str, target_dir: str, max_bytes: int) -> Tuple[List[ArchiveFile], List[dict]]:
+    """
+    解压归档中的文章与图片（在线程中执行）
+    返回 (已解压文件, 被跳过的条目)；归档损坏或解压总量超过 max_bytes 时抛出 ValueError
+    """
+    try:
+        return _extract(archive_path, target_dir, max_bytes)
+    except (tarfile.TarError, zipfile.BadZipFile, EOFError) as e:
+        raise ValueError(f"归档文件损坏: {str(e)}")
+
+
+def _extract(archive_path: str, target_dir: str, max_bytes: int) -> Tuple[List[ArchiveFile], List[dict]]:
+    files: List[ArchiveFile] = []
+    skipped: List[dict] = []
+    seen = set()
+    total = 0
+
+    for raw_name, open_member in _iter_members(archive_path):
+        name = safe_member_name(raw_name)
+        if name is None or name in seen:
+            skipped.append({'name': raw_name, 'type': 'other', 'status': 'skipped', 'error': '路径不安全或重复'})
+            continue
+        lower = name.lower()
+        if not lower.endswith('.md') and not lower.endswith(ARCHIVE_IMAGE_SUFFIXES):
+            skipped.append({'name': name, 'type': 'other', 'status': 'skipped', 'error': '不支持的文件类型'})
+            continue
+        seen.add(name)
+
+        path = os.path.join(target_dir, *name.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        size = 0
+        with open_member() as src, open(path, 'wb') as dst:
+            while True:
+                chunk = src.read(1024 * 1024)
+                if not chunk:
+                    break
+                size += len(chunk)
+                total += len(chunk)
+                if total > max_bytes:
+                    raise ValueError(f"导入包解压后超过 {max_bytes // (1024 * 1024)} MB")
+                dst.write(chunk)
+        files.append(ArchiveFile(name=name, path=path, size=size))
+
+    return files, skipped
+
+
+# ========== 图片引用 ==========
+
+_MD_IMAGE_LINK_RE = re.compile(r'(!\[[^\]]*\]\()([^)\s]+)')
+_HTML_IMG_SRC_RE = re.compile(r'(<img\b[^>]*?\bsrc=")([^"]+)')
+
+
+def image_candidates(ref: str, slug: str, article_dir: str) -> List[str]:
+    """
+    文章中的图片路径可能对应的归档路径
+    相对路径按前端约定指向 /images/blog/{slug}/，同时兼容相对于文章文件的路径
+    """
+    if ref.startswith(('http://', 'https://', '//', 'data:')):
+        return []
+    legacy_prefix = f'/images/blog/{slug}/'
+    if ref.startswith(legacy_prefix):
+        ref = ref[len(legacy_prefix):]
+    elif ref.startswith('/'):
+        return []
+
+    candidates = [
+        posixpath.join(article_dir, ref),
+        posixpath.join('images', slug, ref),
+        posixpath.join(article_dir, 'images', slug, ref),
+    ]
+    return list(dict.fromkeys(posixpath.normpath(c) for c in candidates))
+
+
+def find_image_refs(text: str) -> List[str]:
+    """找出 Markdown / HTML 中的所有图片路径"""
+    return [m.group(2) for m in _MD_IMAGE_LINK_RE.finditer(text)] + \
+        [m.group(2) for m in _HTML_IMG_SRC_RE.finditer(text)]
+
+
+def rewrite_image_refs(text: str, resolve: Callable[[str], Optional[str]]) -> str:
+    """将图片路径替换为 resolve 返回的 URL，无法解析的保持不变"""
+    def replace(match: re.Match) -> str:
+        url = resolve(match.group(2))
+        return match.group(1) + (url or match.group(2))
+
+    text = _MD_IMAGE_LINK_RE.sub(replace, text)
+    return _HTML_IMG_SRC_RE.sub(replace, text)
+
+
+# ========== 导出 ==========
+
+class _QueueWriter:
+    """供 tarfile 写入的文件对象，将数据块送入异步队列（带背压）"""
+
+    def __init__(self, queue: asyncio.Queue, loop: asyncio.AbstractEventLoop):
+        self._queue = queue
+        self._loop = loop
+        self.cancelled = False
+        self.bytes_written = 0
+
+    def _put(self, item: Optional[bytes]) -> None:
+        asyncio.run_coroutine_threadsafe(self._queue.put(item), self._loop).result()
+
+    def write(self, data: bytes) -> int:
+        if self.cancelled:
+            raise ConnectionAbortedError("客户端已断开")
+        self._put(bytes(data))
+        self.bytes_written += len(data)
+        return len(data)
+
+    def finish(self) -> None:
+        if not self.cancelled:
+            self._put(None)
+
+
+def _write_tar(writer: _QueueWriter, members: Iterable[Tuple[str, str]]) -> int:
+    """按顺序将 (归档路径, 本地路径) 写入流式 tar，返回写入的文件数"""
+    count = 0
+    try:
+        with tarfile.open(fileobj=writer, mode='w|') as tar:
+            for arcname, path in members:
+                try:
+                    tar.add(path, arcname=arcname, recursive=False)
+                    count += 1
+                except FileNotFoundError:
+                    continue
+    finally:
+        writer.finish()
+    return count
+
+
+async def stream_tar(members: Iterable[Tuple[str, str]]) -> AsyncIterator[bytes]:
+    """
+    流式生成 tar 归档
+    打包在线程中进行，数据块经有界队列发送，内存占用与归档大小无关
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=EXPORT_QUEUE_SIZE)
+    writer = _QueueWriter(queue, loop)
+    started = loop.time()
+    task = asyncio.ensure_future(asyncio.to_thread(_write_tar, writer, members))
+
+    finished = False
+    try:
+        while True:
+            chunk = await queue.get()
+            if chunk is None:
+                break
+            yield chunk
+        finished = True
+        try:
+            count = await task
+        except Exception as e:
+            logger.error(f"导出失败: {str(e)}")
+            return
+        elapsed = loop.time() - started
+        rate = writer.bytes_written / elapsed if elapsed > 0 else 0.0
+        logger.info(
+            f"导出完成：{count} 个文件，{writer.bytes_written} 字节，"
+            f"{elapsed * 1000:.1f} ms，{rate / 1024 / 1024:.2f} MB/s"
+        )
+    finally:
+        if not finished:
+            # 客户端提前断开：通知打包线程停止，并腾出队列空间避免其阻塞
+            writer.cancelled = True
+            while not queue.empty():
+                queue.get_nowait()
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
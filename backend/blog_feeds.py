@@ -0,0 +1,276 @@
+"""
+RSS / Atom 订阅源与 sitemap.xml
+- 每篇文章的 XML 片段（RSS item、Atom entry、sitemap url）只在文章变化时生成
+- 片段常驻内存并持久化到磁盘，重启后签名未变的文章无需重新生成
+- 完整文档（含 gzip 版本）按需拼接并缓存，任一文章变化时失效
+"""
+
+import os
+import json
+import gzip
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Callable, Dict, List, Optional
+from urllib.parse import quote
+from xml.sax.saxutils import escape, quoteattr
+
+from blog_index import ArticleEntry
+from http_cache import make_etag
+from storage import FileStorage
+
+logger = logging.getLogger("blog_feeds")
+
+# 片段缓存格式版本，片段模板变化时递增以触发重建
+CACHE_VERSION = 1
+
+# sitemap 中的固定页面：(路径, 更新频率, 优先级)
+STATIC_PAGES = [
+    ('/', 'daily', '1.0'),
+    ('/blog', 'daily', '0.9'),
+    ('/life', 'weekly', '0.7'),
+    ('/projects', 'weekly', '0.7'),
+    ('/contact', 'monthly', '0.5'),
+]
+
+# 文档类型 -> 响应 Content-Type
+MEDIA_TYPES = {
+    'rss': 'application/rss+xml; charset=utf-8',
+    'atom': 'application/atom+xml; charset=utf-8',
+    'sitemap': 'application/xml; charset=utf-8',
+}
+
+
+def _published_at(entry: ArticleEntry) -> datetime:
+    """文章发布时间：frontmatter 日期，无法解析时使用文件修改时间"""
+    try:
+        return datetime.strptime(entry.date, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+    except ValueError:
+        return _updated_at(entry)
+
+
+def _updated_at(entry: ArticleEntry) -> datetime:
+    return datetime.fromtimestamp(entry.mtime_ns / 1e9, tz=timezone.utc)
+
+
+def _iso(value: datetime) -> str:
+    return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def build_fragments(entry: ArticleEntry, site_url: str) -> Dict[str, str]:
+    """生成单篇文章的 RSS / Atom / sitemap 片段"""
+    link = escape(f"{site_url}/blog/{quote(entry.slug)}")
+    title = escape(entry.title)
+    description = escape(entry.description)
+    published = _published_at(entry)
+    updated = _updated_at(entry)
+    categories = ''.join(f'<category>{escape(tag)}</category>' for tag in entry.tags)
+    atom_categories = ''.join(f'<category term={quoteattr(tag)}/>' for tag in entry.tags)
+
+    return {
+        'rss': (
+            f'<item><title>{title}</title><link>{link}</link>'
+            f'<guid isPermaLink="true">{link}</guid>'
+            f'<pubDate>{format_datetime(published, usegmt=True)}</pubDate>'
+            f'<description>{description}</description>{categories}</item>'
+        ),
+        'atom': (
+            f'<entry><title>{title}</title><link href="{link}"/><id>{link}</id>'
+            f'<published>{_iso(published)}</published><updated>{_iso(updated)}</updated>'
+            f'<summary>{description}</summary>{atom_categories}</entry>'
+        ),
+        'sitemap': (
+            f'<url><loc>{link}</loc><lastmod>{updated.strftime("%Y-%m-%d")}</lastmod>'
+            f'<changefreq>monthly</changefreq><priority>0.8</priority></url>'
+        ),
+    }
+
+
+@dataclass
+class FeedDocument:
+    """拼接完成的文档"""
+    body: bytes
+    gzipped: bytes
+    etag: str
+    last_modified: float
+
+
+class FeedCache:
+    """订阅源与 sitemap 缓存（线程安全）"""
+
+    def __init__(
+        self,
+        path: str,
+        storage: FileStorage,
+        site_url: str,
+        title: str,
+        description: str,
+        feed_size: int
+    ):
+        self.path = path
+        self.site_url = site_url
+        self.title = title
+        self.description = description
+        self.feed_size = feed_size
+        self._storage = storage
+        self._lock = threading.RLock()
+        self._fragments: Dict[str, dict] = {}  # slug -> {'signature': [...], 'rss': ..., 'atom': ..., 'sitemap': ...}
+        self._documents: Dict[str, FeedDocument] = {}
+        self._generation = 0  # 片段每次变化时递增，用于丢弃过期的拼接结果
+        self._dirty = False
+        self.fragment_builds = 0
+        self.document_builds = 0
+
+    # ---------- 片段维护 ----------
+
+    def upsert(self, entry: ArticleEntry) -> None:
+        """文章新增或修改时重新生成其片段（签名未变则跳过）"""
+        with self._lock:
+            current = self._fragments.get(entry.slug)
+            if current is not None and tuple(current['signature']) == entry.signature:
+                return
+        fragments = build_fragments(entry, self.site_url)
+        fragments['signature'] = list(entry.signature)
+        with self._lock:
+            self._fragments[entry.slug] = fragments
+            self._invalidate_locked()
+            self.fragment_builds += 1
+
+    def remove(self, slug: str) -> None:
+        with self._lock:
+            if self._fragments.pop(slug, None) is not None:
+                self._invalidate_locked()
+
+    def sync(self, entries: List[ArticleEntry]) -> None:
+        """与文章索引对齐（启动时调用）：补齐变化的片段，移除已删除文章"""
+        for entry in entries:
+            self.upsert(entry)
+        slugs = {entry.slug for entry in entries}
+        with self._lock:
+            for slug in [slug for slug in self._fragments if slug not in slugs]:
+                self._fragments.pop(slug)
+                self._invalidate_locked()
+
+    def _invalidate_locked(self) -> None:
+        self._documents.clear()
+        self._generation += 1
+        self._dirty = True
+
+    # ---------- 文档拼接 ----------
+
+    def cached(self, kind: str) -> Optional[FeedDocument]:
+        return self._documents.get(kind)
+
+    def _render(self, kind: str, entries: List[ArticleEntry], updated: datetime) -> str:
+        site_url = escape(self.site_url)
+        title = escape(self.title)
+        description = escape(self.description)
+        items = ''.join(self._fragments[entry.slug][kind] for entry in entries if entry.slug in self._fragments)
+
+        if kind == 'rss':
+            return (
+                '<?xml version="1.0" encoding="UTF-8"?>'
+                '<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom"><channel>'
+                f'<title>{title}</title><link>{site_url}/blog</link><description>{description}</description>'
+                f'<language>zh-CN</language><lastBuildDate>{format_datetime(updated, usegmt=True)}</lastBuildDate>'
+                f'<atom:link href="{site_url}/api/blog/rss.xml" rel="self" type="application/rss+xml"/>'
+                f'{items}</channel></rss>'
+            )
+        if kind == 'atom':
+            return (
+                '<?xml version="1.0" encoding="UTF-8"?>'
+                '<feed xmlns="http://www.w3.org/2005/Atom">'
+                f'<title>{title}</title><subtitle>{description}</subtitle>'
+                f'<link href="{site_url}/blog"/><link href="{site_url}/api/blog/atom.xml" rel="self"/>'
+                f'<id>{site_url}/blog</id><updated>{_iso(updated)}</updated>'
+                f'{items}</feed>'
+            )
+        pages = ''.join(
+            f'<url><loc>{site_url}{path}</loc><changefreq>{freq}</changefreq><priority>{priority}</priority></url>'
+            for path, freq, priority in STATIC_PAGES
+        )
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            f'{pages}{items}</urlset>'
+        )
+
+    def document(self, kind: str, get_entries: Callable[[Optional[int]], List[ArticleEntry]], removed_at_ns: int) -> FeedDocument:
+        """
+        获取完整文档，未缓存时由已有片段拼接
+        get_entries(limit) 返回按日期降序的文章；只拼接字符串，不重新生成片段
+        """
+        cached = self._documents.get(kind)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            generation = self._generation
+        entries = get_entries(None if kind == 'sitemap' else self.feed_size)
+        latest_ns = max([entry.mtime_ns for entry in entries] + [removed_at_ns])
+        updated = datetime.fromtimestamp(latest_ns / 1e9, tz=timezone.utc)
+
+        with self._lock:
+            body = self._render(kind, entries, updated).encode('utf-8')
+        document = FeedDocument(
+            body=body,
+            gzipped=gzip.compress(body, compresslevel=6),
+            etag=make_etag(kind, self.site_url, [(entry.slug, entry.mtime_ns, entry.size) for entry in entries]),
+            last_modified=latest_ns / 1e9,
+        )
+
+        with self._lock:
+            self.document_builds += 1
+            if generation == self._generation:
+                self._documents[kind] = document
+        return document
+
+    # ---------- 持久化 ----------
+
+    def load(self) -> None:
+        """从磁盘加载片段，格式或站点地址不匹配时忽略"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"订阅源缓存加载失败，将重新生成: {e}")
+            return
+        if data.get('version') != CACHE_VERSION or data.get('site_url') != self.site_url:
+            logger.info("订阅源缓存版本或站点地址变化，将重新生成")
+            return
+        with self._lock:
+            self._fragments = data.get('fragments', {})
+            self._invalidate_locked()
+            self._dirty = False
+
+    def save(self) -> None:
+        """有变更时写入磁盘（原子替换）"""
+        with self._lock:
+            if not self._dirty:
+                return
+            content = json.dumps({
+                'version': CACHE_VERSION,
+                'site_url': self.site_url,
+                'fragments': self._fragments,
+            }, ensure_ascii=False, separators=(',', ':'))
+            self._dirty = False
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        try:
+            self._storage.write_text_sync(self.path, content)
+        except OSError:
+            self._dirty = True
+            raise
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'articles': len(self._fragments),
+                'fragment_builds': self.fragment_builds,
+                'document_builds': self.document_builds,
+                'cached_documents': sorted(self._documents),
+            }
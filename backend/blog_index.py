@@ -0,0 +1,443 @@
+"""
+博客文章元数据索引
+- 进程内常驻，启动时构建一次
+- 由文章增删改接口增量更新
+- 后台定时比对文件 mtime/size，兼容绕过 API 直接修改文件的情况
+- 元数据持久化为 JSON Lines 清单，重启后只需重新解析有变化的文件
+"""
+
+import os
+import json
+import time
+import bisect
+import heapq
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from storage import FileStorage
+
+logger = logging.getLogger("blog_index")
+
+
+@dataclass
+class ArticleEntry:
+    """索引中的单篇文章元数据"""
+    slug: str
+    title: str
+    date: str
+    description: str
+    tags: List[str] = field(default_factory=list)
+    cover: Optional[str] = None
+    mtime_ns: int = 0  # 文件修改时间（纳秒）
+    size: int = 0  # 文件大小（字节）
+    body_offset: int = 0  # 正文在文件中的起始字节偏移（frontmatter 之后）
+
+    @property
+    def sort_key(self) -> Tuple[str, str]:
+        """排序键：(日期, slug)，升序存储，倒序读取即为最新在前"""
+        return self.date, self.slug
+
+    @property
+    def signature(self) -> Tuple[int, int]:
+        """文件签名，用于判断文件是否被修改"""
+        return self.mtime_ns, self.size
+
+    @property
+    def tag_keys(self) -> set:
+        """归一化后的标签（不区分大小写）"""
+        return {normalize_tag(tag) for tag in self.tags}
+
+    @property
+    def tag_names(self) -> Dict[str, str]:
+        """归一化标签 -> 文章中书写的原文（同一标签重复出现时取第一次的写法）"""
+        names: Dict[str, str] = {}
+        for tag in self.tags:
+            names.setdefault(normalize_tag(tag), tag.strip())
+        return names
+
+
+def normalize_tag(tag: str) -> str:
+    """标签归一化，查询时不区分大小写"""
+    return tag.strip().lower()
+
+
+SortKey = Tuple[str, str]
+
+
+def _as_text(value, default: str = '') -> str:
+    """frontmatter 中值为空的键会被解析为空列表，统一转换为字符串"""
+    if isinstance(value, list):
+        return ' '.join(value) or default
+    return value if value is not None else default
+
+
+def build_entry(slug: str, meta: dict, mtime_ns: int, size: int, body_offset: int = 0) -> ArticleEntry:
+    """根据 frontmatter 构建索引条目"""
+    tags = meta.get('tags', [])
+    if isinstance(tags, str):
+        tags = [tags] if tags else []
+
+    return ArticleEntry(
+        slug=slug,
+        title=_as_text(meta.get('title'), slug),
+        date=_as_text(meta.get('date')),
+        description=_as_text(meta.get('description')),
+        tags=list(tags),
+        cover=_as_text(meta.get('cover')) or None,
+        mtime_ns=mtime_ns,
+        size=size,
+        body_offset=body_offset,
+    )
+
+
+# 清单格式版本，字段变化时递增以触发重建
+MANIFEST_VERSION = 1
+
+
+def entry_to_record(entry: ArticleEntry) -> dict:
+    """条目转换为清单中的一行"""
+    meta = {
+        'title': entry.title,
+        'date': entry.date,
+        'description': entry.description,
+        'tags': entry.tags,
+    }
+    if entry.cover is not None:
+        meta['cover'] = entry.cover
+    return {
+        'slug': entry.slug,
+        'mtime_ns': entry.mtime_ns,
+        'size': entry.size,
+        'body_offset': entry.body_offset,
+        'meta': meta,
+    }
+
+
+def record_to_entry(record: dict) -> ArticleEntry:
+    """清单中的一行还原为条目"""
+    return build_entry(
+        record['slug'], record['meta'], record['mtime_ns'], record['size'], record['body_offset']
+    )
+
+
+# 变更回调：(slug, 新条目)，条目为 None 表示文章已删除
+ChangeListener = Callable[[str, Optional[ArticleEntry]], None]
+
+
+class ArticleIndex:
+    """文章元数据索引（线程安全）"""
+
+    def __init__(self, get_dir: Callable[[], str], read_header: Callable[[str], Tuple[dict, int]], storage: FileStorage):
+        self._get_dir = get_dir
+        self._read_header = read_header  # 只读取 frontmatter，返回 (元数据, 正文偏移)
+        self._storage = storage  # 文件读取经由存储层，计入其耗时统计
+        self._lock = threading.RLock()
+        self._entries: Dict[str, ArticleEntry] = {}
+        self._keys: List[SortKey] = []  # 按 (date, slug) 升序
+        self._tag_keys: Dict[str, List[SortKey]] = {}  # 标签 -> 该标签下文章的有序键（倒排索引）
+        self._tag_names: Dict[str, Dict[str, int]] = {}  # 标签 -> 各种写法的文章数（用于展示原始大小写）
+        self._listeners: List[ChangeListener] = []
+        self._loaded = False
+        self._dirty = False  # 清单是否需要重新写入
+        self._removed_at_ns = 0  # 最近一次移除文章的时间，用于列表的 Last-Modified
+
+    # ---------- 订阅 ----------
+
+    def subscribe(self, listener: ChangeListener) -> None:
+        """注册文章变更回调"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def _notify(self, slug: str, entry: Optional[ArticleEntry]) -> None:
+        for listener in list(self._listeners):
+            try:
+                listener(slug, entry)
+            except Exception:
+                logger.exception(f"文章索引回调执行失败（{slug}）")
+
+    # ---------- 写入 ----------
+
+    @staticmethod
+    def _discard_key(keys: List[SortKey], key: SortKey) -> None:
+        idx = bisect.bisect_left(keys, key)
+        if idx < len(keys) and keys[idx] == key:
+            del keys[idx]
+
+    def _unlink_locked(self, entry: ArticleEntry) -> None:
+        self._discard_key(self._keys, entry.sort_key)
+        for tag in entry.tag_keys:
+            keys = self._tag_keys.get(tag)
+            if keys is None:
+                continue
+            self._discard_key(keys, entry.sort_key)
+            if not keys:
+                del self._tag_keys[tag]
+        for tag, name in entry.tag_names.items():
+            names = self._tag_names.get(tag)
+            if names is None or name not in names:
+                continue
+            names[name] -= 1
+            if names[name] <= 0:
+                del names[name]
+            if not names:
+                del self._tag_names[tag]
+
+    def _put_locked(self, entry: ArticleEntry) -> None:
+        self._dirty = True
+        old = self._entries.get(entry.slug)
+        if old is not None:
+            self._unlink_locked(old)
+        self._entries[entry.slug] = entry
+        bisect.insort(self._keys, entry.sort_key)
+        for tag in entry.tag_keys:
+            bisect.insort(self._tag_keys.setdefault(tag, []), entry.sort_key)
+        for tag, name in entry.tag_names.items():
+            names = self._tag_names.setdefault(tag, {})
+            names[name] = names.get(name, 0) + 1
+
+    def _remove_locked(self, slug: str) -> Optional[ArticleEntry]:
+        old = self._entries.pop(slug, None)
+        if old is not None:
+            self._unlink_locked(old)
+            self._dirty = True
+            self._removed_at_ns = time.time_ns()
+        return old
+
+    def put(self, slug: str) -> ArticleEntry:
+        """文章写入后更新索引（由增删改接口调用）"""
+        filepath = os.path.join(self._get_dir(), f'{slug}.md')
+        st = self._storage.stat_sync(filepath)
+        if st is None:
+            raise FileNotFoundError(filepath)
+        entry = self._load_file(slug, filepath, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            self._put_locked(entry)
+        self._notify(slug, entry)
+        return entry
+
+    def remove(self, slug: str) -> None:
+        """文章删除后移除索引（由删除接口调用）"""
+        with self._lock:
+            old = self._remove_locked(slug)
+        if old is not None:
+            self._notify(slug, None)
+
+    def _load_file(self, slug: str, filepath: str, mtime_ns: int, size: int) -> ArticleEntry:
+        meta, body_offset = self._storage.run_sync('read_header', self._read_header, filepath)
+        return build_entry(slug, meta, mtime_ns, size, body_offset)
+
+    def refresh(self) -> int:
+        """
+        扫描目录，与索引比对文件签名
+        仅重新解析新增或被修改的文件，返回变更数量
+        """
+        blog_dir = self._get_dir()
+        seen = set()
+        changed = []
+
+        with os.scandir(blog_dir) as it:
+            for item in it:
+                if not item.name.endswith('.md') or not item.is_file():
+                    continue
+                slug = item.name[:-3]
+                seen.add(slug)
+                st = item.stat()
+                current = self._entries.get(slug)
+                if current is not None and current.signature == (st.st_mtime_ns, st.st_size):
+                    continue
+                try:
+                    entry = self._load_file(slug, item.path, st.st_mtime_ns, st.st_size)
+                except (OSError, UnicodeDecodeError) as e:
+                    logger.warning(f"读取文章失败（{item.name}）: {e}")
+                    continue
+                with self._lock:
+                    self._put_locked(entry)
+                changed.append((slug, entry))
+
+        with self._lock:
+            removed = [slug for slug in self._entries if slug not in seen]
+            for slug in removed:
+                self._remove_locked(slug)
+            self._loaded = True
+
+        for slug, entry in changed:
+            self._notify(slug, entry)
+        for slug in removed:
+            self._notify(slug, None)
+
+        if changed or removed:
+            logger.info(f"文章索引已刷新：变更 {len(changed)} 篇，移除 {len(removed)} 篇")
+        return len(changed) + len(removed)
+
+    @property
+    def removed_at_ns(self) -> int:
+        """最近一次移除文章的时间（纳秒），从未移除时为 0"""
+        return self._removed_at_ns
+
+    @property
+    def loaded(self) -> bool:
+        """索引是否已完成首次构建"""
+        return self._loaded
+
+    def ensure_loaded(self) -> None:
+        """确保索引至少构建过一次"""
+        if not self._loaded:
+            self.refresh()
+
+    # ---------- 清单持久化 ----------
+
+    def load_manifest(self, path: str) -> int:
+        """
+        从清单恢复条目（不触发变更回调），返回恢复数量
+        之后调用 refresh 时，签名未变的文件不会被重新读取；格式不匹配时忽略清单
+        """
+        if not os.path.exists(path):
+            return 0
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                header = json.loads(f.readline() or '{}')
+                if header.get('version') != MANIFEST_VERSION:
+                    logger.info("文章清单版本变化，将重新解析全部文章")
+                    return 0
+                entries = [record_to_entry(json.loads(line)) for line in f if line.strip()]
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"文章清单加载失败，将重新解析全部文章: {e}")
+            return 0
+
+        with self._lock:
+            for entry in entries:
+                self._put_locked(entry)
+            self._dirty = False
+        logger.info(f"文章清单已加载，共 {len(entries)} 篇")
+        return len(entries)
+
+    def save_manifest(self, path: str) -> None:
+        """有变更时写入清单（先写临时文件再原子替换）"""
+        with self._lock:
+            if not self._dirty:
+                return
+            lines = [json.dumps({'version': MANIFEST_VERSION})]
+            lines.extend(
+                json.dumps(entry_to_record(self._entries[slug]), ensure_ascii=False, separators=(',', ':'))
+                for _, slug in self._keys
+            )
+            self._dirty = False
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        try:
+            self._storage.write_text_sync(path, '\n'.join(lines) + '\n')
+        except OSError:
+            self._dirty = True
+            raise
+
+    # ---------- 查询 ----------
+
+    def get(self, slug: str) -> Optional[ArticleEntry]:
+        """按 slug 获取条目"""
+        return self._entries.get(slug)
+
+    def slugs(self) -> set:
+        """所有文章的 slug"""
+        with self._lock:
+            return set(self._entries)
+
+    def __contains__(self, slug: str) -> bool:
+        return slug in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def latest(self, limit: Optional[int] = None) -> List[ArticleEntry]:
+        """按日期降序返回文章，limit 为 None 时返回全部"""
+        with self._lock:
+            keys = self._keys if limit is None else self._keys[-limit:] if limit > 0 else []
+            return [self._entries[slug] for _, slug in reversed(keys)]
+
+    def _display_name(self, tag: str) -> str:
+        """标签的展示名：使用最多的写法，数量相同时取字典序最小的"""
+        names = self._tag_names.get(tag)
+        if not names:
+            return tag
+        return min(names, key=lambda name: (-names[name], name))
+
+    def tags(self) -> Dict[str, int]:
+        """所有标签（原始写法）及其文章数；大小写不同的写法合并计数"""
+        with self._lock:
+            return {self._display_name(tag): len(keys) for tag, keys in self._tag_keys.items()}
+
+    @staticmethod
+    def _iter_desc(keys: List[SortKey], upper: SortKey, lower: SortKey) -> Iterator[SortKey]:
+        """在有序键列表中从 upper（不含）向下遍历到 lower（含）"""
+        idx = bisect.bisect_left(keys, upper) - 1
+        while idx >= 0 and keys[idx] >= lower:
+            yield keys[idx]
+            idx -= 1
+
+    def query(
+        self,
+        tags: Optional[Iterable[str]] = None,
+        match_all: bool = False,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        after: Optional[SortKey] = None,
+        limit: int = 10,
+    ) -> Tuple[List[ArticleEntry], Optional[SortKey]]:
+        """
+        按标签、日期范围查询文章，基于键集游标分页（日期降序）
+        - tags: 标签列表，match_all 为 True 时要求同时包含全部标签，否则包含任一即可
+        - date_from / date_to: 日期闭区间（YYYY-MM-DD）
+        - after: 上一页最后一条的排序键，本页从其之后开始
+        返回 (本页条目, 下一页游标键)，没有更多数据时游标为 None
+        """
+        # 上界（不含）：游标键与 date_to 取较小者；下界（含）：date_from
+        upper: SortKey = (chr(0x10FFFF), '')
+        if date_to:
+            upper = (date_to + '\x00', '')
+        if after is not None and after < upper:
+            upper = after
+        lower: SortKey = (date_from or '', '')
+
+        tag_keys = sorted({normalize_tag(tag) for tag in tags or [] if tag.strip()})
+
+        with self._lock:
+            if not tag_keys:
+                source: Iterable[SortKey] = self._iter_desc(self._keys, upper, lower)
+            else:
+                lists = [self._tag_keys.get(tag, []) for tag in tag_keys]
+                if match_all:
+                    # 从最短的倒排列表出发，逐条校验其余标签
+                    smallest = min(lists, key=len)
+                    required = set(tag_keys)
+                    source = (
+                        key for key in self._iter_desc(smallest, upper, lower)
+                        if required <= self._entries[key[1]].tag_keys
+                    )
+                else:
+                    # 多个倒排列表归并，跳过重复键
+                    merged = heapq.merge(
+                        *(self._iter_desc(keys, upper, lower) for keys in lists),
+                        reverse=True
+                    )
+                    source = _dedup(merged)
+
+            page = []
+            has_more = False
+            for key in source:
+                if len(page) >= limit:
+                    has_more = True
+                    break
+                page.append(self._entries[key[1]])
+
+        next_key = page[-1].sort_key if has_more and page else None
+        return page, next_key
+
+
+def _dedup(keys: Iterable[SortKey]) -> Iterator[SortKey]:
+    """去除有序序列中相邻的重复键"""
+    last = None
+    for key in keys:
+        if key != last:
+            yield key
+            last = key
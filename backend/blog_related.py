@@ -0,0 +1,226 @@
+"""
+相关文章推荐
+- 每篇文章表示为哈希 TF-IDF 向量（复用搜索索引的加权词频），并叠加标签特征
+- 全部向量保存在一个 NumPy 矩阵中，全量重建时用一次矩阵乘法得到两两相似度并取 Top-K
+- 文章增删改时只重算受影响的行；累计变更较多时（IDF 漂移）再全量重建
+- 查询直接返回预先计算的结果，复杂度 O(k)
+"""
+
+import zlib
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("blog_related")
+
+# 特征哈希维度
+HASH_DIMS = 4096
+
+# 标签特征权重（相同标签的文章更相关）
+TAG_WEIGHT = 3.0
+
+# 自上次全量重建以来的变更数超过文章数的该比例时全量重建
+REBUILD_RATIO = 0.2
+REBUILD_MIN_CHANGES = 8
+
+
+def _bucket(feature: str) -> int:
+    """稳定的特征哈希（不受 PYTHONHASHSEED 影响）"""
+    return zlib.crc32(feature.encode('utf-8')) % HASH_DIMS
+
+
+def vectorize(terms: Dict[str, float], tags: Iterable[str]) -> np.ndarray:
+    """词频（次线性缩放）与标签特征哈希到定长向量"""
+    row = np.zeros(HASH_DIMS, dtype=np.float32)
+    for term, tf in terms.items():
+        if tf > 0:
+            row[_bucket(term)] += 1.0 + np.log(tf)
+    for tag in tags:
+        tag = tag.strip().lower()
+        if tag:
+            row[_bucket(f'#tag:{tag}')] += TAG_WEIGHT
+    return row
+
+
+def _normalize(rows: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(rows, axis=-1, keepdims=True)
+    return np.divide(rows, norms, out=np.zeros_like(rows), where=norms > 0)
+
+
+class RelatedIndex:
+    """相关文章索引（线程安全）"""
+
+    def __init__(self, top_k: int):
+        self.top_k = top_k
+        self._lock = threading.RLock()
+        self._slugs: List[str] = []  # 行号 -> slug
+        self._rows: Dict[str, int] = {}  # slug -> 行号
+        self._tf = np.zeros((0, HASH_DIMS), dtype=np.float32)  # 词频矩阵（按容量预分配）
+        self._vectors = np.zeros((0, HASH_DIMS), dtype=np.float32)  # 归一化 TF-IDF 矩阵
+        self._df = np.zeros(HASH_DIMS, dtype=np.int32)  # 各特征的文档频率
+        self._idf = np.ones(HASH_DIMS, dtype=np.float32)
+        self._neighbors: Dict[str, List[Tuple[str, float]]] = {}
+        self._pending = 0  # 自上次全量重建以来的变更数
+        self._ready = False
+        self.rebuilds = 0
+        self.row_updates = 0
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    # ---------- 矩阵维护 ----------
+
+    def _ensure_capacity(self, n: int) -> None:
+        capacity = len(self._tf)
+        if n <= capacity:
+            return
+        new_capacity = max(n, capacity * 2, 16)
+        for name in ('_tf', '_vectors'):
+            grown = np.zeros((new_capacity, HASH_DIMS), dtype=np.float32)
+            grown[:capacity] = getattr(self, name)
+            setattr(self, name, grown)
+
+    def _top_k(self, scores: np.ndarray) -> List[Tuple[str, float]]:
+        """从一行相似度中取 Top-K（自身已置为 -inf），忽略相似度为 0 的文章"""
+        k = min(self.top_k, len(scores) - 1)
+        if k <= 0:
+            return []
+        idx = np.argpartition(-scores, k - 1)[:k]
+        idx = idx[np.argsort(-scores[idx], kind='stable')]
+        return [(self._slugs[j], round(float(scores[j]), 4)) for j in idx if scores[j] > 0]
+
+    def _rebuild_locked(self) -> None:
+        """全量重建：重新计算 IDF，一次矩阵乘法得到全部相似度"""
+        n = len(self._slugs)
+        self._idf = (np.log((1.0 + n) / (1.0 + self._df)) + 1.0).astype(np.float32)
+        vectors = _normalize(self._tf[:n] * self._idf)
+        self._vectors[:n] = vectors
+
+        similarity = vectors @ vectors.T
+        np.fill_diagonal(similarity, -np.inf)
+        self._neighbors = {slug: self._top_k(similarity[i]) for i, slug in enumerate(self._slugs)}
+        self._pending = 0
+        self.rebuilds += 1
+
+    def _recompute_rows(self, rows: List[int]) -> None:
+        """批量重算若干行的近邻"""
+        if not rows:
+            return
+        n = len(self._slugs)
+        vectors = self._vectors[:n]
+        similarity = vectors[rows] @ vectors.T
+        for offset, i in enumerate(rows):
+            similarity[offset, i] = -np.inf
+            self._neighbors[self._slugs[i]] = self._top_k(similarity[offset])
+        self.row_updates += len(rows)
+
+    def _should_rebuild(self) -> bool:
+        return self._pending > max(REBUILD_MIN_CHANGES, len(self._slugs) * REBUILD_RATIO)
+
+    # ---------- 更新 ----------
+
+    def load(self, items: Iterable[Tuple[str, Dict[str, float], List[str]]]) -> None:
+        """批量构建：(slug, 词频, 标签)"""
+        items = list(items)
+        with self._lock:
+            self._slugs = [slug for slug, _, _ in items]
+            self._rows = {slug: i for i, slug in enumerate(self._slugs)}
+            self._tf = np.zeros((max(len(items), 16), HASH_DIMS), dtype=np.float32)
+            self._vectors = np.zeros_like(self._tf)
+            for i, (_, terms, tags) in enumerate(items):
+                self._tf[i] = vectorize(terms, tags)
+            self._df = (self._tf[:len(items)] > 0).sum(axis=0).astype(np.int32)
+            self._rebuild_locked()
+            self._ready = True
+        logger.info(f"相关文章索引构建完成，共 {len(items)} 篇")
+
+    def upsert(self, slug: str, terms: Dict[str, float], tags: List[str]) -> None:
+        """新增或更新文章，只重算受影响的近邻"""
+        row = vectorize(terms, tags)
+        with self._lock:
+            i = self._rows.get(slug)
+            if i is None:
+                i = len(self._slugs)
+                self._ensure_capacity(i + 1)
+                self._slugs.append(slug)
+                self._rows[slug] = i
+            else:
+                self._df -= (self._tf[i] > 0)
+            self._tf[i] = row
+            self._df += (row > 0)
+            self._pending += 1
+
+            if self._should_rebuild():
+                self._rebuild_locked()
+                return
+
+            n = len(self._slugs)
+            self._vectors[i] = _normalize(row * self._idf)
+            scores = self._vectors[:n] @ self._vectors[i]
+            scores[i] = -np.inf
+            self._neighbors[slug] = self._top_k(scores)
+
+            # 其他文章：原近邻包含该文章，或新相似度能进入其 Top-K 时重算
+            affected = []
+            for j, other in enumerate(self._slugs):
+                if j == i:
+                    continue
+                current = self._neighbors.get(other, [])
+                if any(s == slug for s, _ in current):
+                    affected.append(j)
+                elif scores[j] > 0 and (len(current) < self.top_k or scores[j] > current[-1][1]):
+                    affected.append(j)
+            self._recompute_rows(affected)
+
+    def remove(self, slug: str) -> None:
+        """删除文章，重算以其为近邻的文章"""
+        with self._lock:
+            i = self._rows.pop(slug, None)
+            if i is None:
+                return
+            self._df -= (self._tf[i] > 0)
+            self._neighbors.pop(slug, None)
+
+            # 末行移到被删除的位置，保持矩阵紧凑
+            last = len(self._slugs) - 1
+            if i != last:
+                moved = self._slugs[last]
+                self._tf[i] = self._tf[last]
+                self._vectors[i] = self._vectors[last]
+                self._slugs[i] = moved
+                self._rows[moved] = i
+            self._slugs.pop()
+            self._tf[last] = 0
+            self._vectors[last] = 0
+            self._pending += 1
+
+            if self._should_rebuild():
+                self._rebuild_locked()
+                return
+
+            affected = [
+                j for j, other in enumerate(self._slugs)
+                if any(s == slug for s, _ in self._neighbors.get(other, []))
+            ]
+            self._recompute_rows(affected)
+
+    # ---------- 查询 ----------
+
+    def related(self, slug: str, limit: Optional[int] = None) -> Optional[List[Tuple[str, float]]]:
+        """预先计算的相关文章 [(slug, 相似度)]，文章未索引时返回 None"""
+        neighbors = self._neighbors.get(slug)
+        if neighbors is None:
+            return None
+        return neighbors if limit is None else neighbors[:limit]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'articles': len(self._slugs),
+                'rebuilds': self.rebuilds,
+                'row_updates': self.row_updates,
+                'pending_changes': self._pending,
+            }
@@ -0,0 +1,134 @@
+"""
+博客 Markdown 渲染
+- 服务端将 Markdown 渲染为 HTML，并生成标题目录和阅读时间
+- 渲染结果按正文哈希缓存（LRU，容量有限）
+- 缓存未命中时在进程池中渲染，长文章不会阻塞事件循环
+"""
+
+import re
+import math
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import markdown
+from markdown.extensions.toc import slugify_unicode
+
+from workers import run_in_process
+
+# 与前端 lib/blog.ts 保持一致：相对路径图片转换为文章图片目录下的绝对路径
+_RELATIVE_IMG_RE = re.compile(r'<img([^>]*?)src="(?!http|/)(\./|\.\./)?([^"]+)"([^>]*?)>')
+
+
+def _flatten_toc(tokens: List[dict]) -> List[dict]:
+    """将 Markdown 扩展生成的嵌套目录展开为扁平列表"""
+    items = []
+    for token in tokens:
+        items.append({
+            'level': token['level'],
+            'id': token['id'],
+            'title': token['name'],
+        })
+        items.extend(_flatten_toc(token.get('children', [])))
+    return items
+
+
+def reading_time(body: str) -> str:
+    """计算阅读时间（假设每分钟 200 字，与前端一致）"""
+    return f"{math.ceil(len(body) / 200)} 分钟"
+
+
+def render_markdown(body: str, slug: str) -> dict:
+    """
+    渲染 Markdown（在工作进程中执行）
+    返回 {"html": ..., "toc": [...], "reading_time": ...}
+    """
+    md = markdown.Markdown(
+        extensions=['extra', 'toc', 'sane_lists'],
+        extension_configs={'toc': {'slugify': slugify_unicode}}
+    )
+    html = md.convert(body)
+    html = _RELATIVE_IMG_RE.sub(rf'<img\1src="/images/blog/{slug}/\3"\4>', html)
+
+    return {
+        'html': html,
+        'toc': _flatten_toc(md.toc_tokens),
+        'reading_time': reading_time(body),
+    }
+
+
+def _retrieve_exception(task: asyncio.Task) -> None:
+    """取出任务异常，避免无人等待时出现 "exception was never retrieved" 警告"""
+    if not task.cancelled():
+        task.exception()
+
+
+class RenderCache:
+    """按 (slug, 正文哈希) 缓存渲染结果的 LRU 缓存"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[Tuple[str, str], dict]" = OrderedDict()
+        self._pending: Dict[Tuple[str, str], asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(slug: str, body: str) -> Tuple[str, str]:
+        return slug, hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+    def _get(self, key: Tuple[str, str]):
+        with self._lock:
+            result = self._items.get(key)
+            if result is not None:
+                self._items.move_to_end(key)
+            return result
+
+    def _put(self, key: Tuple[str, str], result: dict) -> None:
+        with self._lock:
+            self._items[key] = result
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    async def _render_shared(self, key: Tuple[str, str], slug: str, body: str) -> dict:
+        try:
+            result = await run_in_process(render_markdown, body, slug)
+            self._put(key, result)
+            return result
+        finally:
+            self._pending.pop(key, None)
+
+    async def render(self, slug: str, body: str) -> dict:
+        """获取渲染结果，未命中时提交到进程池渲染；同一内容并发请求只渲染一次"""
+        key = self.make_key(slug, body)
+        result = self._get(key)
+        if result is not None:
+            self.hits += 1
+            return result
+
+        task = self._pending.get(key)
+        if task is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            # 渲染在独立任务中进行：发起请求被取消（如客户端断开）时，其他等待者仍能拿到结果
+            task = asyncio.create_task(self._render_shared(key, slug, body))
+            task.add_done_callback(_retrieve_exception)
+            self._pending[key] = task
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        """缓存统计"""
+        return {
+            'entries': len(self._items),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
@@ -0,0 +1,405 @@
+"""
+博客全文搜索
+- 中文按二元组（bigram）切分，英文/数字按单词切分
+- 倒排索引 + BM25 排序，覆盖标题、描述、标签、正文
+- 随文章增删改增量更新，并持久化到磁盘，重启后无需重新分词
+"""
+
+import os
+import re
+import json
+import math
+import uuid
+import html
+import logging
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger("blog_search")
+
+# 索引文件格式版本，分词规则变化时递增以触发重建
+INDEX_VERSION = 1
+
+# 各字段权重
+FIELD_WEIGHTS = {
+    'title': 3.0,
+    'tags': 2.5,
+    'description': 2.0,
+    'body': 1.0,
+}
+
+# BM25 参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# 摘要长度（字符）
+SNIPPET_LENGTH = 120
+
+_CJK_RANGES = (
+    r'\u3400-\u4dbf'  # CJK 扩展 A
+    r'\u4e00-\u9fff'  # CJK 基本区
+    r'\uf900-\ufaff'  # CJK 兼容
+    r'\u3040-\u30ff'  # 日文假名
+    r'\uac00-\ud7af'  # 韩文
+)
+_TOKEN_RE = re.compile(rf'[{_CJK_RANGES}]+|[a-z0-9]+')
+_CJK_RE = re.compile(rf'[{_CJK_RANGES}]')
+
+
+# ========== 分词 ==========
+
+def tokenize(text: str) -> List[str]:
+    """
+    分词：中文连续片段切为二元组（单字片段保留单字），英文按单词切分并转小写
+    例："FastAPI 异步接口" -> ["fastapi", "异步", "步接", "接口"]
+    """
+    tokens = []
+    for match in _TOKEN_RE.finditer(text.lower()):
+        run = match.group()
+        if _CJK_RE.match(run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+_MD_CODE_FENCE_RE = re.compile(r'^\s*(```|~~~).*$', re.MULTILINE)
+_MD_IMAGE_RE = re.compile(r'!\[([^\]]*)\]\([^)]*\)')
+_MD_LINK_RE = re.compile(r'\[([^\]]*)\]\([^)]*\)')
+_HTML_TAG_RE = re.compile(r'<[^>]+>')
+_MD_SYNTAX_RE = re.compile(r'^\s{0,3}(#{1,6}|>+|[-*+]|\d+\.)\s+|[*_~`|]+', re.MULTILINE)
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def markdown_to_text(body: str) -> str:
+    """去除 Markdown 语法，得到用于索引和摘要的纯文本"""
+    text = _MD_CODE_FENCE_RE.sub(' ', body)
+    text = _MD_IMAGE_RE.sub(r'\1', text)
+    text = _MD_LINK_RE.sub(r'\1', text)
+    text = _HTML_TAG_RE.sub(' ', text)
+    text = _MD_SYNTAX_RE.sub(' ', text)
+    return _WHITESPACE_RE.sub(' ', text).strip()
+
+
+# ========== 高亮 ==========
+
+def _find_terms(text: str, terms: List[str], first_only: bool = False) -> List[Tuple[int, int]]:
+    """
+    在原文中查找命中的词（不区分大小写），返回原文中的 (起始, 结束) 区间
+    逐字转小写并记录每个字符对应的原文位置：转小写可能改变长度（如 'İ'.lower() 为 2 个字符），
+    不能直接用 text.lower() 的位置索引原文
+    """
+    lower_chars = []
+    origin = []  # 小写文本中每个字符在原文中的位置
+    for i, char in enumerate(text):
+        lowered = char.lower()
+        lower_chars.append(lowered)
+        origin.extend([i] * len(lowered))
+    lower = ''.join(lower_chars)
+
+    spans = []
+    for term in terms:
+        if not term:
+            continue
+        start = lower.find(term)
+        while start != -1:
+            spans.append((origin[start], origin[start + len(term) - 1] + 1))
+            start = -1 if first_only else lower.find(term, start + 1)
+    return spans
+
+
+def highlight(text: str, terms: List[str]) -> str:
+    """将命中的词用 <mark> 包裹，其余内容做 HTML 转义"""
+    if not text or not terms:
+        return html.escape(text)
+
+    mask = [False] * len(text)
+    for start, end in _find_terms(text, terms):
+        for i in range(start, end):
+            mask[i] = True
+
+    parts = []
+    i = 0
+    while i < len(text):
+        j = i
+        while j < len(text) and mask[j] == mask[i]:
+            j += 1
+        chunk = html.escape(text[i:j])
+        parts.append(f'<mark>{chunk}</mark>' if mask[i] else chunk)
+        i = j
+    return ''.join(parts)
+
+
+def make_snippet(text: str, terms: List[str], length: int = SNIPPET_LENGTH) -> str:
+    """截取首个命中位置附近的文本作为摘要，并高亮命中词"""
+    positions = [start for start, _ in _find_terms(text, terms, first_only=True)]
+    if not positions:
+        snippet = text[:length]
+        return html.escape(snippet) + ('…' if len(text) > length else '')
+
+    first = min(positions)
+    start = max(0, first - length // 4)
+    end = min(len(text), start + length)
+    snippet = highlight(text[start:end], terms)
+    return ('…' if start > 0 else '') + snippet + ('…' if end < len(text) else '')
+
+
+# ========== 索引 ==========
+
+class SearchDoc:
+    """索引中的单篇文档"""
+    __slots__ = ('slug', 'signature', 'title', 'text', 'terms', 'length')
+
+    def __init__(self, slug: str, signature: Tuple[int, int], title: str, text: str, terms: Dict[str, float]):
+        self.slug = slug
+        self.signature = signature  # 对应文件的 (mtime_ns, size)
+        self.title = title
+        self.text = text  # 正文纯文本，用于生成摘要
+        self.terms = terms  # 词 -> 加权词频
+        self.length = sum(terms.values())
+
+    def to_dict(self) -> dict:
+        return {
+            'slug': self.slug,
+            'signature': list(self.signature),
+            'title': self.title,
+            'text': self.text,
+            'terms': self.terms,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'SearchDoc':
+        return cls(
+            slug=data['slug'],
+            signature=tuple(data['signature']),
+            title=data['title'],
+            text=data['text'],
+            terms=data['terms'],
+        )
+
+
+def build_doc(
+    slug: str,
+    signature: Tuple[int, int],
+    title: str,
+    description: str,
+    tags: List[str],
+    body: str
+) -> SearchDoc:
+    """对文章各字段分词并按字段权重合并词频"""
+    text = markdown_to_text(body)
+    terms: Counter = Counter()
+    for field_name, value in (
+        ('title', title),
+        ('description', description),
+        ('tags', ' '.join(tags)),
+        ('body', text),
+    ):
+        weight = FIELD_WEIGHTS[field_name]
+        for token in tokenize(value):
+            terms[token] += weight
+    return SearchDoc(slug, signature, title, text, dict(terms))
+
+
+class SearchIndex:
+    """倒排索引（线程安全）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._save_lock = threading.Lock()  # 串行化保存，避免旧快照覆盖新快照
+        self._docs: Dict[str, SearchDoc] = {}
+        self._postings: Dict[str, Dict[str, float]] = {}  # 词 -> {slug: 加权词频}
+        self._char_terms: Dict[str, Set[str]] = {}  # 汉字 -> 包含该字的二元组（单字查询扩展用）
+        self._total_length = 0.0
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def signature(self, slug: str) -> Optional[Tuple[int, int]]:
+        """已索引文档的文件签名，未索引时返回 None"""
+        doc = self._docs.get(slug)
+        return doc.signature if doc else None
+
+    def terms(self, slug: str) -> Optional[Dict[str, float]]:
+        """已索引文档的加权词频，未索引时返回 None"""
+        doc = self._docs.get(slug)
+        return doc.terms if doc else None
+
+    # ---------- 更新 ----------
+
+    def _remove_locked(self, slug: str) -> None:
+        doc = self._docs.pop(slug, None)
+        if doc is None:
+            return
+        for term in doc.terms:
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            posting.pop(slug, None)
+            if not posting:
+                del self._postings[term]
+                self._unlink_chars(term)
+        self._total_length -= doc.length
+
+    @staticmethod
+    def _is_cjk_bigram(term: str) -> bool:
+        return len(term) == 2 and _CJK_RE.match(term) is not None
+
+    def _link_chars(self, term: str) -> None:
+        if self._is_cjk_bigram(term):
+            for char in set(term):
+                self._char_terms.setdefault(char, set()).add(term)
+
+    def _unlink_chars(self, term: str) -> None:
+        if self._is_cjk_bigram(term):
+            for char in set(term):
+                terms = self._char_terms.get(char)
+                if terms is None:
+                    continue
+                terms.discard(term)
+                if not terms:
+                    del self._char_terms[char]
+
+    def _add_locked(self, doc: SearchDoc) -> None:
+        self._docs[doc.slug] = doc
+        for term, tf in doc.terms.items():
+            posting = self._postings.get(term)
+            if posting is None:
+                posting = self._postings[term] = {}
+                self._link_chars(term)
+            posting[doc.slug] = tf
+        self._total_length += doc.length
+
+    def upsert(self, doc: SearchDoc) -> None:
+        """新增或替换文档，仅更新该文档涉及的倒排项"""
+        with self._lock:
+            self._remove_locked(doc.slug)
+            self._add_locked(doc)
+            self._dirty = True
+
+    def remove(self, slug: str) -> None:
+        """移除文档"""
+        with self._lock:
+            if slug in self._docs:
+                self._remove_locked(slug)
+                self._dirty = True
+
+    def retain(self, slugs: set) -> None:
+        """移除不在给定集合中的文档（用于启动时清理已删除的文章）"""
+        with self._lock:
+            for slug in [slug for slug in self._docs if slug not in slugs]:
+                self._remove_locked(slug)
+                self._dirty = True
+
+    # ---------- 持久化 ----------
+
+    def load(self) -> None:
+        """从磁盘加载索引，格式不匹配时忽略"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"搜索索引加载失败，将重新构建: {e}")
+            return
+        if data.get('version') != INDEX_VERSION:
+            logger.info("搜索索引版本变化，将重新构建")
+            return
+
+        with self._lock:
+            self._docs.clear()
+            self._postings.clear()
+            self._char_terms.clear()
+            self._total_length = 0.0
+            for item in data.get('docs', []):
+                self._add_locked(SearchDoc.from_dict(item))
+            self._dirty = False
+        logger.info(f"搜索索引已加载，共 {len(self._docs)} 篇")
+
+    def save(self) -> None:
+        """写入磁盘（先写临时文件再原子替换）"""
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                data = {
+                    'version': INDEX_VERSION,
+                    'docs': [doc.to_dict() for doc in self._docs.values()],
+                }
+                self._dirty = False
+
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            # 每次保存使用独立的临时文件，并发保存不会写到同一个文件里
+            tmp_path = os.path.join(directory, f".{os.path.basename(self.path)}.{uuid.uuid4().hex}.tmp")
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                self._dirty = True
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+    # ---------- 查询 ----------
+
+    def _expand_terms(self, query_terms: List[str]) -> List[str]:
+        """单个汉字无法命中二元组，扩展为包含该字的词（查字 -> 二元组映射，无需遍历词表）"""
+        expanded = []
+        for term in query_terms:
+            if len(term) == 1 and _CJK_RE.match(term):
+                expanded.append(term)
+                expanded.extend(sorted(self._char_terms.get(term, ())))
+            else:
+                expanded.append(term)
+        return list(dict.fromkeys(expanded))
+
+    def search(self, query: str, limit: int = 10, offset: int = 0) -> Tuple[int, List[dict]]:
+        """
+        BM25 检索
+        返回 (命中总数, 结果列表)，结果包含 slug、score、高亮标题和摘要
+        """
+        query_terms = list(dict.fromkeys(tokenize(query)))
+        if not query_terms:
+            return 0, []
+
+        with self._lock:
+            n_docs = len(self._docs)
+            if n_docs == 0:
+                return 0, []
+            avg_length = self._total_length / n_docs or 1.0
+
+            scores: Dict[str, float] = {}
+            for term in self._expand_terms(query_terms):
+                posting = self._postings.get(term)
+                if not posting:
+                    continue
+                df = len(posting)
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                for slug, tf in posting.items():
+                    length = self._docs[slug].length
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+                    scores[slug] = scores.get(slug, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+            page = ranked[offset:offset + limit]
+            docs = [self._docs[slug] for slug, _ in page]
+
+        # 高亮使用原始查询的词（单字也可直接匹配）
+        results = []
+        for (slug, score), doc in zip(page, docs):
+            results.append({
+                'slug': slug,
+                'score': round(score, 4),
+                'title_highlight': highlight(doc.title, query_terms),
+                'snippet': make_snippet(doc.text, query_terms),
+            })
+        return len(ranked), results
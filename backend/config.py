@@ -13,10 +13,29 @@ GITHUB_TOKEN = os.getenv('GITHUB_TOKEN', '')  # 可选：GitHub Token（提高AP
 
 # 同步配置
 FETCH_INTERVAL_HOURS = 1  # 定时同步间隔（小时）
+GITHUB_SYNC_CONCURRENCY = int(os.getenv('GITHUB_SYNC_CONCURRENCY', '8'))  # 同时请求仓库 commit 数的最大并发数
+GITHUB_REQUEST_TIMEOUT = float(os.getenv('GITHUB_REQUEST_TIMEOUT', '15'))  # 单次请求超时（秒）
+GITHUB_MAX_RETRIES = int(os.getenv('GITHUB_MAX_RETRIES', '3'))  # 限流（403/429）、5xx 与网络错误的最大重试次数
+GITHUB_BACKOFF_BASE = float(os.getenv('GITHUB_BACKOFF_BASE', '1'))  # 指数退避基数（秒）
+GITHUB_BACKOFF_MAX = float(os.getenv('GITHUB_BACKOFF_MAX', '60'))  # 单次等待上限（秒），服务端要求等待更久时放弃重试
 
 # 数据库配置
 DATABASE_URL = "sqlite+aiosqlite:///./data/github_data.db"  # SQLite数据库路径
 
+# 后台工作进程数（Markdown 渲染、图片处理等 CPU 密集型任务）
+WORKER_PROCESSES = int(os.getenv('WORKER_PROCESSES', '2'))
+
+# 图片衍生图任务配置
+IMAGE_JOB_WORKERS = int(os.getenv('IMAGE_JOB_WORKERS', str(WORKER_PROCESSES)))  # 并发处理的任务数
+IMAGE_JOB_HISTORY = int(os.getenv('IMAGE_JOB_HISTORY', '500'))  # 保留的任务记录数
+
+# 上传配置
+UPLOAD_MAX_BYTES = int(os.getenv('UPLOAD_MAX_BYTES', str(20 * 1024 * 1024)))  # 单个文件最大字节数
+UPLOAD_MAX_REQUEST_BYTES = int(os.getenv('UPLOAD_MAX_REQUEST_BYTES', str(200 * 1024 * 1024)))  # 单个上传请求体最大字节数
+UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', str(256 * 1024)))  # 流式写入分块大小
+UPLOAD_BATCH_MAX_FILES = int(os.getenv('UPLOAD_BATCH_MAX_FILES', '50'))  # 批量上传单次最多文件数
+UPLOAD_BATCH_CONCURRENCY = int(os.getenv('UPLOAD_BATCH_CONCURRENCY', '4'))  # 批量上传并发写入的文件数
+
 # GitHub API 地址
 GITHUB_REST_API = "https://api.github.com"
 
@@ -24,7 +43,33 @@ GITHUB_REST_API = "https://api.github.com"
 BLOG_API_KEY = os.getenv('BLOG_API_KEY', '')  # 博客管理API密钥
 BLOG_CONTENT_DIR = os.getenv('BLOG_CONTENT_DIR', '../frontend/content/blog')  # 博客内容目录
 BLOG_IMAGES_DIR = os.getenv('BLOG_IMAGES_DIR', '../frontend/public/images/blog')  # 博客图片目录
+BLOG_SEARCH_INDEX_PATH = os.getenv('BLOG_SEARCH_INDEX_PATH', './data/blog_search_index.json')  # 搜索索引持久化文件
+BLOG_MANIFEST_PATH = os.getenv('BLOG_MANIFEST_PATH', './data/blog_manifest.jsonl')  # 文章元数据清单，启动时免去逐篇解析
+BLOG_RENDER_CACHE_SIZE = int(os.getenv('BLOG_RENDER_CACHE_SIZE', '128'))  # Markdown 渲染缓存最大条目数
+BLOG_RELATED_TOP_K = int(os.getenv('BLOG_RELATED_TOP_K', '5'))  # 每篇文章预先计算的相关文章数
+BLOG_INDEX_SCAN_INTERVAL = int(os.getenv('BLOG_INDEX_SCAN_INTERVAL', '10'))  # 文章索引目录扫描间隔（秒），0 表示不扫描
+BLOG_IO_WORKERS = int(os.getenv('BLOG_IO_WORKERS', '4'))  # 博客文件读写线程池大小
+BLOG_ARCHIVE_MAX_BYTES = int(os.getenv('BLOG_ARCHIVE_MAX_BYTES', str(1024 * 1024 * 1024)))  # 导入包解压后的最大总字节数
+
+# 站点配置（RSS / Atom / Sitemap）
+SITE_URL = os.getenv('SITE_URL', 'http://localhost:3000').rstrip('/')  # 前端站点地址，用于生成文章链接
+SITE_TITLE = os.getenv('SITE_TITLE', '枫叶物语')  # 站点标题
+SITE_DESCRIPTION = os.getenv('SITE_DESCRIPTION', '分享有趣的工具，记录生活点滴')  # 站点描述
+BLOG_FEED_SIZE = int(os.getenv('BLOG_FEED_SIZE', '20'))  # RSS / Atom 中的文章数
+BLOG_FEED_CACHE_PATH = os.getenv('BLOG_FEED_CACHE_PATH', './data/blog_feeds.json')  # 订阅源片段缓存文件
+
+# 图片存储配置（内容寻址，按 SHA-256 去重，URL 永久不变）
+MEDIA_STORE_DIR = os.getenv('MEDIA_STORE_DIR', '../frontend/public/images/store')  # 图片存储目录，对应 URL /images/store
+STATIC_IMAGE_MAX_AGE = int(os.getenv('STATIC_IMAGE_MAX_AGE', '86400'))  # /images/blog 与 /images/life 的浏览器缓存时间（秒），/images/store 固定为 immutable
+MEDIA_GC_INTERVAL = float(os.getenv('MEDIA_GC_INTERVAL', '3600'))  # 图片目录与引用对账间隔（秒），0 表示只处理删除队列
+MEDIA_GC_GRACE_SECONDS = float(os.getenv('MEDIA_GC_GRACE_SECONDS', '86400'))  # 修改时间在该时长内的文件不回收（秒）
+MEDIA_GC_BATCH_SIZE = int(os.getenv('MEDIA_GC_BATCH_SIZE', '100'))  # 每批删除的文件数
+MEDIA_GC_BATCH_PAUSE = float(os.getenv('MEDIA_GC_BATCH_PAUSE', '0.2'))  # 批次之间的暂停时间（秒）
 
 # 生活模块API配置
 LIFE_API_KEY = os.getenv('LIFE_API_KEY', BLOG_API_KEY)  # 生活模块API密钥，默认使用博客API密钥
 LIFE_IMAGES_DIR = os.getenv('LIFE_IMAGES_DIR', '../frontend/public/images/life')  # 生活照片目录
+LIFE_CACHE_TTL = float(os.getenv('LIFE_CACHE_TTL', '300'))  # 公开接口响应缓存有效期（秒）
+LIFE_CACHE_MAX_BYTES = int(os.getenv('LIFE_CACHE_MAX_BYTES', str(8 * 1024 * 1024)))  # 响应缓存最大总字节数
+LIKES_FLUSH_INTERVAL = float(os.getenv('LIKES_FLUSH_INTERVAL', '5'))  # 点赞增量批量写入间隔（秒）
+LIKES_MAX_PENDING = int(os.getenv('LIKES_MAX_PENDING', '1000'))  # 待写入的点赞变更数达到该值时立即写入
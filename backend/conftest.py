@@ -0,0 +1,3 @@
+"""
+pytest 配置：测试从 backend 目录导入模块（与运行服务时的工作目录一致）
+"""
@@ -3,7 +3,9 @@
 使用 SQLAlchemy 异步模式 + SQLite
 """
 
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, desc
+from sqlalchemy import (
+    Column, Integer, String, Text, DateTime, ForeignKey, UniqueConstraint, Index, desc, inspect, text
+)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
@@ -53,6 +55,7 @@ class Repo(Base):
     created_at = Column(String(50), nullable=False)  # 仓库创建时间
     default_branch = Column(String(50), default="main")  # 默认分支
     commit_count = Column(Integer, default=0)  # 默认分支commit总数
+    commit_pushed_at = Column(String(50), nullable=True)  # commit 数对应的推送时间，与 pushed_at 不同时重新获取
     owner_id = Column(Integer, ForeignKey("user_info.id"), nullable=False)  # 关联用户表
 
     # 关联：多个仓库属于一个用户
@@ -96,9 +99,24 @@ class SyncStatus(Base):
     total_commits = Column(Integer, nullable=True)  # 本次同步的总commit数
 
 
+class GitHubResponseCache(Base):
+    """GitHub API 响应缓存（ETag / Last-Modified 与上次的响应体，用于条件请求）"""
+    __tablename__ = "github_response_cache"
+
+    url = Column(String(500), primary_key=True)  # 请求 URL
+    etag = Column(String(255), nullable=True)  # 响应的 ETag
+    last_modified = Column(String(64), nullable=True)  # 响应的 Last-Modified
+    payload = Column(Text, nullable=False)  # 响应体（JSON）
+    link = Column(Text, nullable=True)  # 响应的 Link 头（分页）
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)  # 响应体更新时间
+
+
 class LifePhoto(Base):
     """生活照片表"""
     __tablename__ = "life_photo"
+    __table_args__ = (
+        Index("ix_life_photo_date_id", "date", "id"),  # 列表按 (date, id) 倒序分页
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(100), nullable=False)  # 照片标题
@@ -121,6 +139,9 @@ class LifePhoto(Base):
 class LifePhotoImage(Base):
     """生活照片图片表"""
     __tablename__ = "life_photo_image"
+    __table_args__ = (
+        Index("ix_life_photo_image_photo_cover", "photo_id", "is_cover"),  # 按照片查找封面
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     photo_id = Column(Integer, ForeignKey("life_photo.id"), nullable=False)  # 关联照片
@@ -128,6 +149,14 @@ class LifePhotoImage(Base):
     filename = Column(String(255), nullable=False)  # 文件名
     is_cover = Column(Integer, default=0)  # 是否为封面图片，0否1是
     order = Column(Integer, default=0)  # 排序
+    thumb_url = Column(String(255), nullable=True)  # 缩略图URL（后台生成）
+    medium_url = Column(String(255), nullable=True)  # 中等尺寸图URL（后台生成）
+    webp_url = Column(String(255), nullable=True)  # WebP版本URL（后台生成）
+    width = Column(Integer, nullable=True)  # 显示宽度（像素，已按 EXIF 方向旋转，后台提取）
+    height = Column(Integer, nullable=True)  # 显示高度（像素）
+    byte_size = Column(Integer, nullable=True)  # 原图文件大小（字节）
+    taken_at = Column(String(20), nullable=True)  # EXIF 拍摄时间，格式：YYYY-MM-DDTHH:MM:SS
+    placeholder = Column(Text, nullable=True)  # 低清占位图（data URI，几百字节）
 
     # 关联：多张图片属于一个照片
     photo = relationship("LifePhoto", back_populates="images")
@@ -137,6 +166,55 @@ class LifePhotoImage(Base):
         return bool(self.is_cover)
 
 
+class LifePhotoLike(Base):
+    """生活照片点赞记录（每个客户端对每张照片最多一条）"""
+    __tablename__ = "life_photo_like"
+    __table_args__ = (
+        UniqueConstraint("photo_id", "client_key", name="uq_life_photo_like_photo_client"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    photo_id = Column(Integer, ForeignKey("life_photo.id"), nullable=False)  # 关联照片
+    client_key = Column(String(64), nullable=False)  # 客户端标识（哈希）
+    created_at = Column(DateTime, default=datetime.now)  # 点赞时间
+
+
+class LifeTimelineMonth(Base):
+    """生活照片按月汇总（照片增删改时增量维护，避免每次请求全表分组）"""
+    __tablename__ = "life_timeline_month"
+
+    month = Column(String(7), primary_key=True)  # 月份，即日期的前 7 个字符：YYYY-MM
+    photo_count = Column(Integer, nullable=False, default=0)  # 该月照片数
+    first_photo_id = Column(Integer, nullable=True)  # 该月在列表中排最前的照片（最新），月份封面取自该照片
+    first_date = Column(String(20), nullable=True)  # 该照片的日期（用于生成列表游标）
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)  # 更新时间
+
+
+class MediaObject(Base):
+    """内容寻址存储中的图片对象（按 SHA-256 去重）"""
+    __tablename__ = "media_object"
+
+    sha256 = Column(String(64), primary_key=True)  # 内容哈希
+    ext = Column(String(10), nullable=False)  # 扩展名（含点）
+    size = Column(Integer, nullable=False)  # 文件大小（字节）
+    ref_count = Column(Integer, default=0)  # 引用计数
+    created_at = Column(DateTime, default=datetime.now)  # 首次上传时间
+
+
+class MediaRef(Base):
+    """图片对象的引用记录"""
+    __tablename__ = "media_ref"
+    __table_args__ = (
+        UniqueConstraint("sha256", "owner", name="uq_media_ref_sha256_owner"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String(64), ForeignKey("media_object.sha256"), nullable=False, index=True)  # 图片对象
+    owner = Column(String(255), nullable=False, index=True)  # 引用方，如 life_image:12、blog:slug、blog_upload:slug
+    filename = Column(String(255), nullable=True)  # 上传时的原始文件名（用于展示）
+    created_at = Column(DateTime, default=datetime.now)  # 引用时间
+
+
 # 4. 数据库依赖（获取异步会话）
 async def get_db():
     async with AsyncSessionLocal() as session:
@@ -147,10 +225,39 @@ async def get_db():
 
 
 # 5. 初始化数据库表结构
+def _add_missing_columns(sync_conn):
+    """为已存在的表补充新增的列（create_all 不会修改已有表）"""
+    inspector = inspect(sync_conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=sync_conn.dialect)
+            sync_conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}'))
+            print(f"数据库迁移：{table.name} 新增列 {column.name}")
+
+
+def _create_missing_indexes(sync_conn):
+    """为已存在的表补建新增的索引（create_all 只为新建的表创建索引）"""
+    inspector = inspect(sync_conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(sync_conn, checkfirst=True)
+                print(f"数据库迁移：{table.name} 新增索引 {index.name}")
+
+
 async def init_db():
-    from sqlalchemy import text
     async with engine.begin() as conn:
         # 启用WAL模式，提高并发写入性能
         await conn.execute(text("PRAGMA journal_mode=WAL"))
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_add_missing_columns)
+        await conn.run_sync(_create_missing_indexes)
     print("数据库表结构初始化完成！")
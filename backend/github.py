@@ -1,13 +1,17 @@
 """
 GitHub 数据同步模块
 - 定时从 GitHub API 拉取数据
-- 存储到本地 SQLite 数据库
+- 增量存储到本地 SQLite 数据库（只写入有变化的仓库）
 - 提供 API 从数据库返回数据
 """
 
+import time
+import asyncio
 import traceback
 from fastapi import Depends, HTTPException, APIRouter
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 import aiohttp
@@ -19,9 +23,10 @@ from typing import Optional
 
 from db import init_db, get_db, UserInfo, Repo, SyncStatus, AsyncSessionLocal
 from config import (
-    GITHUB_USERNAME, GITHUB_TOKEN, FETCH_INTERVAL_HOURS,
+    GITHUB_USERNAME, FETCH_INTERVAL_HOURS, GITHUB_SYNC_CONCURRENCY,
     GITHUB_REST_API
 )
+from github_client import ConditionalCache, GitHubAPIError, fetch_rest_api, github_stats
 
 # 路由和日志配置
 router = APIRouter(prefix="/api/github", tags=["GitHub"])
@@ -35,166 +40,253 @@ scheduler: Optional[AsyncIOScheduler] = None
 # ------------------------------
 # GitHub API 请求工具
 # ------------------------------
-def get_github_headers() -> dict:
-    """获取GitHub API请求头"""
-    headers = {
-        "Accept": "application/vnd.github.v3+json",
-        "User-Agent": "MapleStory-Website"
-    }
-    # 只有当 token 是有效的非空字符串时才添加认证头
-    if GITHUB_TOKEN and GITHUB_TOKEN.strip():
-        headers["Authorization"] = f"token {GITHUB_TOKEN.strip()}"
-    return headers
-
-
-async def fetch_rest_api(session: aiohttp.ClientSession, url: str) -> dict:
-    """异步请求GitHub REST API"""
-    try:
-        async with session.get(url, headers=get_github_headers(), timeout=15) as resp:
-            if resp.status != 200:
-                raise Exception(f"HTTP {resp.status}: {await resp.text()}")
-
-            link_header = resp.headers.get("Link")
-            data = await resp.json()
-            return {
-                "data": data,
-                "link": link_header
-            }
-    except Exception as e:
-        logger.error(f"REST请求失败（{url}）: {str(e)}")
-        raise
+def commit_count_url(repo: dict) -> str:
+    """仓库默认分支上用户 commit 列表的 URL（每页 1 条，最后一页的页码即总数）"""
+    default_branch = repo.get("default_branch", "main")
+    return f"{GITHUB_REST_API}/repos/{repo['full_name']}/commits?sha={default_branch}&per_page=1&author={GITHUB_USERNAME}"
+
+
+async def fetch_commit_count(
+    session: aiohttp.ClientSession,
+    repo: dict,
+    semaphore: asyncio.Semaphore,
+    cache: ConditionalCache
+) -> Optional[int]:
+    """获取仓库默认分支上用户的 commit 数，失败时返回 None"""
+    async with semaphore:
+        try:
+            commit_resp = await fetch_rest_api(session, commit_count_url(repo), cache)
+        except GitHubAPIError as e:
+            # 409：空仓库，没有任何 commit
+            if e.status == 409:
+                return 0
+            logger.debug(traceback.format_exc())
+            return None
+        except Exception:
+            logger.debug(traceback.format_exc())
+            return None
+
+    link_header = commit_resp.get('link', '')
+    if link_header and 'rel="last"' in link_header:
+        last_page = link_header.split("page=")[-1].split(">")[0]
+        return int(last_page)
+    if commit_resp.get('data'):
+        return 1
+    return 0
 
 
 # ------------------------------
 # 核心同步逻辑
 # ------------------------------
+# 与数据库比较的字段（任一字段变化时写入）
+USER_FIELDS = (
+    "name", "avatar_url", "bio", "location", "blog", "html_url",
+    "public_repos", "followers", "following"
+)
+REPO_FIELDS = (
+    "name", "description", "html_url", "language", "stargazers_count", "forks_count",
+    "updated_at", "created_at", "pushed_at", "default_branch", "commit_count", "commit_pushed_at"
+)
+
+
+async def load_existing(db: AsyncSession, login: str):
+    """读取库中已有的用户与仓库（转为字典，之后结束读事务，不在网络请求期间持有）"""
+    user = (await db.execute(
+        select(*UserInfo.__table__.columns).where(UserInfo.login == login)
+    )).mappings().first()
+    repos = (await db.execute(select(*Repo.__table__.columns))).mappings().all()
+    return (dict(user) if user else None), {repo["github_repo_id"]: dict(repo) for repo in repos}
+
+
+def needs_commit_count(repo: dict, existing: Optional[dict]) -> bool:
+    """新仓库、有新推送、默认分支变化或上次获取失败时才重新获取 commit 数"""
+    if existing is None:
+        return True
+    return (
+        existing["commit_pushed_at"] != repo["pushed_at"]
+        or existing["default_branch"] != repo.get("default_branch", "main")
+    )
+
+
+def changed_fields(incoming: dict, existing: Optional[dict], fields) -> bool:
+    return existing is None or any(incoming[field] != existing[field] for field in fields)
+
+
 async def sync_github_to_db(db: AsyncSession) -> None:
-    """从GitHub拉取数据，写入数据库"""
+    """
+    从GitHub拉取数据，增量写入数据库
+    - 按 github_repo_id 与已有数据比较，只写入有变化的仓库，只删除已不存在的仓库
+    - 只为有新推送的仓库重新获取 commit 数
+    - 网络请求期间不持有事务，全部写入在一个短事务中完成
+    """
     if not GITHUB_USERNAME:
         logger.error('GITHUB_USERNAME缺失，请在config.py中设置')
         return
 
     sync_status = SyncStatus(sync_time=datetime.now(), status="processing")
+    started = time.perf_counter()
+    commit_elapsed = 0.0
+    repo_count = 0
+    commit_fetches = 0
+    changed_count = 0
+    removed_count = 0
+    # 条件请求缓存：未变化的数据返回 304，复用上次的响应体
+    cache = ConditionalCache()
 
     try:
+        await cache.load(db)
+        existing_user, existing_repos = await load_existing(db, GITHUB_USERNAME)
+        await db.rollback()
+
         async with aiohttp.ClientSession() as session:
             # 1. 拉取用户信息
             user_raw = await fetch_rest_api(
                 session,
-                f"{GITHUB_REST_API}/users/{GITHUB_USERNAME}"
+                f"{GITHUB_REST_API}/users/{GITHUB_USERNAME}",
+                cache
             )
             user_raw = user_raw['data']
 
             # 2. 拉取仓库列表
             repos_raw = await fetch_rest_api(
                 session,
-                f"{GITHUB_REST_API}/users/{GITHUB_USERNAME}/repos?sort=pushed&per_page=100"
+                f"{GITHUB_REST_API}/users/{GITHUB_USERNAME}/repos?sort=pushed&per_page=100",
+                cache
             )
             repos_raw = repos_raw['data']
             # 过滤掉 fork 的仓库
             repos_raw = [repo for repo in repos_raw if not repo.get("fork", False)]
 
-            # 3. 批量获取每个仓库的 commit 数
-            repo_commit_tasks = []
+            # 3. 并发获取有新推送的仓库的 commit 数（信号量限制同时进行的请求数）
+            repo_count = len(repos_raw)
+            stale = [repo for repo in repos_raw if needs_commit_count(repo, existing_repos.get(repo["id"]))]
+            stale_ids = {repo["id"] for repo in stale}
             for repo in repos_raw:
-                repo_full_name = repo["full_name"]
-                default_branch = repo.get("default_branch", "main")
-                task = fetch_rest_api(
-                    session,
-                    f"{GITHUB_REST_API}/repos/{repo_full_name}/commits?sha={default_branch}&per_page=1&author={GITHUB_USERNAME}"
-                )
-                repo_commit_tasks.append((repo, task))
-
-            # 处理仓库 commit 数结果
-            repos_processed = []
-            total_commits = 0
-            for repo, task in repo_commit_tasks:
-                try:
-                    commit_resp = await task
-                    link_header = commit_resp.get('link', '')
-                    commit_count = 0
-                    if link_header and 'rel="last"' in link_header:
-                        last_page = link_header.split("page=")[-1].split(">")[0]
-                        commit_count = int(last_page)
-                    elif commit_resp.get('data'):
-                        commit_count = 1
-                except Exception:
-                    logger.debug(traceback.format_exc())
-                    commit_count = 0
-
-                total_commits += commit_count
-                repos_processed.append({
-                    "github_repo_id": repo["id"],
-                    "name": repo["name"],
-                    "description": repo.get("description"),
-                    "html_url": repo["html_url"],
-                    "language": repo.get("language"),
-                    "stargazers_count": repo["stargazers_count"],
-                    "forks_count": repo["forks_count"],
-                    "updated_at": repo["updated_at"],
-                    "created_at": repo["created_at"],
-                    "pushed_at": repo["pushed_at"],
-                    "default_branch": repo.get("default_branch", "main"),
-                    "commit_count": commit_count
-                })
-
-            # 4. 写入数据库（先删旧数据，再插入新数据）
-            old_user = await db.execute(
-                select(UserInfo).where(UserInfo.login == GITHUB_USERNAME)
+                if repo["id"] not in stale_ids:
+                    # 未请求的 URL 仍保留条件请求缓存
+                    cache.keep(commit_count_url(repo))
+            commit_fetches = len(stale)
+            semaphore = asyncio.Semaphore(GITHUB_SYNC_CONCURRENCY)
+            commit_started = time.perf_counter()
+            fetched = await asyncio.gather(
+                *[fetch_commit_count(session, repo, semaphore, cache) for repo in stale]
             )
-            old_user = old_user.scalars().first()
-            if old_user:
-                await db.delete(old_user)
-                await db.flush()
-
-            # 插入新用户信息
-            new_user = UserInfo(
-                login=user_raw["login"],
-                name=user_raw.get("name"),
-                avatar_url=user_raw["avatar_url"],
-                bio=user_raw.get("bio"),
-                location=user_raw.get("location"),
-                blog=user_raw.get("blog"),
-                html_url=user_raw["html_url"],
-                public_repos=user_raw["public_repos"],
-                followers=user_raw.get("followers", 0),
-                following=user_raw.get("following", 0),
-                updated_at=datetime.now()
+            commit_elapsed = time.perf_counter() - commit_started
+        fresh_counts = {repo["id"]: count for repo, count in zip(stale, fetched)}
+
+        # 处理仓库数据（获取失败时沿用旧的 commit 数，不记录推送时间，下次同步重试）
+        repos_processed = []
+        total_commits = 0
+        for repo in repos_raw:
+            existing = existing_repos.get(repo["id"])
+            commit_count = fresh_counts.get(repo["id"])
+            if repo["id"] not in fresh_counts:
+                commit_count, commit_pushed_at = existing["commit_count"], existing["commit_pushed_at"]
+            elif commit_count is None:
+                commit_count = existing["commit_count"] if existing else 0
+                commit_pushed_at = None
+            else:
+                commit_pushed_at = repo["pushed_at"]
+            total_commits += commit_count
+            repos_processed.append({
+                "github_repo_id": repo["id"],
+                "name": repo["name"],
+                "description": repo.get("description"),
+                "html_url": repo["html_url"],
+                "language": repo.get("language"),
+                "stargazers_count": repo["stargazers_count"],
+                "forks_count": repo["forks_count"],
+                "updated_at": repo["updated_at"],
+                "created_at": repo["created_at"],
+                "pushed_at": repo["pushed_at"],
+                "default_branch": repo.get("default_branch", "main"),
+                "commit_count": commit_count,
+                "commit_pushed_at": commit_pushed_at
+            })
+
+        user_values = {
+            "name": user_raw.get("name"),
+            "avatar_url": user_raw["avatar_url"],
+            "bio": user_raw.get("bio"),
+            "location": user_raw.get("location"),
+            "blog": user_raw.get("blog"),
+            "html_url": user_raw["html_url"],
+            "public_repos": user_raw["public_repos"],
+            "followers": user_raw.get("followers", 0),
+            "following": user_raw.get("following", 0)
+        }
+
+        # 4. 写入数据库（一个短事务：首条语句即为写入，避免读后写时快照过期）
+        if changed_fields(user_values, existing_user, USER_FIELDS):
+            values = {**user_values, "login": user_raw["login"], "updated_at": datetime.now()}
+            await db.execute(
+                sqlite_insert(UserInfo)
+                .values(**values)
+                .on_conflict_do_update(index_elements=["login"], set_=values)
             )
-            db.add(new_user)
-            await db.flush()
-
-            # 插入新仓库信息
-            for repo in repos_processed:
-                new_repo = Repo(
-                    github_repo_id=repo["github_repo_id"],
-                    name=repo["name"],
-                    description=repo["description"],
-                    html_url=repo["html_url"],
-                    language=repo["language"],
-                    stargazers_count=repo["stargazers_count"],
-                    forks_count=repo["forks_count"],
-                    updated_at=repo["updated_at"],
-                    created_at=repo["created_at"],
-                    pushed_at=repo["pushed_at"],
-                    default_branch=repo["default_branch"],
-                    commit_count=repo["commit_count"],
-                    owner_id=new_user.id
-                )
-                db.add(new_repo)
-
-            # 5. 记录同步成功状态
-            sync_status.status = "success"
-            sync_status.message = "数据同步完成"
-            sync_status.total_commits = total_commits
-            logger.info(f"同步成功：总commit={total_commits}")
+            owner_id = (await db.execute(
+                select(UserInfo.id).where(UserInfo.login == user_raw["login"])
+            )).scalar_one()
+        else:
+            owner_id = existing_user["id"]
+
+        changed = [
+            {**repo, "owner_id": owner_id} for repo in repos_processed
+            if changed_fields(repo, existing_repos.get(repo["github_repo_id"]), REPO_FIELDS)
+            or existing_repos[repo["github_repo_id"]]["owner_id"] != owner_id
+        ]
+        changed_count = len(changed)
+        if changed:
+            stmt = sqlite_insert(Repo).values(changed)
+            await db.execute(stmt.on_conflict_do_update(
+                index_elements=["github_repo_id"],
+                set_={field: stmt.excluded[field] for field in (*REPO_FIELDS, "owner_id")}
+            ))
+
+        incoming_ids = {repo["github_repo_id"] for repo in repos_processed}
+        vanished = [repo_id for repo_id in existing_repos if repo_id not in incoming_ids]
+        removed_count = len(vanished)
+        if vanished:
+            await db.execute(delete(Repo).where(Repo.github_repo_id.in_(vanished)))
+
+        # 5. 写回条件请求缓存（清除已不再请求的 URL，如已删除的仓库）
+        await cache.save(db, prune=True)
+
+        # 6. 记录同步成功状态
+        elapsed = time.perf_counter() - started
+        sync_status.status = "success"
+        sync_status.message = (
+            f"数据同步完成（{repo_count} 个仓库，更新 {changed_count}，删除 {removed_count}，"
+            f"耗时 {elapsed:.1f} 秒）"
+        )
+        sync_status.total_commits = total_commits
+        cache_summary = cache.summary()
+        logger.info(
+            f"同步成功：总commit={total_commits}，{repo_count} 个仓库（更新 {changed_count}，删除 {removed_count}），"
+            f"耗时 {elapsed:.2f} 秒（{commit_fetches} 个仓库的 commit 数 {commit_elapsed:.2f} 秒，"
+            f"并发 {GITHUB_SYNC_CONCURRENCY}），304 命中 {cache_summary['not_modified']}/{cache_summary['requests']}"
+        )
 
     except Exception as e:
+        # 丢弃未提交的写入，已有数据保持不变
+        await db.rollback()
         sync_status.status = "failed"
         sync_status.message = str(e)
         logger.error(f"同步失败: {str(e)}")
         logger.error(traceback.format_exc())
 
+    github_stats.record_sync(
+        status=sync_status.status,
+        started_at=sync_status.sync_time.isoformat(),
+        repos=repo_count,
+        changed=changed_count,
+        removed=removed_count,
+        commit_fetches=commit_fetches,
+        concurrency=GITHUB_SYNC_CONCURRENCY,
+        commit_fetch_ms=round(commit_elapsed * 1000, 3),
+        duration_ms=round((time.perf_counter() - started) * 1000, 3),
+        cache=cache.summary(),
+    )
     db.add(sync_status)
     await db.commit()
 
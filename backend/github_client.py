@@ -0,0 +1,311 @@
+"""
+GitHub REST API 请求
+- 限流（403 / 429）、5xx 与网络错误按带抖动的指数退避重试
+- 服务端给出 Retry-After 或 X-RateLimit-Reset 时按其等待；要求的等待超过上限时直接放弃，不阻塞同步
+- 条件请求：每个 URL 的 ETag / Last-Modified 与响应体保存在数据库中，下次同步带上 If-None-Match /
+  If-Modified-Since，304 时复用保存的响应体（304 不计入 GitHub 的请求限额）
+- 记录每次请求的耗时、状态码、重试与失败次数，以及每次同步的总耗时与缓存命中率
+"""
+
+import json
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Set
+
+import aiohttp
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import (
+    GITHUB_TOKEN, GITHUB_REQUEST_TIMEOUT, GITHUB_MAX_RETRIES, GITHUB_BACKOFF_BASE, GITHUB_BACKOFF_MAX
+)
+from db import GitHubResponseCache
+
+logger = logging.getLogger("github_sync")
+
+# 可重试的状态码（403 仅在限流时重试）
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# 计算延迟分位数时保留的最近请求数
+LATENCY_WINDOW = 500
+
+
+class GitHubAPIError(Exception):
+    """GitHub API 请求失败"""
+
+    def __init__(self, status: Optional[int], message: str):
+        super().__init__(f"HTTP {status}: {message}" if status else message)
+        self.status = status
+
+
+def get_github_headers() -> dict:
+    """获取GitHub API请求头"""
+    headers = {
+        "Accept": "application/vnd.github.v3+json",
+        "User-Agent": "MapleStory-Website"
+    }
+    # 只有当 token 是有效的非空字符串时才添加认证头
+    if GITHUB_TOKEN and GITHUB_TOKEN.strip():
+        headers["Authorization"] = f"token {GITHUB_TOKEN.strip()}"
+    return headers
+
+
+# ========== 退避 ==========
+
+def requested_delay(headers, now: Optional[float] = None) -> Optional[float]:
+    """服务端要求的等待秒数（Retry-After 优先，其次为额度耗尽时的 X-RateLimit-Reset）"""
+    now = time.time() if now is None else now
+    retry_after = headers.get('Retry-After')
+    if retry_after:
+        try:
+            return max(float(retry_after), 0.0)
+        except ValueError:
+            try:
+                return max(parsedate_to_datetime(retry_after).timestamp() - now, 0.0)
+            except (TypeError, ValueError):
+                pass
+    if headers.get('X-RateLimit-Remaining') == '0' and headers.get('X-RateLimit-Reset'):
+        try:
+            # 多等 1 秒，避免本机与 GitHub 的时钟误差
+            return max(float(headers['X-RateLimit-Reset']) - now, 0.0) + 1
+        except ValueError:
+            pass
+    return None
+
+
+def is_retryable(status: int, headers) -> bool:
+    """403 只有在限流时才重试（权限不足等错误重试无意义）"""
+    if status in RETRY_STATUSES:
+        return True
+    return status == 403 and (
+        headers.get('X-RateLimit-Remaining') == '0' or 'Retry-After' in headers
+    )
+
+
+def backoff_delay(attempt: int) -> float:
+    """全抖动指数退避：在 [0, min(上限, 基数 × 2^attempt)] 中随机取值，避免并发请求同时重试"""
+    return random.uniform(0, min(GITHUB_BACKOFF_MAX, GITHUB_BACKOFF_BASE * 2 ** attempt))
+
+
+# ========== 统计 ==========
+
+class GitHubStats:
+    """请求与同步统计（仅在事件循环线程中使用）"""
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.statuses: Dict[str, int] = {}
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self._recent = deque(maxlen=LATENCY_WINDOW)
+        self.last_sync: Optional[dict] = None
+
+    def record_request(self, elapsed: float, status: Optional[int]) -> None:
+        self.requests += 1
+        key = str(status) if status is not None else 'error'
+        self.statuses[key] = self.statuses.get(key, 0) + 1
+        self.latency_total += elapsed
+        self.latency_max = max(self.latency_max, elapsed)
+        self._recent.append(elapsed)
+
+    def record_sync(self, **values) -> None:
+        self.last_sync = values
+
+    def _percentile(self, ratio: float) -> float:
+        if not self._recent:
+            return 0.0
+        ordered = sorted(self._recent)
+        return ordered[min(int(len(ordered) * ratio), len(ordered) - 1)]
+
+    def snapshot(self) -> dict:
+        answered = self.statuses.get('200', 0) + self.statuses.get('304', 0)
+        return {
+            'requests': self.requests,
+            'retries': self.retries,
+            'failures': self.failures,
+            'statuses': dict(self.statuses),
+            # 成功请求中由条件请求命中（304）的比例
+            'not_modified_ratio': round(self.statuses.get('304', 0) / answered, 4) if answered else 0.0,
+            'latency': {
+                'avg_ms': round(self.latency_total / self.requests * 1000, 3) if self.requests else 0.0,
+                'p50_ms': round(self._percentile(0.5) * 1000, 3),
+                'p95_ms': round(self._percentile(0.95) * 1000, 3),
+                'max_ms': round(self.latency_max * 1000, 3),
+            },
+            'last_sync': self.last_sync,
+        }
+
+
+github_stats = GitHubStats()
+
+
+# ========== 条件请求缓存 ==========
+
+class ConditionalCache:
+    """
+    一次同步使用的响应缓存（仅在事件循环线程中使用）
+    同步开始时从数据库整体载入，请求期间只读写内存，结束时写回有变化的条目，
+    并发请求不会共享数据库会话
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, dict] = {}
+        self._dirty: Set[str] = set()
+        self._used: Set[str] = set()
+        self.requests = 0  # 成功的请求数（200 或 304）
+        self.conditional = 0  # 其中带验证头发出的请求数
+        self.not_modified = 0  # 命中（304）的请求数
+
+    async def load(self, db: AsyncSession) -> None:
+        result = await db.execute(select(GitHubResponseCache))
+        for row in result.scalars().all():
+            self._entries[row.url] = {
+                'etag': row.etag,
+                'last_modified': row.last_modified,
+                'payload': row.payload,
+                'link': row.link,
+            }
+
+    def validators(self, url: str) -> dict:
+        """条件请求头（没有缓存时为空）"""
+        # 请求失败的 URL 也保留缓存，下次同步仍可发起条件请求
+        self._used.add(url)
+        entry = self._entries.get(url)
+        if not entry:
+            return {}
+        headers = {}
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def keep(self, url: str) -> None:
+        """本次同步未请求但仍需保留的 URL（如无新推送、跳过获取 commit 数的仓库）"""
+        self._used.add(url)
+
+    def hit(self, url: str) -> Optional[dict]:
+        """304 时取出保存的响应"""
+        entry = self._entries.get(url)
+        if not entry:
+            return None
+        self.requests += 1
+        self.conditional += 1
+        self.not_modified += 1
+        return {"data": json.loads(entry['payload']), "link": entry['link']}
+
+    def store(self, url: str, headers, data, link: Optional[str], conditional: bool = False) -> None:
+        """保存 200 响应（没有验证头的响应无法发起条件请求，不保存）"""
+        self.requests += 1
+        self.conditional += conditional
+        etag, last_modified = headers.get('ETag'), headers.get('Last-Modified')
+        if not etag and not last_modified:
+            if self._entries.pop(url, None) is not None:
+                self._dirty.add(url)
+            return
+        self._entries[url] = {
+            'etag': etag,
+            'last_modified': last_modified,
+            'payload': json.dumps(data, ensure_ascii=False),
+            'link': link,
+        }
+        self._dirty.add(url)
+
+    async def save(self, db: AsyncSession, prune: bool = False) -> None:
+        """写回有变化的条目；prune 时删除本次同步未请求的 URL（如已删除的仓库），调用方负责提交事务"""
+        for url in sorted(self._dirty):
+            entry = self._entries.get(url)
+            if entry is None:
+                await db.execute(delete(GitHubResponseCache).where(GitHubResponseCache.url == url))
+                continue
+            values = {**entry, 'updated_at': datetime.now()}
+            await db.execute(
+                sqlite_insert(GitHubResponseCache)
+                .values(url=url, **values)
+                .on_conflict_do_update(index_elements=['url'], set_=values)
+            )
+        self._dirty.clear()
+        if prune:
+            await db.execute(delete(GitHubResponseCache).where(GitHubResponseCache.url.notin_(self._used)))
+
+    def summary(self) -> dict:
+        return {
+            'requests': self.requests,
+            'conditional': self.conditional,
+            'not_modified': self.not_modified,
+            'hit_ratio': round(self.not_modified / self.requests, 4) if self.requests else 0.0,
+        }
+
+
+# ========== 请求 ==========
+
+async def fetch_rest_api(
+    session: aiohttp.ClientSession,
+    url: str,
+    cache: Optional[ConditionalCache] = None
+) -> dict:
+    """异步请求GitHub REST API，返回 {"data": 响应 JSON, "link": Link 头}；传入 cache 时发起条件请求"""
+    attempt = 0
+    while True:
+        started = time.perf_counter()
+        headers = get_github_headers()
+        validators = cache.validators(url) if cache else {}
+        headers.update(validators)
+        try:
+            async with session.get(
+                url,
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=GITHUB_REQUEST_TIMEOUT)
+            ) as resp:
+                status = resp.status
+                if status == 304 and validators:
+                    github_stats.record_request(time.perf_counter() - started, status)
+                    return cache.hit(url)
+                if status == 200:
+                    data = await resp.json()
+                    github_stats.record_request(time.perf_counter() - started, status)
+                    link = resp.headers.get("Link")
+                    if cache:
+                        cache.store(url, resp.headers, data, link, conditional=bool(validators))
+                    return {
+                        "data": data,
+                        "link": link
+                    }
+                body = await resp.text()
+                github_stats.record_request(time.perf_counter() - started, status)
+                if not is_retryable(status, resp.headers):
+                    raise GitHubAPIError(status, body)
+                error = GitHubAPIError(status, body)
+                delay = requested_delay(resp.headers)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            github_stats.record_request(time.perf_counter() - started, None)
+            error = GitHubAPIError(None, f"{type(e).__name__}: {str(e)}")
+            delay = None
+        except GitHubAPIError as e:
+            github_stats.failures += 1
+            logger.error(f"REST请求失败（{url}）: {str(e)[:200]}")
+            raise
+
+        too_long = delay is not None and delay > GITHUB_BACKOFF_MAX
+        if delay is None:
+            delay = backoff_delay(attempt)
+        else:
+            # 服务端指定的等待时间同样加入抖动，避免并发请求在同一时刻重试
+            delay += random.uniform(0, GITHUB_BACKOFF_BASE)
+        if attempt >= GITHUB_MAX_RETRIES or too_long:
+            github_stats.failures += 1
+            logger.error(f"REST请求失败（{url}），已重试 {attempt} 次: {str(error)[:200]}")
+            raise error
+
+        attempt += 1
+        github_stats.retries += 1
+        logger.warning(f"REST请求失败（{url}）: {str(error)[:100]}，{delay:.1f} 秒后第 {attempt} 次重试")
+        await asyncio.sleep(delay)
@@ -0,0 +1,120 @@
+"""
+HTTP 条件请求（ETag / Last-Modified / 304）
+- 校验值由数据的版本信息（文件 mtime、大小等）计算，无需先序列化响应体
+- If-None-Match 优先于 If-Modified-Since（RFC 9110）
+- 304 响应不含响应体，轮询未变化的数据几乎不消耗 CPU 与带宽
+"""
+
+import hashlib
+import threading
+from datetime import timezone
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+
+def make_etag(*parts) -> str:
+    """由版本信息计算强 ETag"""
+    digest = hashlib.blake2b(repr(parts).encode('utf-8'), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+
+def http_date(timestamp: float) -> str:
+    """时间戳转换为 HTTP 日期格式"""
+    return formatdate(timestamp, usegmt=True)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match 使用弱比较"""
+    if header.strip() == '*':
+        return True
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[float]) -> bool:
+    """客户端缓存是否仍然有效"""
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        # HTTP 日期只精确到秒
+        return int(last_modified) <= int(since.timestamp())
+    return False
+
+
+def accepts_gzip(request: Request) -> bool:
+    """客户端是否接受 gzip 编码（q=0 表示拒绝）"""
+    for item in request.headers.get('accept-encoding', '').split(','):
+        coding, _, params = item.strip().partition(';')
+        if coding.strip().lower() in ('gzip', '*'):
+            return params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
+
+
+# ========== 统计 ==========
+
+class ConditionalStats:
+    """条件请求统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.not_modified = 0  # 返回 304 的请求数
+        self.full = 0  # 返回完整响应的请求数
+
+    def record(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.not_modified += 1
+            else:
+                self.full += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            total = self.not_modified + self.full
+            return {
+                'not_modified': self.not_modified,
+                'full': self.full,
+                'hit_ratio': round(self.not_modified / total, 4) if total else 0.0,
+            }
+
+
+conditional_stats = ConditionalStats()
+
+
+def check_conditional(
+    request: Request,
+    response: Response,
+    etag: str,
+    last_modified: Optional[float] = None,
+    cache_control: str = 'no-cache'
+) -> Optional[Response]:
+    """
+    设置 ETag / Last-Modified 等缓存头
+    客户端缓存仍有效时返回 304 响应（调用方直接返回它），否则返回 None 并继续构建响应体
+    """
+    headers = {'ETag': etag, 'Cache-Control': cache_control}
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(last_modified)
+
+    if is_not_modified(request, etag, last_modified):
+        conditional_stats.record(True)
+        return Response(status_code=304, headers=headers)
+
+    conditional_stats.record(False)
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,318 @@
+"""
+图片衍生图生成
+- 上传后在后台生成缩略图（thumb）、中等尺寸（medium）和 WebP 版本
+- 同时提取元数据：宽高、文件大小、EXIF 拍摄时间与低清占位图（LQIP）
+- 任务进入队列后由工作协程提交到进程池执行，请求路径无需等待图片编码
+- 记录任务进度与失败信息，供管理接口查看
+"""
+
+import os
+import io
+import time
+import uuid
+import base64
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from config import IMAGE_JOB_WORKERS, IMAGE_JOB_HISTORY
+from workers import run_in_process
+
+logger = logging.getLogger("images")
+
+# 衍生图规格：名称 -> 最长边像素
+VARIANT_SIZES = {
+    'thumb': 320,
+    'medium': 1024,
+    'webp': 2048,
+}
+
+# 衍生图文件名中的分隔符（上传文件名经过清洗，不会包含该字符）
+VARIANT_SEPARATOR = '@'
+
+# 低清占位图的最长边像素（以 data URI 形式内联到接口响应中）
+PLACEHOLDER_EDGE = 16
+
+# 任务完成回调：(原图 URL, 衍生图 URL, 元数据)
+JobCallback = Callable[[str, Dict[str, str], dict], Awaitable[None]]
+
+
+# ========== 命名规则 ==========
+
+def variant_filename(filename: str, variant: str) -> str:
+    """
+    衍生图文件名
+    例：photo.jpg -> photo@thumb.jpg / photo@medium.jpg / photo@webp.webp
+    GIF 的缩略图保存为 PNG
+    """
+    stem, ext = os.path.splitext(filename)
+    if variant == 'webp':
+        ext = '.webp'
+    elif ext.lower() == '.gif':
+        ext = '.png'
+    return f"{stem}{VARIANT_SEPARATOR}{variant}{ext}"
+
+
+def variant_url(url: str, variant: str) -> str:
+    """原图 URL 对应的衍生图 URL"""
+    base, filename = url.rsplit('/', 1)
+    return f"{base}/{variant_filename(filename, variant)}"
+
+
+def variant_urls(url: str) -> Dict[str, str]:
+    """原图 URL 对应的全部衍生图 URL"""
+    return {variant: variant_url(url, variant) for variant in VARIANT_SIZES}
+
+
+def is_variant_file(filename: str) -> bool:
+    """是否为衍生图文件"""
+    return VARIANT_SEPARATOR in filename
+
+
+def remove_variants(path: str) -> None:
+    """删除原图对应的衍生图文件"""
+    directory, filename = os.path.split(path)
+    for variant in VARIANT_SIZES:
+        variant_path = os.path.join(directory, variant_filename(filename, variant))
+        if os.path.exists(variant_path):
+            os.remove(variant_path)
+
+
+# ========== 图片处理（在工作进程中执行） ==========
+
+def generate_variants(path: str) -> Dict[str, str]:
+    """
+    生成衍生图，返回 {规格: 文件名}
+    已按 EXIF 方向旋转；原图小于目标尺寸时不放大
+    """
+    from PIL import Image, ImageOps
+
+    directory, filename = os.path.split(path)
+    results = {}
+
+    missing = {}
+    for variant, max_edge in VARIANT_SIZES.items():
+        name = variant_filename(filename, variant)
+        if os.path.exists(os.path.join(directory, name)):
+            # 内容寻址存储中同一内容的衍生图不会变化，已生成的直接复用
+            results[variant] = name
+        else:
+            missing[variant] = max_edge
+    if not missing:
+        return results
+
+    with Image.open(path) as source:
+        image = ImageOps.exif_transpose(source)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+
+        for variant, max_edge in missing.items():
+            name = variant_filename(filename, variant)
+            target = os.path.join(directory, name)
+            resized = image.copy()
+            resized.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+            ext = os.path.splitext(name)[1].lower()
+            tmp_path = f"{target}.{uuid.uuid4().hex}.part"
+            if ext == '.webp':
+                resized.save(tmp_path, 'WEBP', quality=80, method=4)
+            elif ext in ('.jpg', '.jpeg'):
+                resized.convert('RGB').save(tmp_path, 'JPEG', quality=82, optimize=True, progressive=True)
+            else:
+                resized.save(tmp_path, 'PNG', optimize=True)
+            os.replace(tmp_path, target)
+            results[variant] = name
+
+    return results
+
+
+# EXIF 标签
+_EXIF_ORIENTATION = 0x0112
+_EXIF_DATETIME = 0x0132
+_EXIF_IFD = 0x8769
+_EXIF_DATETIME_ORIGINAL = 0x9003
+
+
+def _exif_datetime(value) -> Optional[str]:
+    """EXIF 时间（YYYY:MM:DD HH:MM:SS）转换为 ISO 格式，无法解析时返回 None"""
+    if not isinstance(value, str):
+        return None
+    value = value.strip().rstrip('\x00')
+    try:
+        date, clock = value.split(' ', 1)
+        year, month, day = (int(part) for part in date.split(':'))
+        hour, minute, second = (int(part) for part in clock.split(':')[:3])
+        if year < 1900:
+            return None
+        return f"{year:04d}-{month:02d}-{day:02d}T{hour:02d}:{minute:02d}:{second:02d}"
+    except ValueError:
+        return None
+
+
+def extract_metadata(path: str) -> dict:
+    """
+    提取图片元数据（在工作进程中执行）
+    返回 {"width", "height", "byte_size", "taken_at", "placeholder"}，宽高为按 EXIF 方向旋转后的显示尺寸
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(path) as source:
+        exif = source.getexif()
+        width, height = source.size
+        if exif.get(_EXIF_ORIENTATION) in (5, 6, 7, 8):
+            width, height = height, width
+        taken_at = _exif_datetime(exif.get_ifd(_EXIF_IFD).get(_EXIF_DATETIME_ORIGINAL)) \
+            or _exif_datetime(exif.get(_EXIF_DATETIME))
+
+        # JPEG 可在解码时直接缩小，避免为占位图解码整张大图
+        source.draft('RGB', (PLACEHOLDER_EDGE * 8, PLACEHOLDER_EDGE * 8))
+        tiny = ImageOps.exif_transpose(source)
+        tiny = tiny.convert('RGBA' if 'A' in tiny.getbands() else 'RGB')
+        tiny.thumbnail((PLACEHOLDER_EDGE, PLACEHOLDER_EDGE), Image.BILINEAR)
+        buffer = io.BytesIO()
+        tiny.save(buffer, 'WEBP', quality=40)
+
+    return {
+        'width': width,
+        'height': height,
+        'byte_size': os.path.getsize(path),
+        'taken_at': taken_at,
+        'placeholder': 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii'),
+    }
+
+
+def process_image(path: str) -> Tuple[Dict[str, str], dict]:
+    """生成衍生图并提取元数据（在工作进程中执行），返回 ({规格: 文件名}, 元数据)"""
+    return generate_variants(path), extract_metadata(path)
+
+
+# ========== 任务队列 ==========
+
+class ImageJob:
+    """衍生图生成任务"""
+
+    def __init__(self, path: str, url: str, on_done: Optional[JobCallback]):
+        self.id = uuid.uuid4().hex
+        self.path = path
+        self.url = url
+        self.callbacks = [on_done] if on_done else []  # 完成后的回调
+        self.status = 'pending'  # pending / running / done / failed
+        self.error: Optional[str] = None
+        self.variants: Dict[str, str] = {}  # 规格 -> URL
+        self.metadata: dict = {}  # 宽高、大小、拍摄时间、占位图
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'url': self.url,
+            'status': self.status,
+            'error': self.error,
+            'variants': self.variants,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+            'duration': round(self.finished_at - self.created_at, 3) if self.finished_at else None,
+        }
+
+
+class ImageJobQueue:
+    """衍生图任务队列"""
+
+    def __init__(self, workers: int, history: int):
+        self.worker_count = workers
+        self.history = history
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._jobs: "OrderedDict[str, ImageJob]" = OrderedDict()
+        self._active: Dict[str, ImageJob] = {}  # 未完成的任务
+        self.completed = 0
+        self.failed = 0
+
+    def submit(
+        self,
+        path: str,
+        url: str,
+        on_done: Optional[JobCallback] = None
+    ) -> str:
+        """提交任务（立即返回任务 ID，不等待处理）；同一文件已有未完成任务时合并"""
+        for job in self._active.values():
+            if job.path == path:
+                if on_done:
+                    job.callbacks.append(on_done)
+                return job.id
+
+        job = ImageJob(path, url, on_done)
+        self._jobs[job.id] = job
+        self._active[job.id] = job
+        while len(self._jobs) > self.history:
+            oldest_id, oldest = next(iter(self._jobs.items()))
+            if oldest.status in ('pending', 'running'):
+                break
+            self._jobs.pop(oldest_id)
+
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._queue.put_nowait(job)
+        return job.id
+
+    def get(self, job_id: str) -> Optional[ImageJob]:
+        return self._jobs.get(job_id)
+
+    async def _run(self, job: ImageJob) -> None:
+        job.status = 'running'
+        try:
+            names, job.metadata = await run_in_process(process_image, job.path)
+            job.variants = {variant: variant_url(job.url, variant) for variant in names}
+            for callback in job.callbacks:
+                await callback(job.url, job.variants, job.metadata)
+            job.status = 'done'
+            self.completed += 1
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            self.failed += 1
+            logger.error(f"衍生图生成失败（{job.url}）: {str(e)}")
+        finally:
+            job.finished_at = time.time()
+            self._active.pop(job.id, None)
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def start(self) -> None:
+        """启动工作协程"""
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        for _ in range(self.worker_count):
+            self._workers.append(asyncio.create_task(self._worker()))
+        logger.info(f"图片任务队列已启动，工作协程数：{self.worker_count}")
+
+    async def stop(self) -> None:
+        """停止工作协程（未完成的任务将被放弃）"""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+
+    def stats(self) -> dict:
+        """队列统计与最近失败的任务"""
+        statuses = [job.status for job in self._jobs.values()]
+        return {
+            'pending': statuses.count('pending'),
+            'running': statuses.count('running'),
+            'completed': self.completed,
+            'failed': self.failed,
+            'recent_failures': [
+                job.to_dict() for job in self._jobs.values() if job.status == 'failed'
+            ][-10:],
+        }
+
+
+image_jobs = ImageJobQueue(IMAGE_JOB_WORKERS, IMAGE_JOB_HISTORY)
@@ -5,18 +5,33 @@
 
 import os
 import re
-import shutil
 import json
+import base64
+import asyncio
+import hashlib
 from datetime import datetime
-from typing import Optional, List
-from fastapi import APIRouter, HTTPException, Header, UploadFile, File, Form, Depends
+from typing import Optional, List, Tuple
+from fastapi import APIRouter, HTTPException, Header, UploadFile, File, Form, Depends, Query, Request, Response
 from fastapi.responses import JSONResponse
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete, update
-
-from config import LIFE_API_KEY, LIFE_IMAGES_DIR
-from db import get_db, LifePhoto, LifePhotoImage
+from sqlalchemy import select, delete, update, func, and_, or_, case
+
+from config import (
+    LIFE_API_KEY, LIFE_IMAGES_DIR, LIFE_CACHE_TTL, LIFE_CACHE_MAX_BYTES,
+    UPLOAD_BATCH_MAX_FILES, UPLOAD_BATCH_CONCURRENCY, LIKES_FLUSH_INTERVAL, LIKES_MAX_PENDING
+)
+from db import get_db, LifePhoto, LifePhotoImage, LifePhotoLike, AsyncSessionLocal
+from uploads import validate_image_type
+from images import image_jobs
+from media_store import (
+    store_image, save_incoming, discard_incoming, place_object, record_object,
+    add_ref, remove_refs, delete_objects, parse_store_url
+)
+from response_cache import ResponseCache, CachedResponse
+from likes import LikeBuffer
+from media_gc import media_collector, find_image_urls
+from life_timeline import refresh_months, fetch_timeline, get_month
 
 router = APIRouter(prefix="/api/life", tags=["生活管理"])
 
@@ -29,6 +44,14 @@ class PhotoImage(BaseModel):
     url: str
     is_cover: bool
     order: int
+    thumb_url: Optional[str] = None  # 缩略图（最长边 320px）
+    medium_url: Optional[str] = None  # 中等尺寸（最长边 1024px）
+    webp_url: Optional[str] = None  # WebP 版本（最长边 2048px）
+    width: Optional[int] = None  # 以下元数据由后台提取，完成前为空
+    height: Optional[int] = None
+    byte_size: Optional[int] = None
+    taken_at: Optional[str] = None  # EXIF 拍摄时间
+    placeholder: Optional[str] = None  # 低清占位图（data URI）
 
 
 class PhotoCreate(BaseModel):
@@ -55,6 +78,7 @@ class PhotoResponse(BaseModel):
     content: Optional[str]
     date: str
     images: List[PhotoImage]
+    likes: int = 0  # 点赞数
     created_at: str
     updated_at: str
 
@@ -66,6 +90,88 @@ class PhotoListItem(BaseModel):
     description: Optional[str]
     date: str
     cover_image: Optional[str]
+    cover_thumb: Optional[str] = None
+    cover_medium: Optional[str] = None
+    cover_webp: Optional[str] = None
+    cover_width: Optional[int] = None
+    cover_height: Optional[int] = None
+    cover_byte_size: Optional[int] = None
+    cover_taken_at: Optional[str] = None
+    cover_placeholder: Optional[str] = None
+    likes: int = 0  # 点赞数
+
+
+class TimelineMonth(BaseModel):
+    """时间线中的一个月"""
+    month: str  # YYYY-MM
+    count: int
+    cursor: str  # 照片列表游标，从该月最新的照片开始
+    cover_image: Optional[str] = None  # 取自该月最新的照片
+    cover_thumb: Optional[str] = None
+    cover_width: Optional[int] = None
+    cover_height: Optional[int] = None
+    cover_placeholder: Optional[str] = None
+
+
+class TimelineYear(BaseModel):
+    """时间线中的一年"""
+    year: str
+    count: int
+    months: List[TimelineMonth]
+
+
+class LikeResponse(BaseModel):
+    """点赞状态"""
+    photo_id: int
+    likes: int
+    liked: bool  # 当前客户端是否已点赞
+
+
+class ImageOrderUpdate(BaseModel):
+    """图片排序请求"""
+    image_ids: List[int]  # 照片的全部图片 ID，按新顺序排列
+    cover_id: Optional[int] = None  # 可选：同时设置封面
+
+
+class BatchImageResult(BaseModel):
+    """批量上传中单个文件的结果"""
+    index: int  # 文件在请求中的序号
+    filename: str
+    success: bool
+    id: Optional[int] = None
+    url: Optional[str] = None
+    size: Optional[int] = None
+    sha256: Optional[str] = None
+    deduplicated: bool = False
+    is_cover: bool = False
+    job_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BatchUploadResponse(BaseModel):
+    """批量上传结果"""
+    photo_id: int
+    total: int
+    succeeded: int
+    failed: int
+    images: List[BatchImageResult]
+
+
+# 公开接口的响应缓存：('photos', cursor, limit) 为列表分页，('photo', id) 为照片详情
+life_cache = ResponseCache("life", LIFE_CACHE_MAX_BYTES, LIFE_CACHE_TTL)
+
+_photo_list_adapter = TypeAdapter(List[PhotoListItem])
+_timeline_adapter = TypeAdapter(List[TimelineYear])
+
+
+def _on_likes_flushed(photo_ids: List[int]):
+    """点赞批量写入后失效相关缓存（每个写入周期最多一次）"""
+    life_cache.invalidate_namespace('photos')
+    life_cache.invalidate(*[('photo', photo_id) for photo_id in photo_ids])
+
+
+# 点赞写入缓冲
+like_buffer = LikeBuffer(LIKES_FLUSH_INTERVAL, LIKES_MAX_PENDING, _on_likes_flushed)
 
 
 # ========== 工具函数 ==========
@@ -85,83 +191,352 @@ def get_images_dir() -> str:
     return images_dir
 
 
+async def life_references() -> List[str]:
+    """照片图片记录与照片正文中引用的图片 URL（供回收任务对账）"""
+    async with AsyncSessionLocal() as db:
+        urls = list((await db.execute(select(LifePhotoImage.url))).scalars().all())
+        result = await db.execute(select(LifePhoto.description, LifePhoto.content))
+        for description, content in result.all():
+            urls.extend(find_image_urls(description))
+            urls.extend(find_image_urls(content))
+    return urls
+
+
+media_collector.add_root('/images/life', get_images_dir)
+media_collector.add_source('life', life_references)
+
+
+def safe_filename(file: UploadFile) -> str:
+    """生成安全的文件名（仅用于展示，实际按内容哈希存储）"""
+    original_filename = file.filename
+    if original_filename:
+        name, ext = os.path.splitext(original_filename)
+        name = re.sub(r'[^\w\.\-]', '_', name)
+        return f"{name}{ext}"
+    ext = '.' + file.content_type.split('/')[-1]
+    return f"image_{datetime.now().strftime('%Y%m%d%H%M%S%f')}{ext}"
+
+
+def to_photo_image(img: LifePhotoImage) -> PhotoImage:
+    """图片记录转换为响应模型"""
+    return PhotoImage(
+        id=img.id,
+        url=img.url,
+        is_cover=bool(img.is_cover),
+        order=img.order,
+        thumb_url=img.thumb_url,
+        medium_url=img.medium_url,
+        webp_url=img.webp_url,
+        width=img.width,
+        height=img.height,
+        byte_size=img.byte_size,
+        taken_at=img.taken_at,
+        placeholder=img.placeholder
+    )
+
+
+def invalidate_photo(photo_id: Optional[int] = None):
+    """照片数据变更后失效缓存：所有列表分页与时间线，以及该照片的详情"""
+    life_cache.invalidate_namespace('photos', 'timeline')
+    if photo_id is not None:
+        life_cache.invalidate(('photo', photo_id))
+
+
+def client_key(request: Request) -> str:
+    """
+    点赞去重使用的客户端标识：连接 IP + User-Agent（只保存哈希）
+    不采用客户端自行提供的标识，否则每次换一个值即可无限点赞；
+    部署在反向代理之后时需由服务器（如 uvicorn --proxy-headers）从可信代理解析真实 IP
+    """
+    host = request.client.host if request.client else ''
+    client_id = f"{host}|{request.headers.get('user-agent', '')}"
+    return hashlib.blake2b(client_id.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def cached_json(item: CachedResponse) -> Response:
+    """将缓存的序列化结果包装为 JSON 响应"""
+    return Response(content=item.body, media_type="application/json", headers=item.headers)
+
+
+def image_values(variants: dict, metadata: dict) -> dict:
+    """衍生图与元数据对应的图片记录字段"""
+    values = {
+        'thumb_url': variants.get('thumb'),
+        'medium_url': variants.get('medium'),
+        'webp_url': variants.get('webp'),
+    }
+    for field in ('width', 'height', 'byte_size', 'taken_at', 'placeholder'):
+        if field in metadata:
+            values[field] = metadata[field]
+    return values
+
+
+async def record_variants(image_url: str, variants: dict, metadata: dict):
+    """图片后台任务完成后的回调：将衍生图与元数据写入所有引用该图片的记录"""
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(LifePhotoImage)
+            .where(LifePhotoImage.url == image_url)
+            .values(**image_values(variants, metadata))
+        )
+        await db.commit()
+        result = await db.execute(
+            select(LifePhotoImage.photo_id).where(LifePhotoImage.url == image_url).distinct()
+        )
+        photo_ids = result.scalars().all()
+
+    if photo_ids:
+        life_cache.invalidate_namespace('photos', 'timeline')
+        life_cache.invalidate(*[('photo', photo_id) for photo_id in photo_ids])
+
+
+def encode_cursor(key: Tuple[str, int]) -> str:
+    """将 (date, id) 编码为游标字符串"""
+    raw = json.dumps(list(key)).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """解析游标字符串"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        date, photo_id = json.loads(raw.decode('utf-8'))
+        return str(date), int(photo_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+
+
+def month_cursor(first_date: str, first_photo_id: int) -> str:
+    """从某月最新的照片开始的列表游标（游标之后的第一条即为该照片）"""
+    return encode_cursor((first_date, first_photo_id + 1))
+
+
+async def fetch_photo_list(
+    db: AsyncSession,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None
+) -> Tuple[List[PhotoListItem], Optional[str]]:
+    """
+    查询照片列表及封面（单条 SQL），按 (date, id) 倒序做游标分页
+    返回 (列表项, 下一页游标)；limit 为空时返回全部
+    """
+    # 每张照片取 id 最小的封面图（走 photo_id + is_cover 索引）
+    cover_id = (
+        select(func.min(LifePhotoImage.id))
+        .where(LifePhotoImage.photo_id == LifePhoto.id)
+        .where(LifePhotoImage.is_cover == 1)
+        .correlate(LifePhoto)
+        .scalar_subquery()
+    )
+    query = (
+        select(
+            LifePhoto.id,
+            LifePhoto.title,
+            LifePhoto.description,
+            LifePhoto.date,
+            LifePhoto.likes,
+            LifePhotoImage.url,
+            LifePhotoImage.thumb_url,
+            LifePhotoImage.medium_url,
+            LifePhotoImage.webp_url,
+            LifePhotoImage.width,
+            LifePhotoImage.height,
+            LifePhotoImage.byte_size,
+            LifePhotoImage.taken_at,
+            LifePhotoImage.placeholder
+        )
+        .outerjoin(LifePhotoImage, LifePhotoImage.id == cover_id)
+        .order_by(LifePhoto.date.desc(), LifePhoto.id.desc())
+    )
+
+    if cursor:
+        date, photo_id = decode_cursor(cursor)
+        query = query.where(or_(
+            LifePhoto.date < date,
+            and_(LifePhoto.date == date, LifePhoto.id < photo_id)
+        ))
+    if limit is not None:
+        # 多取一条用于判断是否还有下一页
+        query = query.limit(limit + 1)
+
+    rows = (await db.execute(query)).all()
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor((rows[-1].date, rows[-1].id))
+
+    items = [
+        PhotoListItem(
+            id=row.id,
+            title=row.title,
+            description=row.description,
+            date=row.date,
+            likes=(row.likes or 0) + like_buffer.pending_delta(row.id),
+            cover_image=row.url,
+            cover_thumb=row.thumb_url,
+            cover_medium=row.medium_url,
+            cover_webp=row.webp_url,
+            cover_width=row.width,
+            cover_height=row.height,
+            cover_byte_size=row.byte_size,
+            cover_taken_at=row.taken_at,
+            cover_placeholder=row.placeholder
+        )
+        for row in rows
+    ]
+    return items, next_cursor
+
+
 # ========== API 路由 ==========
 
 @router.get("/photos", response_model=List[PhotoListItem])
-async def list_photos(db: AsyncSession = Depends(get_db)):
-    """获取所有照片列表（公开接口，无需认证）"""
-    result = await db.execute(
-        select(LifePhoto).order_by(LifePhoto.date.desc())
-    )
-    photos = result.scalars().all()
+async def list_photos(
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    month: Optional[str] = Query(None, pattern=r'^\d{4}-\d{2}$'),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    获取照片列表（公开接口，无需认证）
+
+    - limit: 每页数量，不传则返回全部
+    - cursor: 上一页响应头 X-Next-Cursor 中的游标
+    - month: 从该月（YYYY-MM）最新的照片开始分页，与 cursor 同时传入时以 cursor 为准
+    """
+    if month and not cursor:
+        summary = await get_month(db, month)
+        if summary is None:
+            return cached_json(CachedResponse(b'[]'))
+        cursor = month_cursor(summary.first_date, summary.first_photo_id)
+
+    async def load() -> CachedResponse:
+        items, next_cursor = await fetch_photo_list(db, cursor, limit)
+        headers = {'X-Next-Cursor': next_cursor} if next_cursor else {}
+        return CachedResponse(_photo_list_adapter.dump_json(items), headers)
+
+    return cached_json(await life_cache.get_or_load(('photos', cursor, limit), load))
+
+
+@router.get("/timeline", response_model=List[TimelineYear])
+async def get_timeline(db: AsyncSession = Depends(get_db)):
+    """
+    按年 / 月归档的照片数与封面（公开接口，无需认证）
+    每个月份带有照片列表游标，可直接跳转到该月所在的分页
+    """
+    async def load() -> CachedResponse:
+        years: List[TimelineYear] = []
+        for row in await fetch_timeline(db):
+            year = row.month[:4]
+            if not years or years[-1].year != year:
+                years.append(TimelineYear(year=year, count=0, months=[]))
+            years[-1].count += row.photo_count
+            years[-1].months.append(TimelineMonth(
+                month=row.month,
+                count=row.photo_count,
+                cursor=month_cursor(row.first_date, row.first_photo_id),
+                cover_image=row.url,
+                cover_thumb=row.thumb_url,
+                cover_width=row.width,
+                cover_height=row.height,
+                cover_placeholder=row.placeholder
+            ))
+        return CachedResponse(_timeline_adapter.dump_json(years))
+
+    return cached_json(await life_cache.get_or_load(('timeline',), load))
+
+
+@router.get("/photos/{photo_id}", response_model=PhotoResponse)
+async def get_photo(photo_id: int, db: AsyncSession = Depends(get_db)):
+    """获取单张照片详情（公开接口，无需认证）"""
+    async def load() -> CachedResponse:
+        result = await db.execute(
+            select(LifePhoto).where(LifePhoto.id == photo_id)
+        )
+        photo = result.scalar_one_or_none()
+
+        if not photo:
+            raise HTTPException(status_code=404, detail="照片不存在")
 
-    items = []
-    for photo in photos:
-        # 获取封面图片
+        # 获取所有图片
         img_result = await db.execute(
             select(LifePhotoImage)
-            .where(LifePhotoImage.photo_id == photo.id)
-            .where(LifePhotoImage.is_cover == 1)
+            .where(LifePhotoImage.photo_id == photo_id)
+            .order_by(LifePhotoImage.order)
         )
-        cover_img = img_result.scalar_one_or_none()
+        images = img_result.scalars().all()
 
-        items.append(PhotoListItem(
+        return CachedResponse(PhotoResponse(
             id=photo.id,
             title=photo.title,
             description=photo.description,
+            content=photo.content,
             date=photo.date,
-            cover_image=cover_img.url if cover_img else None
-        ))
+            images=[to_photo_image(img) for img in images],
+            likes=(photo.likes or 0) + like_buffer.pending_delta(photo.id),
+            created_at=photo.created_at.isoformat() if photo.created_at else "",
+            updated_at=photo.updated_at.isoformat() if photo.updated_at else ""
+        ).model_dump_json().encode('utf-8'))
 
-    return items
+    return cached_json(await life_cache.get_or_load(('photo', photo_id), load))
 
 
-@router.get("/photos/{photo_id}", response_model=PhotoResponse)
-async def get_photo(photo_id: int, db: AsyncSession = Depends(get_db)):
-    """获取单张照片详情（公开接口，无需认证）"""
+async def stored_likes(db: AsyncSession, photo_id: int) -> int:
+    """数据库中已写入的点赞数，照片不存在时返回 404"""
     result = await db.execute(
-        select(LifePhoto).where(LifePhoto.id == photo_id)
+        select(LifePhoto.likes).where(LifePhoto.id == photo_id)
     )
-    photo = result.scalar_one_or_none()
-
-    if not photo:
+    row = result.first()
+    if row is None:
         raise HTTPException(status_code=404, detail="照片不存在")
+    return row.likes or 0
 
-    # 获取所有图片
-    img_result = await db.execute(
-        select(LifePhotoImage)
-        .where(LifePhotoImage.photo_id == photo_id)
-        .order_by(LifePhotoImage.order)
-    )
-    images = img_result.scalars().all()
 
-    return PhotoResponse(
-        id=photo.id,
-        title=photo.title,
-        description=photo.description,
-        content=photo.content,
-        date=photo.date,
-        images=[PhotoImage(
-            id=img.id,
-            url=img.url,
-            is_cover=bool(img.is_cover),
-            order=img.order
-        ) for img in images],
-        created_at=photo.created_at.isoformat() if photo.created_at else "",
-        updated_at=photo.updated_at.isoformat() if photo.updated_at else ""
+def like_response(photo_id: int, stored: int, liked: bool) -> LikeResponse:
+    """点赞数包含尚未写入的增量"""
+    return LikeResponse(
+        photo_id=photo_id,
+        likes=max(stored + like_buffer.pending_delta(photo_id), 0),
+        liked=liked
     )
 
 
+@router.get("/photos/{photo_id}/like", response_model=LikeResponse)
+async def get_like(photo_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    """获取点赞数与当前客户端的点赞状态（公开接口，无需认证）"""
+    stored = await stored_likes(db, photo_id)
+    liked = await like_buffer.is_liked(db, photo_id, client_key(request))
+    return like_response(photo_id, stored, liked)
+
+
+@router.post("/photos/{photo_id}/like", response_model=LikeResponse)
+async def like_photo(photo_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    """点赞（公开接口，同一客户端重复点赞不重复计数）"""
+    stored = await stored_likes(db, photo_id)
+    await like_buffer.set_liked(db, photo_id, client_key(request), True)
+    return like_response(photo_id, stored, True)
+
+
+@router.delete("/photos/{photo_id}/like", response_model=LikeResponse)
+async def unlike_photo(photo_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    """取消点赞（公开接口）"""
+    stored = await stored_likes(db, photo_id)
+    await like_buffer.set_liked(db, photo_id, client_key(request), False)
+    return like_response(photo_id, stored, False)
+
+
 # ========== 管理接口（需要认证） ==========
 
 @router.get("/admin/photos", response_model=List[PhotoListItem])
 async def admin_list_photos(
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    month: Optional[str] = Query(None, pattern=r'^\d{4}-\d{2}$'),
     api_key: str = Header(..., alias="X-API-Key"),
     db: AsyncSession = Depends(get_db)
 ):
-    """获取所有照片列表（管理接口）"""
+    """获取照片列表（管理接口，分页参数同公开接口）"""
     verify_api_key(api_key)
-    return await list_photos(db)
+    return await list_photos(cursor=cursor, limit=limit, month=month, db=db)
 
 
 @router.post("/admin/photos", response_model=PhotoResponse)
@@ -184,8 +559,10 @@ async def create_photo(
         date=date
     )
     db.add(new_photo)
+    await refresh_months(db, date)
     await db.commit()
     await db.refresh(new_photo)
+    invalidate_photo()
 
     # 创建照片目录
     images_dir = get_images_dir()
@@ -229,11 +606,15 @@ async def update_photo(
         existing_photo.description = photo.description
     if photo.content is not None:
         existing_photo.content = photo.content
+    old_date = existing_photo.date
     if photo.date is not None:
         existing_photo.date = photo.date
+    if existing_photo.date != old_date:
+        await refresh_months(db, old_date, existing_photo.date)
 
     existing_photo.updated_at = datetime.now()
     await db.commit()
+    invalidate_photo(photo_id)
     await db.refresh(existing_photo)  # 刷新对象，避免 MissingGreenlet 错误
 
     # 获取所有图片
@@ -250,12 +631,8 @@ async def update_photo(
         description=existing_photo.description,
         content=existing_photo.content,
         date=existing_photo.date,
-        images=[PhotoImage(
-            id=img.id,
-            url=img.url,
-            is_cover=bool(img.is_cover),
-            order=img.order
-        ) for img in images],
+        images=[to_photo_image(img) for img in images],
+        likes=(existing_photo.likes or 0) + like_buffer.pending_delta(photo_id),
         created_at=existing_photo.created_at.isoformat() if existing_photo.created_at else "",
         updated_at=existing_photo.updated_at.isoformat() if existing_photo.updated_at else ""
     )
@@ -278,11 +655,22 @@ async def delete_photo(
     if not photo:
         raise HTTPException(status_code=404, detail="照片不存在")
 
-    # 删除照片目录
-    images_dir = get_images_dir()
-    photo_dir = os.path.join(images_dir, str(photo_id))
-    if os.path.exists(photo_dir):
-        shutil.rmtree(photo_dir)
+    # 旧版照片目录在提交后交由回收任务删除
+    photo_dir = os.path.join(get_images_dir(), str(photo_id))
+
+    # 释放图片引用
+    img_result = await db.execute(
+        select(LifePhotoImage.id).where(LifePhotoImage.photo_id == photo_id)
+    )
+    orphans = []
+    for image_id in img_result.scalars().all():
+        orphans.extend(await remove_refs(db, f"life_image:{image_id}"))
+
+    # 删除点赞记录与未写入的点赞
+    like_buffer.discard(photo_id)
+    await db.execute(
+        delete(LifePhotoLike).where(LifePhotoLike.photo_id == photo_id)
+    )
 
     # 删除相关图片记录
     await db.execute(
@@ -291,7 +679,11 @@ async def delete_photo(
 
     # 删除照片记录
     await db.delete(photo)
+    await refresh_months(db, photo.date)
     await db.commit()
+    invalidate_photo(photo_id)
+    await delete_objects(orphans)
+    media_collector.enqueue(photo_dir)
 
     return {"success": True, "message": f"照片 '{photo.title}' 已删除"}
 
@@ -316,37 +708,12 @@ async def upload_image(
         raise HTTPException(status_code=404, detail="照片不存在")
 
     # 验证文件类型
-    allowed_types = ['image/jpeg', 'image/png', 'image/gif', 'image/webp']
-    if file.content_type not in allowed_types:
-        raise HTTPException(status_code=400, detail="不支持的图片格式，仅支持 JPEG、PNG、GIF、WebP")
-
-    # 确保图片目录存在
-    images_dir = get_images_dir()
-    photo_dir = os.path.join(images_dir, str(photo_id))
-    os.makedirs(photo_dir, exist_ok=True)
-
-    # 生成安全的文件名（添加时间戳避免重复）
-    original_filename = file.filename
-    if original_filename:
-        # 添加时间戳避免文件名冲突
-        name, ext = os.path.splitext(original_filename)
-        name = re.sub(r'[^\w\.\-]', '_', name)
-        filename = f"{name}_{datetime.now().strftime('%Y%m%d%H%M%S%f')}{ext}"
-    else:
-        ext = '.' + file.content_type.split('/')[-1]
-        filename = f"image_{datetime.now().strftime('%Y%m%d%H%M%S%f')}{ext}"
+    validate_image_type(file)
 
-    filepath = os.path.join(photo_dir, filename)
+    filename = safe_filename(file)
 
-    # 读取文件内容
-    content = await file.read()
-
-    # 保存文件
-    try:
-        with open(filepath, 'wb') as f:
-            f.write(content)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"文件保存失败: {str(e)}")
+    # 流式保存到内容寻址存储（重复内容不会重复占用空间）
+    stored = await store_image(db, file, record_variants)
 
     try:
         # 获取当前最大 order - 使用 scalars().first() 避免多结果问题
@@ -372,40 +739,216 @@ async def upload_image(
             is_cover = True
 
         # 创建图片记录
-        image_url = f"/images/life/{photo_id}/{filename}"
+        image_url = stored.url
         new_image = LifePhotoImage(
             photo_id=photo_id,
             url=image_url,
             filename=filename,
             is_cover=1 if is_cover else 0,
-            order=next_order
+            order=next_order,
+            thumb_url=stored.variants.get('thumb'),
+            medium_url=stored.variants.get('medium'),
+            webp_url=stored.variants.get('webp')
         )
         db.add(new_image)
         await db.flush()
+        await add_ref(db, stored.sha256, f"life_image:{new_image.id}", filename)
         await db.commit()
         await db.refresh(new_image)
+        invalidate_photo(photo_id)
+
+        # 衍生图任务可能在记录提交前就已完成，此时补写一次
+        job = image_jobs.get(stored.job_id) if stored.job_id else None
+        if job and job.status == 'done':
+            await record_variants(image_url, job.variants, job.metadata)
 
         return {
             "success": True,
             "id": new_image.id,
             "filename": filename,
             "url": image_url,
-            "is_cover": is_cover
+            "size": stored.size,
+            "sha256": stored.sha256,
+            "deduplicated": not stored.created,
+            "is_cover": is_cover,
+            "job_id": stored.job_id
         }
     except Exception as e:
-        # 数据库操作失败，删除已保存的文件
-        if os.path.exists(filepath):
-            os.remove(filepath)
+        # 数据库操作失败，删除本次新建的文件
         try:
             await db.rollback()
         except Exception:
             pass
+        if stored.created:
+            await delete_objects([(stored.sha256, stored.ext)])
         import traceback
         print(f"图片上传数据库错误: {str(e)}")
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"数据库操作失败: {str(e)}")
 
 
+@router.post("/admin/photos/{photo_id}/images/batch", response_model=BatchUploadResponse)
+async def upload_images_batch(
+    photo_id: int,
+    files: List[UploadFile] = File(...),
+    cover_index: Optional[int] = Form(None),
+    api_key: str = Header(..., alias="X-API-Key"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    批量上传照片图片
+
+    - 文件并发写入存储，全部图片记录在同一事务中插入
+    - cover_index: 设为封面的文件序号（从 0 开始）；不传时若照片尚无封面，第一张成功的图片设为封面
+    - 单个文件失败不影响其他文件，结果按文件逐一返回
+    """
+    verify_api_key(api_key)
+
+    if len(files) > UPLOAD_BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"单次最多上传 {UPLOAD_BATCH_MAX_FILES} 个文件")
+
+    result = await db.execute(
+        select(LifePhoto.id).where(LifePhoto.id == photo_id)
+    )
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="照片不存在")
+
+    results = [
+        BatchImageResult(index=i, filename=safe_filename(file), success=False)
+        for i, file in enumerate(files)
+    ]
+
+    # 1. 并发写入临时文件并计算哈希（不访问数据库）
+    semaphore = asyncio.Semaphore(UPLOAD_BATCH_CONCURRENCY)
+
+    async def receive(file: UploadFile):
+        validate_image_type(file)
+        async with semaphore:
+            return await save_incoming(file)
+
+    received = await asyncio.gather(*[receive(file) for file in files], return_exceptions=True)
+
+    # 2. 移入存储并查找已有衍生图（文件操作与只读查询，均在开启写事务之前完成）
+    placed = {}  # 序号 -> (临时文件结果, 移入的存储对象)
+    for i, outcome in enumerate(received):
+        item = results[i]
+        if isinstance(outcome, BaseException):
+            item.error = outcome.detail if isinstance(outcome, HTTPException) else str(outcome)
+            continue
+        saved, ext = outcome
+        try:
+            placed[i] = (saved, await place_object(db, saved.path, saved.sha256, saved.size, ext))
+        except Exception as e:
+            item.error = f"文件保存失败: {str(e)}"
+            await asyncio.to_thread(discard_incoming, saved.path)
+
+    # 3. 先更新照片的修改时间以取得写锁：保存点会开启事务，若事务中先读后写且期间有其他连接提交
+    #    （如衍生图回调），SQLite 会因快照过期直接报 database is locked 而不等待；
+    #    此后只执行数据库写入，写锁的持有时间与文件大小无关
+    await db.execute(
+        update(LifePhoto).where(LifePhoto.id == photo_id).values(updated_at=datetime.now())
+    )
+
+    # 一次查询得到当前最大序号与封面状态，序号在内存中分配
+    row = (await db.execute(
+        select(func.max(LifePhotoImage.order), func.max(LifePhotoImage.is_cover))
+        .where(LifePhotoImage.photo_id == photo_id)
+    )).one()
+    next_order = row[0] + 1 if row[0] is not None else 0
+    has_cover = bool(row[1])
+
+    # 4. 逐个登记存储对象并插入记录；每个文件使用保存点，失败只回滚该文件
+    new_images = {}  # 序号 -> (图片记录, 存储结果)
+    failed_objects = []  # 登记失败但已新建的存储对象
+    for i, (saved, obj) in placed.items():
+        item = results[i]
+        stored = None
+        try:
+            async with db.begin_nested():
+                stored = await record_object(db, obj, record_variants)
+                image = LifePhotoImage(
+                    photo_id=photo_id,
+                    url=stored.url,
+                    filename=item.filename,
+                    is_cover=0,
+                    order=next_order,
+                    thumb_url=stored.variants.get('thumb'),
+                    medium_url=stored.variants.get('medium'),
+                    webp_url=stored.variants.get('webp')
+                )
+                db.add(image)
+                await db.flush()
+                await add_ref(db, stored.sha256, f"life_image:{image.id}", item.filename)
+        except Exception as e:
+            item.error = f"数据库操作失败: {str(e)}"
+            if stored is not None and stored.created:
+                failed_objects.append((stored.sha256, stored.ext))
+            elif stored is None and obj.created:
+                failed_objects.append((obj.sha256, obj.ext))
+            continue
+
+        next_order += 1
+        new_images[i] = (image, stored)
+        item.success = True
+        item.id = image.id
+        item.url = stored.url
+        item.size = stored.size
+        item.sha256 = stored.sha256
+        item.deduplicated = not stored.created
+        item.job_id = stored.job_id
+
+    # 5. 设置封面
+    cover = None
+    if cover_index is not None and cover_index in new_images:
+        cover = cover_index
+    elif not has_cover and new_images:
+        cover = min(new_images)
+    if cover is not None:
+        if has_cover:
+            await db.execute(
+                update(LifePhotoImage)
+                .where(LifePhotoImage.photo_id == photo_id)
+                .where(LifePhotoImage.is_cover == 1)
+                .values(is_cover=0)
+            )
+        new_images[cover][0].is_cover = 1
+        results[cover].is_cover = True
+
+    # 6. 一次提交
+    try:
+        await db.commit()
+    except Exception as e:
+        try:
+            await db.rollback()
+        except Exception:
+            pass
+        created = [(stored.sha256, stored.ext) for _, stored in new_images.values() if stored.created]
+        await delete_objects(list(set(created + failed_objects)))
+        raise HTTPException(status_code=500, detail=f"数据库操作失败: {str(e)}")
+
+    # 失败文件新建的对象若未被本批其他文件复用，则删除
+    kept = {stored.sha256 for _, stored in new_images.values()}
+    await delete_objects(list({obj for obj in failed_objects if obj[0] not in kept}))
+
+    if new_images:
+        invalidate_photo(photo_id)
+
+    # 衍生图任务可能在记录提交前就已完成，此时补写一次
+    for _, stored in new_images.values():
+        job = image_jobs.get(stored.job_id) if stored.job_id else None
+        if job and job.status == 'done':
+            await record_variants(stored.url, job.variants, job.metadata)
+
+    succeeded = len(new_images)
+    return BatchUploadResponse(
+        photo_id=photo_id,
+        total=len(files),
+        succeeded=succeeded,
+        failed=len(files) - succeeded,
+        images=results
+    )
+
+
 @router.delete("/admin/photos/{photo_id}/images/{image_id}")
 async def delete_image(
     photo_id: int,
@@ -426,17 +969,23 @@ async def delete_image(
     if not image:
         raise HTTPException(status_code=404, detail="图片不存在")
 
-    # 删除文件
-    images_dir = get_images_dir()
-    filepath = os.path.join(images_dir, str(photo_id), image.filename)
-    if os.path.exists(filepath):
-        os.remove(filepath)
+    # 存储对象释放引用；旧版按照片目录存储的图片在提交后交由回收任务删除
+    orphans = []
+    legacy_path = None
+    if parse_store_url(image.url):
+        orphans = await remove_refs(db, f"life_image:{image.id}")
+    else:
+        legacy_path = os.path.join(get_images_dir(), str(photo_id), image.filename)
 
     was_cover = image.is_cover
 
     # 删除记录
     await db.delete(image)
     await db.commit()
+    invalidate_photo(photo_id)
+    await delete_objects(orphans)
+    if legacy_path:
+        media_collector.enqueue(legacy_path)
 
     # 如果删除的是封面，将第一张图片设为封面
     if was_cover:
@@ -444,11 +993,13 @@ async def delete_image(
             select(LifePhotoImage)
             .where(LifePhotoImage.photo_id == photo_id)
             .order_by(LifePhotoImage.order)
+            .limit(1)
         )
-        first_img = img_result.scalar_one_or_none()
+        first_img = img_result.scalars().first()
         if first_img:
             first_img.is_cover = 1
             await db.commit()
+            invalidate_photo(photo_id)
 
     return {"success": True, "message": "图片已删除"}
 
@@ -483,5 +1034,75 @@ async def set_cover_image(
     # 设置当前图片为封面
     image.is_cover = 1
     await db.commit()
+    invalidate_photo(photo_id)
 
     return {"success": True, "message": "封面已设置"}
+
+
+@router.put("/admin/photos/{photo_id}/images/order")
+async def reorder_images(
+    photo_id: int,
+    body: ImageOrderUpdate,
+    api_key: str = Header(..., alias="X-API-Key"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    批量调整图片顺序（可同时设置封面）
+
+    - image_ids 必须恰好包含该照片的全部图片，顺序即新的 order
+    - 归属校验只需一次查询，更新为一条 UPDATE ... CASE 语句
+    """
+    verify_api_key(api_key)
+
+    if len(set(body.image_ids)) != len(body.image_ids):
+        raise HTTPException(status_code=400, detail="图片 ID 不能重复")
+    if body.cover_id is not None and body.cover_id not in body.image_ids:
+        raise HTTPException(status_code=400, detail="封面图片必须在排序列表中")
+
+    result = await db.execute(
+        select(LifePhotoImage.id).where(LifePhotoImage.photo_id == photo_id)
+    )
+    existing = set(result.scalars().all())
+    if not existing:
+        photo = await db.get(LifePhoto, photo_id)
+        if not photo:
+            raise HTTPException(status_code=404, detail="照片不存在")
+
+    unknown = [image_id for image_id in body.image_ids if image_id not in existing]
+    missing = existing - set(body.image_ids)
+    if unknown or missing:
+        raise HTTPException(
+            status_code=400,
+            detail=f"排序列表与照片图片不一致：不属于该照片 {unknown}，缺少 {sorted(missing)}"
+        )
+
+    if body.image_ids:
+        values = {
+            'order': case(
+                {image_id: order for order, image_id in enumerate(body.image_ids)},
+                value=LifePhotoImage.id
+            )
+        }
+        if body.cover_id is not None:
+            values['is_cover'] = case((LifePhotoImage.id == body.cover_id, 1), else_=0)
+        await db.execute(
+            update(LifePhotoImage)
+            .where(LifePhotoImage.photo_id == photo_id)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        invalidate_photo(photo_id)
+
+    img_result = await db.execute(
+        select(LifePhotoImage)
+        .where(LifePhotoImage.photo_id == photo_id)
+        .order_by(LifePhotoImage.order)
+    )
+    images = img_result.scalars().all()
+
+    return {
+        "success": True,
+        "message": "图片顺序已更新",
+        "images": [to_photo_image(img).model_dump() for img in images]
+    }
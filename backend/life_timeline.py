@@ -0,0 +1,114 @@
+"""
+生活照片时间线（按年 / 月归档）
+- 汇总表 life_timeline_month 记录每月照片数与排在最前的照片，由照片的增删改在同一事务中增量维护
+- 只重新统计受影响的月份，按 (date, id) 索引做范围查询，无需扫描全表
+- 读取时间线只查询汇总表（每月一行），封面图通过 photo_id + is_cover 索引关联
+- 启动时校验汇总与照片表是否一致，不一致时全量重建
+"""
+
+import logging
+from typing import List, Optional
+
+from sqlalchemy import select, delete, func, and_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db import AsyncSessionLocal, LifePhoto, LifePhotoImage, LifeTimelineMonth
+
+logger = logging.getLogger("life_timeline")
+
+# 月份前缀范围的上界（日期均为 ASCII 字符）
+_PREFIX_END = '\uffff'
+
+
+def month_key(date: Optional[str]) -> Optional[str]:
+    """日期所在的月份（YYYY-MM-DD -> YYYY-MM）"""
+    return date[:7] if date else None
+
+
+def _in_month(month: str):
+    """日期以 month 开头（范围条件，可使用 (date, id) 索引）"""
+    return and_(LifePhoto.date >= month, LifePhoto.date < month + _PREFIX_END)
+
+
+async def refresh_months(db: AsyncSession, *dates: Optional[str]) -> None:
+    """重新统计日期所在的月份（调用方负责提交事务）"""
+    months = {month_key(date) for date in dates if date}
+    # 会话未开启 autoflush，先写入本事务中的改动再统计
+    await db.flush()
+    for month in sorted(months):
+        count = (await db.execute(
+            select(func.count(LifePhoto.id)).where(_in_month(month))
+        )).scalar_one()
+        if not count:
+            await db.execute(delete(LifeTimelineMonth).where(LifeTimelineMonth.month == month))
+            continue
+
+        first = (await db.execute(
+            select(LifePhoto.id, LifePhoto.date)
+            .where(_in_month(month))
+            .order_by(LifePhoto.date.desc(), LifePhoto.id.desc())
+            .limit(1)
+        )).one()
+        values = {'photo_count': count, 'first_photo_id': first.id, 'first_date': first.date}
+        await db.execute(
+            sqlite_insert(LifeTimelineMonth)
+            .values(month=month, **values)
+            .on_conflict_do_update(index_elements=['month'], set_=values)
+        )
+
+
+async def rebuild(db: AsyncSession) -> int:
+    """全量重建汇总表，返回月份数（调用方负责提交事务）"""
+    await db.execute(delete(LifeTimelineMonth))
+    result = await db.execute(select(func.substr(LifePhoto.date, 1, 7)).distinct())
+    months: List[str] = [month for month in result.scalars().all() if month]
+    # 按月份重新统计，与增量维护使用同一逻辑
+    await refresh_months(db, *months)
+    return len(months)
+
+
+async def ensure_consistent() -> None:
+    """汇总表与照片表的总数不一致时（如首次升级或手工修改数据库）全量重建"""
+    async with AsyncSessionLocal() as db:
+        summarized = (await db.execute(
+            select(func.coalesce(func.sum(LifeTimelineMonth.photo_count), 0))
+        )).scalar_one()
+        total = (await db.execute(select(func.count(LifePhoto.id)))).scalar_one()
+        if summarized == total:
+            return
+        months = await rebuild(db)
+        await db.commit()
+        logger.info(f"时间线汇总已重建：{months} 个月，{total} 张照片")
+
+
+async def fetch_timeline(db: AsyncSession) -> List:
+    """按月份倒序返回汇总行及封面图"""
+    cover_id = (
+        select(func.min(LifePhotoImage.id))
+        .where(LifePhotoImage.photo_id == LifeTimelineMonth.first_photo_id)
+        .where(LifePhotoImage.is_cover == 1)
+        .correlate(LifeTimelineMonth)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        select(
+            LifeTimelineMonth.month,
+            LifeTimelineMonth.photo_count,
+            LifeTimelineMonth.first_photo_id,
+            LifeTimelineMonth.first_date,
+            LifePhotoImage.url,
+            LifePhotoImage.thumb_url,
+            LifePhotoImage.width,
+            LifePhotoImage.height,
+            LifePhotoImage.placeholder
+        )
+        .outerjoin(LifePhotoImage, LifePhotoImage.id == cover_id)
+        .order_by(LifeTimelineMonth.month.desc())
+    )
+    return list(result.all())
+
+
+async def get_month(db: AsyncSession, month: str) -> Optional[LifeTimelineMonth]:
+    """单个月份的汇总"""
+    return await db.get(LifeTimelineMonth, month)
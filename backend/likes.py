@@ -0,0 +1,240 @@
+"""
+生活照片点赞计数
+- 点赞 / 取消点赞先在内存中聚合，同一客户端对同一照片只计一次
+- 后台定期将累计的增量与点赞记录在一个事务中批量写入，避免每次点击都争用 SQLite 写锁
+- 对外返回的点赞数包含尚未写入的增量；服务关闭时写入全部待处理数据
+"""
+
+import time
+import asyncio
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, update, delete, func, case, bindparam
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db import AsyncSessionLocal, LifePhoto, LifePhotoLike
+
+logger = logging.getLogger("likes")
+
+# (照片 ID, 客户端标识)
+LikeKey = Tuple[int, str]
+
+
+class LikeBuffer:
+    """点赞写入缓冲（仅在事件循环线程中使用）"""
+
+    def __init__(
+        self,
+        flush_interval: float,
+        max_pending: int,
+        on_flush: Optional[Callable[[List[int]], None]] = None
+    ):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._on_flush = on_flush  # 写入完成后的回调（参数为受影响的照片 ID）
+        self._pending: Dict[LikeKey, bool] = {}  # 待写入的最终状态：True 点赞 / False 取消
+        self._deltas: Dict[int, int] = {}  # 照片 ID -> 待写入的计数增量
+        self._flushing: Dict[LikeKey, bool] = {}  # 正在写入的批次
+        self._flushing_deltas: Dict[int, int] = {}
+        self._generation = 0  # 每次写入成功后递增
+        self._flush_lock = asyncio.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.likes = 0
+        self.unlikes = 0
+        self.duplicates = 0  # 被去重忽略的请求数
+        self.flushes = 0
+        self.flushed_changes = 0
+        self.failed_flushes = 0
+        self.last_flush_ms = 0.0
+
+    # ---------- 状态 ----------
+
+    def _pending_state(self, key: LikeKey) -> Optional[bool]:
+        if key in self._pending:
+            return self._pending[key]
+        return self._flushing.get(key)
+
+    async def is_liked(self, db: AsyncSession, photo_id: int, client_key: str) -> bool:
+        """客户端是否已点赞：优先使用未写入的状态，否则查询数据库"""
+        key = (photo_id, client_key)
+        state = self._pending_state(key)
+        if state is not None:
+            return state
+        while True:
+            generation = self._generation
+            result = await db.execute(
+                select(LifePhotoLike.id)
+                .where(LifePhotoLike.photo_id == photo_id)
+                .where(LifePhotoLike.client_key == client_key)
+            )
+            liked = result.first() is not None
+            # 查询期间有批次写入完成时，结果可能已过期，重新查询
+            if generation != self._generation:
+                continue
+            # 查询期间同一客户端的并发请求可能已改变状态
+            state = self._pending_state(key)
+            return liked if state is None else state
+
+    def pending_delta(self, photo_id: int) -> int:
+        """尚未写入数据库的计数增量"""
+        return self._deltas.get(photo_id, 0) + self._flushing_deltas.get(photo_id, 0)
+
+    # ---------- 更新 ----------
+
+    async def set_liked(self, db: AsyncSession, photo_id: int, client_key: str, liked: bool) -> bool:
+        """点赞或取消点赞，返回状态是否改变（重复请求返回 False）"""
+        if await self.is_liked(db, photo_id, client_key) == liked:
+            self.duplicates += 1
+            return False
+
+        self._pending[(photo_id, client_key)] = liked
+        delta = self._deltas.get(photo_id, 0) + (1 if liked else -1)
+        if delta:
+            self._deltas[photo_id] = delta
+        else:
+            self._deltas.pop(photo_id, None)
+
+        if liked:
+            self.likes += 1
+        else:
+            self.unlikes += 1
+        if len(self._pending) >= self.max_pending and self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    def discard(self, photo_id: int) -> None:
+        """丢弃已删除照片的待写入数据"""
+        for key in [key for key in self._pending if key[0] == photo_id]:
+            self._pending.pop(key)
+        self._deltas.pop(photo_id, None)
+
+    # ---------- 批量写入 ----------
+
+    @staticmethod
+    async def _write(changes: Dict[LikeKey, bool], deltas: Dict[int, int]) -> None:
+        """在一个事务中写入计数增量与点赞记录"""
+        photo_ids = list({photo_id for photo_id, _ in changes} | set(deltas))
+        like_table = LifePhotoLike.__table__
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(LifePhoto.id).where(LifePhoto.id.in_(photo_ids)))
+            existing = set(result.scalars().all())
+
+            deltas = {photo_id: delta for photo_id, delta in deltas.items() if photo_id in existing}
+            if deltas:
+                await db.execute(
+                    update(LifePhoto)
+                    .where(LifePhoto.id.in_(list(deltas)))
+                    .values(likes=func.coalesce(LifePhoto.likes, 0) + case(deltas, value=LifePhoto.id, else_=0))
+                    .execution_options(synchronize_session=False)
+                )
+
+            added = [
+                {'photo_id': photo_id, 'client_key': client_key}
+                for (photo_id, client_key), liked in changes.items()
+                if liked and photo_id in existing
+            ]
+            if added:
+                await db.execute(
+                    sqlite_insert(like_table).on_conflict_do_nothing(index_elements=['photo_id', 'client_key']),
+                    added
+                )
+
+            removed = [
+                {'p': photo_id, 'c': client_key}
+                for (photo_id, client_key), liked in changes.items()
+                if not liked
+            ]
+            if removed:
+                await db.execute(
+                    delete(like_table)
+                    .where(like_table.c.photo_id == bindparam('p'))
+                    .where(like_table.c.client_key == bindparam('c')),
+                    removed
+                )
+            await db.commit()
+
+    async def flush(self) -> int:
+        """写入当前累计的全部变更，返回写入的变更数；失败时变更保留到下次"""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+
+            self._flushing, self._pending = self._pending, {}
+            self._flushing_deltas, self._deltas = self._deltas, {}
+            changes, deltas = self._flushing, self._flushing_deltas
+            started = time.perf_counter()
+            try:
+                await self._write(changes, deltas)
+            except BaseException as e:
+                # 放回待写入队列（写入期间产生的新状态优先）
+                for key, liked in changes.items():
+                    self._pending.setdefault(key, liked)
+                for photo_id, delta in deltas.items():
+                    merged = self._deltas.get(photo_id, 0) + delta
+                    if merged:
+                        self._deltas[photo_id] = merged
+                    else:
+                        self._deltas.pop(photo_id, None)
+                self.failed_flushes += 1
+                if isinstance(e, Exception):
+                    logger.error(f"点赞写入失败，将在下次重试: {str(e)}")
+                raise
+            finally:
+                self._flushing, self._flushing_deltas = {}, {}
+
+            self._generation += 1
+            self.flushes += 1
+            self.flushed_changes += len(changes)
+            self.last_flush_ms = (time.perf_counter() - started) * 1000
+
+        if self._on_flush:
+            self._on_flush(sorted({photo_id for photo_id, _ in changes} | set(deltas)))
+        return len(changes)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                pass
+
+    # ---------- 生命周期 / 统计 ----------
+
+    async def start(self) -> None:
+        """启动定期写入"""
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止定期写入，并写入全部待处理数据"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            count = await self.flush()
+            if count:
+                logger.info(f"关闭前写入 {count} 条点赞变更")
+        except Exception:
+            pass
+
+    def stats(self) -> dict:
+        return {
+            'likes': self.likes,
+            'unlikes': self.unlikes,
+            'duplicates': self.duplicates,
+            'pending_changes': len(self._pending) + len(self._flushing),
+            'flushes': self.flushes,
+            'flushed_changes': self.flushed_changes,
+            'failed_flushes': self.failed_flushes,
+            'last_flush_ms': round(self.last_flush_ms, 3),
+        }
@@ -4,18 +4,28 @@ Personal Website Backend
 """
 
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Query
+from fastapi import FastAPI, Query, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, EmailStr
 from typing import Optional
 from datetime import datetime
+from dataclasses import asdict
 
 # 导入 GitHub 模块
 from github import router as github_router, startup_event, shutdown_event
+from github_client import github_stats
 # 导入博客管理模块
-from blog import router as blog_router
+from blog import router as blog_router, startup_event as blog_startup, shutdown_event as blog_shutdown
+from blog import verify_api_key, render_cache, blog_storage, related_index, feed_cache
+from http_cache import conditional_stats
 # 导入生活模块
-from life import router as life_router
+from life import router as life_router, life_cache, like_buffer
+from life_timeline import ensure_consistent as ensure_timeline
+from workers import shutdown_process_pool
+from uploads import UploadSizeLimitMiddleware, upload_stats
+from images import image_jobs
+from static_images import router as static_images_router, static_stats
+from media_gc import media_collector
 
 
 # 生命周期管理
@@ -24,9 +34,19 @@ async def lifespan(app: FastAPI):
     """应用生命周期管理"""
     # 启动时执行
     await startup_event()
+    await blog_startup()
+    await ensure_timeline()
+    await image_jobs.start()
+    await like_buffer.start()
+    await media_collector.start()
     yield
     # 关闭时执行
+    await media_collector.stop()
+    await like_buffer.stop()
+    await image_jobs.stop()
+    await blog_shutdown()
     await shutdown_event()
+    shutdown_process_pool()
 
 
 # 创建 FastAPI 应用
@@ -47,14 +67,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # 分页游标（生活照片列表）
 )
 
+# 限制上传请求体大小（在解析表单之前拒绝超大请求）
+app.add_middleware(UploadSizeLimitMiddleware)
+
 # 注册 GitHub 路由
 app.include_router(github_router)
 # 注册博客管理路由
 app.include_router(blog_router)
 # 注册生活模块路由
 app.include_router(life_router)
+# 注册图片静态文件路由
+app.include_router(static_images_router)
 
 
 # ========== 数据模型 ==========
@@ -94,6 +120,47 @@ async def health_check():
     }
 
 
+@app.get("/api/metrics")
+async def get_metrics(api_key: str = Header(..., alias="X-API-Key")):
+    """运行指标（需要认证）"""
+    verify_api_key(api_key)
+    return {
+        "uploads": upload_stats.snapshot(),
+        "blog_render_cache": render_cache.stats(),
+        "blog_storage": blog_storage.stats(),
+        "blog_related": related_index.stats(),
+        "blog_feeds": feed_cache.stats(),
+        "life_cache": life_cache.stats(),
+        "life_likes": like_buffer.stats(),
+        "conditional_get": conditional_stats.snapshot(),
+        "static_images": static_stats.snapshot(),
+        "image_jobs": image_jobs.stats(),
+        "media_gc": media_collector.stats(),
+        "github": github_stats.snapshot(),
+    }
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str, api_key: str = Header(..., alias="X-API-Key")):
+    """查询后台图片任务进度（需要认证）"""
+    verify_api_key(api_key)
+    job = image_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return job.to_dict()
+
+
+@app.post("/api/media/gc")
+async def run_media_gc(api_key: str = Header(..., alias="X-API-Key")):
+    """立即对账图片目录并回收无引用的文件（需要认证）"""
+    verify_api_key(api_key)
+    try:
+        report = await media_collector.collect(full_scan=True)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return asdict(report)
+
+
 # ========== 联系表单 ==========
 
 @app.post("/api/contact", response_model=ContactResponse)
@@ -0,0 +1,348 @@
+"""
+图片孤儿文件回收
+- 删除照片、文章或图片时只登记待删除路径，由后台任务删除文件，请求无需等待磁盘操作
+- 定期将图片目录与引用来源（数据库记录、文章 Markdown）对账，回收失败上传与不再被引用的文件
+- 删除前总是重新确认文件未被引用；对账扫描发现的文件在修改时间超过宽限期后才删除（可能属于尚未提交的上传），
+  显式登记的删除不受宽限期限制，只在读取引用后被修改（如重复上传）时留待下次处理
+- 分批删除，批次之间暂停，避免长时间占用磁盘 IO；统计回收的文件数与字节数
+"""
+
+import os
+import re
+import time
+import asyncio
+import logging
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from urllib.parse import unquote
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from config import MEDIA_GC_INTERVAL, MEDIA_GC_GRACE_SECONDS, MEDIA_GC_BATCH_SIZE, MEDIA_GC_BATCH_PAUSE
+from images import VARIANT_SEPARATOR, VARIANT_SIZES, variant_filename
+
+logger = logging.getLogger("media_gc")
+
+# 引用来源：返回当前被引用的图片 URL
+ReferenceSource = Callable[[], Awaitable[Iterable[str]]]
+
+# 读取引用后被修改的登记删除，延迟多久后重新处理（秒）
+REQUEUE_DELAY = 5.0
+
+# 匹配文本（Markdown、HTML、frontmatter）中的站内图片 URL（不含 ../images/ 这类相对路径的片段）
+_IMAGE_URL_RE = re.compile(r'(?<!\.)/images/[^\s"\'()<>\[\]]+')
+
+
+def find_image_urls(text: Optional[str]) -> Set[str]:
+    """找出文本中引用的站内图片 URL（百分号编码已解码，与磁盘上的文件名一致）"""
+    return {unquote(url) for url in _IMAGE_URL_RE.findall(text or '')}
+
+
+def _url_stem(url: str) -> str:
+    """去掉扩展名与衍生图后缀，原图与其衍生图得到相同的值"""
+    base, _, filename = url.rpartition('/')
+    stem = os.path.splitext(filename)[0].split(VARIANT_SEPARATOR, 1)[0]
+    return f"{base}/{stem}"
+
+
+@dataclass
+class GcRoot:
+    """受管理的图片目录"""
+    url_prefix: str  # 例如 /images/life
+    get_dir: Callable[[], str]
+    prune_dirs: bool = True  # 是否删除变为空的子目录
+
+
+@dataclass
+class Candidate:
+    """待检查的文件"""
+    path: str
+    url: str
+    size: int
+    mtime: float
+    queued: bool = False  # 是否为显式登记的删除（否则为对账扫描发现）
+
+
+@dataclass
+class GcReport:
+    """一次回收的结果"""
+    started_at: str
+    full_scan: bool
+    scanned: int = 0
+    deleted: int = 0
+    reclaimed_bytes: int = 0
+    kept_referenced: int = 0
+    kept_recent: int = 0  # 宽限期内暂不删除的文件（对账扫描发现）
+    requeued: int = 0  # 读取引用后被修改、留待下次处理的登记删除
+    errors: int = 0
+    duration_ms: float = 0.0
+
+
+class MediaCollector:
+    """孤儿文件回收器（enqueue 仅在事件循环线程中调用）"""
+
+    def __init__(self, interval: float, grace: float, batch_size: int, batch_pause: float):
+        self.interval = interval
+        self.grace = grace
+        self.batch_size = max(batch_size, 1)
+        self.batch_pause = batch_pause
+        self._roots: List[GcRoot] = []
+        self._sources: Dict[str, ReferenceSource] = {}
+        self._queue: Set[str] = set()
+        self._lock = asyncio.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._next_scan = 0.0
+        self.runs = 0
+        self.failed_runs = 0
+        self.deleted = 0
+        self.reclaimed_bytes = 0
+        self.last_report: Optional[GcReport] = None
+
+    # ---------- 注册 ----------
+
+    def add_root(self, url_prefix: str, get_dir: Callable[[], str], prune_dirs: bool = True) -> None:
+        """
+        登记图片目录（目录下第一层的文件不受管理，只回收子目录中的文件）
+        会被并发写入的目录（如存储的分片目录）应关闭 prune_dirs
+        """
+        self._roots.append(GcRoot(url_prefix.rstrip('/'), get_dir, prune_dirs))
+
+    def add_source(self, name: str, source: ReferenceSource) -> None:
+        """登记引用来源；任一来源失败时本次回收不删除任何文件"""
+        self._sources[name] = source
+
+    # ---------- 删除队列 ----------
+
+    def enqueue(self, *paths: str) -> None:
+        """登记待删除的文件或目录（文件的衍生图一并处理）"""
+        self._queue.update(os.path.normpath(path) for path in paths if path)
+        if self._queue and self._wakeup is not None:
+            self._wakeup.set()
+
+    # ---------- 文件扫描（在线程中执行） ----------
+
+    def _resolve_roots(self) -> List[Tuple[GcRoot, str]]:
+        return [(root, os.path.realpath(root.get_dir())) for root in self._roots]
+
+    @staticmethod
+    def _to_candidate(path: str, url: str, queued: bool) -> Optional[Candidate]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return Candidate(path, url, st.st_size, st.st_mtime, queued)
+
+    @staticmethod
+    def _walk(root_dir: str, start: str, url_prefix: str) -> Iterable[Tuple[str, str]]:
+        for directory, _, filenames in os.walk(start):
+            if directory == root_dir:
+                continue
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                rel = os.path.relpath(path, root_dir).replace(os.sep, '/')
+                yield path, f"{url_prefix}/{rel}"
+
+    def _collect_candidates(self, queued: Set[str], full_scan: bool) -> List[Candidate]:
+        roots = self._resolve_roots()
+        found: Dict[str, Candidate] = {}
+
+        def add(path: str, url: str, queued: bool = True) -> None:
+            if path not in found:
+                candidate = self._to_candidate(path, url, queued)
+                if candidate is not None:
+                    found[path] = candidate
+
+        for path in queued:
+            real = os.path.realpath(path)
+            owner = next(
+                ((root, root_dir) for root, root_dir in roots
+                 if real != root_dir and os.path.commonpath([root_dir, real]) == root_dir),
+                None
+            )
+            if owner is None:
+                logger.warning(f"不在图片目录中，忽略：{path}")
+                continue
+            root, root_dir = owner
+            if os.path.isdir(real):
+                for file_path, url in self._walk(root_dir, real, root.url_prefix):
+                    add(file_path, url)
+                continue
+            directory, filename = os.path.split(real)
+            if directory == root_dir:
+                continue
+            url = f"{root.url_prefix}/{os.path.relpath(real, root_dir).replace(os.sep, '/')}"
+            add(real, url)
+            base_url = url.rsplit('/', 1)[0]
+            for variant in VARIANT_SIZES:
+                name = variant_filename(filename, variant)
+                add(os.path.join(directory, name), f"{base_url}/{name}")
+
+        if full_scan:
+            for root, root_dir in roots:
+                for file_path, url in self._walk(root_dir, root_dir, root.url_prefix):
+                    add(file_path, url, queued=False)
+
+        return list(found.values())
+
+    def _delete_batch(self, batch: List[Candidate], referenced_at: float) -> Tuple[int, int, int, List[str], int]:
+        """删除一批文件，返回 (删除数, 释放字节, 宽限期内跳过数, 需重新登记的路径, 失败数)"""
+        deleted = freed = recent = errors = 0
+        requeue = []
+        cutoff = time.time() - self.grace
+        directories = set()
+        for candidate in batch:
+            try:
+                st = os.stat(candidate.path)
+                # 对账期间文件可能被重新使用（重复上传会刷新修改时间）
+                if candidate.queued:
+                    if st.st_mtime > referenced_at:
+                        requeue.append(candidate.path)
+                        continue
+                elif st.st_mtime > cutoff:
+                    recent += 1
+                    continue
+                os.remove(candidate.path)
+                deleted += 1
+                freed += st.st_size
+                directories.add(os.path.dirname(candidate.path))
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                errors += 1
+                logger.error(f"删除失败（{candidate.path}）: {str(e)}")
+
+        # 清理变为空的子目录（如已删除照片的目录）
+        roots = self._resolve_roots()
+        root_dirs = {root_dir for _, root_dir in roots}
+        pruned_roots = [root_dir for root, root_dir in roots if root.prune_dirs]
+        for directory in sorted(directories, key=len, reverse=True):
+            if not any(os.path.commonpath([root_dir, directory]) == root_dir for root_dir in pruned_roots):
+                continue
+            while directory not in root_dirs and os.path.dirname(directory) != directory:
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    break
+                directory = os.path.dirname(directory)
+        return deleted, freed, recent, requeue, errors
+
+    # ---------- 回收 ----------
+
+    async def _references(self) -> Set[str]:
+        referenced: Set[str] = set()
+        for name, source in self._sources.items():
+            try:
+                referenced.update(await source())
+            except Exception as e:
+                raise RuntimeError(f"引用来源 {name} 读取失败: {str(e)}") from e
+        return referenced
+
+    async def collect(self, full_scan: bool = True) -> GcReport:
+        """处理删除队列；full_scan 时同时对账全部图片目录"""
+        async with self._lock:
+            queued, self._queue = self._queue, set()
+            report = GcReport(started_at=datetime.now().isoformat(), full_scan=full_scan)
+            started = time.perf_counter()
+            try:
+                # 略早于读取引用的时间：此后被修改的文件可能已被重新引用
+                referenced_at = time.time() - 1
+                referenced = await self._references()
+                candidates = await asyncio.to_thread(self._collect_candidates, queued, full_scan)
+            except BaseException:
+                self._queue.update(queued)
+                self.failed_runs += 1
+                raise
+
+            referenced_stems = {_url_stem(url) for url in referenced}
+            cutoff = time.time() - self.grace
+            orphans = []
+            for candidate in candidates:
+                if candidate.url in referenced or _url_stem(candidate.url) in referenced_stems:
+                    report.kept_referenced += 1
+                elif candidate.queued:
+                    # 显式登记的删除（照片、文章或对象已删除），不等待宽限期
+                    orphans.append(candidate)
+                elif candidate.mtime > cutoff:
+                    report.kept_recent += 1
+                else:
+                    orphans.append(candidate)
+            report.scanned = len(candidates)
+
+            for start in range(0, len(orphans), self.batch_size):
+                if start:
+                    await asyncio.sleep(self.batch_pause)
+                deleted, freed, recent, requeue, errors = await asyncio.to_thread(
+                    self._delete_batch, orphans[start:start + self.batch_size], referenced_at
+                )
+                report.deleted += deleted
+                report.reclaimed_bytes += freed
+                report.kept_recent += recent
+                report.requeued += len(requeue)
+                report.errors += errors
+                self._queue.update(requeue)
+            if report.requeued and self._wakeup is not None:
+                asyncio.get_running_loop().call_later(REQUEUE_DELAY, self._wakeup.set)
+
+            report.duration_ms = round((time.perf_counter() - started) * 1000, 3)
+            self.runs += 1
+            self.deleted += report.deleted
+            self.reclaimed_bytes += report.reclaimed_bytes
+            self.last_report = report
+            if report.deleted or report.errors:
+                logger.info(
+                    f"回收 {report.deleted} 个文件，释放 {report.reclaimed_bytes} 字节"
+                    f"（检查 {report.scanned}，失败 {report.errors}）"
+                )
+            return report
+
+    async def _run(self) -> None:
+        while True:
+            timeout = None
+            if self.interval > 0:
+                timeout = max(self._next_scan - time.monotonic(), 0)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            full_scan = self.interval > 0 and time.monotonic() >= self._next_scan
+            if full_scan:
+                self._next_scan = time.monotonic() + self.interval
+            try:
+                await self.collect(full_scan)
+            except Exception as e:
+                logger.error(f"图片回收失败，将在下次重试: {str(e)}")
+
+    # ---------- 生命周期 / 统计 ----------
+
+    async def start(self) -> None:
+        """启动后台回收（首次全量对账在一个间隔之后进行，避免拖慢启动）"""
+        self._wakeup = asyncio.Event()
+        self._next_scan = time.monotonic() + self.interval
+        if self._queue:
+            self._wakeup.set()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止后台回收；未处理的删除会在下次对账时回收"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._wakeup = None
+
+    def stats(self) -> dict:
+        return {
+            'interval': self.interval,
+            'grace_seconds': self.grace,
+            'queued': len(self._queue),
+            'runs': self.runs,
+            'failed_runs': self.failed_runs,
+            'deleted': self.deleted,
+            'reclaimed_bytes': self.reclaimed_bytes,
+            'last_run': asdict(self.last_report) if self.last_report else None,
+        }
+
+
+media_collector = MediaCollector(MEDIA_GC_INTERVAL, MEDIA_GC_GRACE_SECONDS, MEDIA_GC_BATCH_SIZE, MEDIA_GC_BATCH_PAUSE)
@@ -0,0 +1,372 @@
+"""
+内容寻址图片存储（博客与生活模块共用）
+- 图片按 SHA-256 存放：{MEDIA_STORE_DIR}/{哈希前两位}/{sha256}{ext}
+- 重复上传同一张图片不会再占用存储空间
+- 通过 MediaRef 记录引用方（生活照片图片、文章 Markdown 引用、文章上传），引用归零后由回收任务删除文件
+- URL 由内容决定、永不改变，可被浏览器和 CDN 永久缓存
+"""
+
+import os
+import re
+import uuid
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi import UploadFile
+from sqlalchemy import select, update, delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import MEDIA_STORE_DIR, UPLOAD_CHUNK_SIZE
+from db import AsyncSessionLocal, MediaObject, MediaRef
+from uploads import save_upload, SavedUpload
+from images import image_jobs, variant_filename, variant_url, VARIANT_SIZES, JobCallback
+from media_gc import media_collector
+
+logger = logging.getLogger("media_store")
+
+# 存储目录对应的 URL 前缀
+STORE_URL_PREFIX = '/images/store'
+
+# 匹配 Markdown / URL 中引用的存储对象（含衍生图）
+_STORE_URL_RE = re.compile(r'/images/store/[0-9a-f]{2}/([0-9a-f]{64})(?:@[a-z]+)?\.[A-Za-z0-9]+')
+
+# 图片类型 -> 扩展名
+EXT_BY_CONTENT_TYPE = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+}
+
+# 文件扩展名 -> 存储扩展名（导入本地文件时使用）
+EXT_BY_SUFFIX = {
+    '.jpg': '.jpg',
+    '.jpeg': '.jpg',
+    '.png': '.png',
+    '.gif': '.gif',
+    '.webp': '.webp',
+}
+
+_store_dir: Optional[str] = None
+
+
+def get_store_dir() -> str:
+    """获取存储目录的绝对路径"""
+    global _store_dir
+    if _store_dir is None:
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        _store_dir = os.path.normpath(os.path.join(base_dir, MEDIA_STORE_DIR))
+        os.makedirs(_store_dir, exist_ok=True)
+    return _store_dir
+
+
+def object_path(sha256: str, ext: str) -> str:
+    """存储对象的文件路径"""
+    return os.path.join(get_store_dir(), sha256[:2], f"{sha256}{ext}")
+
+
+def object_url(sha256: str, ext: str) -> str:
+    """存储对象的 URL"""
+    return f"{STORE_URL_PREFIX}/{sha256[:2]}/{sha256}{ext}"
+
+
+def parse_store_url(url: Optional[str]) -> Optional[str]:
+    """从存储 URL 中解析出 SHA-256，非存储 URL 返回 None"""
+    if not url:
+        return None
+    match = _STORE_URL_RE.fullmatch(url)
+    return match.group(1) if match else None
+
+
+def find_store_refs(text: str) -> Set[str]:
+    """找出 Markdown 中引用的所有存储对象"""
+    return set(_STORE_URL_RE.findall(text or ''))
+
+
+def existing_variants(sha256: str, ext: str) -> Dict[str, str]:
+    """已生成的衍生图 URL"""
+    path = object_path(sha256, ext)
+    directory, filename = os.path.split(path)
+    url = object_url(sha256, ext)
+    return {
+        variant: variant_url(url, variant)
+        for variant in VARIANT_SIZES
+        if os.path.exists(os.path.join(directory, variant_filename(filename, variant)))
+    }
+
+
+# ========== 写入 ==========
+
+@dataclass
+class StoredImage:
+    """存储结果"""
+    sha256: str
+    ext: str
+    url: str
+    size: int
+    created: bool  # 是否为新对象（False 表示重复上传，未新增文件）
+    variants: Dict[str, str]  # 已生成的衍生图 URL
+    job_id: Optional[str] = None  # 衍生图生成任务 ID
+
+
+def _link_object(incoming: str, target: str) -> bool:
+    """将临时文件移动到存储位置；目标已存在时丢弃临时文件，返回是否新建"""
+    if os.path.exists(target):
+        os.remove(incoming)
+        # 刷新修改时间，使回收任务在宽限期内不会删除正在被重新引用的对象
+        os.utime(target)
+        return False
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(incoming, target)
+    return True
+
+
+def hash_file(path: str) -> Tuple[str, int]:
+    """分块计算文件的 SHA-256，返回 (哈希, 大小)"""
+    hasher = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            hasher.update(chunk)
+            size += len(chunk)
+    return hasher.hexdigest(), size
+
+
+async def store_image(
+    db: AsyncSession,
+    file: UploadFile,
+    on_variants: Optional[JobCallback] = None
+) -> StoredImage:
+    """
+    保存上传图片到内容寻址存储
+    新对象会写入 MediaObject 并提交衍生图任务；重复内容直接复用已有对象。
+    调用方负责 add_ref 与提交事务
+    """
+    saved, ext = await save_incoming(file)
+    return await register_object(db, saved.path, saved.sha256, saved.size, ext, on_variants)
+
+
+async def save_incoming(file: UploadFile) -> Tuple[SavedUpload, str]:
+    """
+    将上传内容流式写入存储的临时目录并计算哈希（不访问数据库，可并发调用）
+    返回 (上传结果, 扩展名)，随后由 register_object 移入存储
+    """
+    ext = EXT_BY_CONTENT_TYPE.get(file.content_type, '.bin')
+    incoming = os.path.join(get_store_dir(), '.incoming', f"{uuid.uuid4().hex}{ext}")
+    return await save_upload(file, incoming), ext
+
+
+def discard_incoming(path: str) -> None:
+    """删除未登记的临时文件"""
+    if os.path.exists(path):
+        os.remove(path)
+
+
+async def _object_ext(db: AsyncSession, sha256: str) -> Optional[str]:
+    """已登记对象的扩展名，未登记时返回 None"""
+    result = await db.execute(select(MediaObject.ext).where(MediaObject.sha256 == sha256))
+    return result.scalar_one_or_none()
+
+
+@dataclass
+class PlacedObject:
+    """已移入存储、尚未登记到数据库的对象"""
+    sha256: str
+    ext: str
+    size: int
+    created: bool  # 是否新建了文件
+    variants: Dict[str, str]  # 已生成的衍生图 URL
+
+
+async def place_object(db: AsyncSession, incoming: str, sha256: str, size: int, ext: str) -> PlacedObject:
+    """
+    将已计算哈希的本地文件移入存储（incoming 会被移动或删除），并查找已生成的衍生图
+    只读取数据库、不写入，批量上传可在开启写事务之前完成全部文件操作
+    """
+    existing_ext = await _object_ext(db, sha256)
+    if existing_ext is not None:
+        ext = existing_ext
+
+    created = await asyncio.to_thread(_link_object, incoming, object_path(sha256, ext))
+    variants = await asyncio.to_thread(existing_variants, sha256, ext)
+    return PlacedObject(sha256=sha256, ext=ext, size=size, created=created, variants=variants)
+
+
+async def record_object(
+    db: AsyncSession,
+    placed: PlacedObject,
+    on_variants: Optional[JobCallback] = None
+) -> StoredImage:
+    """
+    登记 place_object 移入的对象
+    衍生图不全或传入 on_variants（需要衍生图与元数据结果）时提交后台任务。
+    同一会话中不可并发调用；调用方负责 add_ref 与提交事务
+    """
+    sha256, ext, created, variants = placed.sha256, placed.ext, placed.created, placed.variants
+
+    # 其他会话可能同时上传同一新内容（或在移入后删除了该对象）：只有一方插入成功，另一方沿用已登记的记录
+    await db.execute(
+        sqlite_insert(MediaObject)
+        .values(sha256=sha256, ext=ext, size=placed.size, ref_count=0)
+        .on_conflict_do_nothing(index_elements=['sha256'])
+    )
+    stored_ext = await _object_ext(db, sha256)
+    if stored_ext != ext:
+        # 对方以另一扩展名登记了同一内容，本次移入的文件不会被引用
+        if created:
+            await asyncio.to_thread(discard_incoming, object_path(sha256, ext))
+        ext, created = stored_ext, False
+        variants = await asyncio.to_thread(existing_variants, sha256, ext)
+
+    url = object_url(sha256, ext)
+    job_id = None
+    if len(variants) < len(VARIANT_SIZES) or on_variants is not None:
+        job_id = image_jobs.submit(object_path(sha256, ext), url, on_variants)
+
+    if not created:
+        logger.info(f"重复上传，复用已有图片 {sha256[:12]}")
+
+    return StoredImage(
+        sha256=sha256,
+        ext=ext,
+        url=url,
+        size=placed.size,
+        created=created,
+        variants=variants,
+        job_id=job_id,
+    )
+
+
+async def register_object(
+    db: AsyncSession,
+    incoming: str,
+    sha256: str,
+    size: int,
+    ext: str,
+    on_variants: Optional[JobCallback] = None
+) -> StoredImage:
+    """将已计算哈希的本地文件移入存储并登记（place_object + record_object）"""
+    placed = await place_object(db, incoming, sha256, size, ext)
+    return await record_object(db, placed, on_variants)
+
+
+# ========== 引用计数 ==========
+
+async def add_ref(db: AsyncSession, sha256: str, owner: str, filename: Optional[str] = None) -> bool:
+    """添加引用，已存在时忽略，返回是否新增"""
+    result = await db.execute(
+        select(MediaRef.id)
+        .where(MediaRef.sha256 == sha256)
+        .where(MediaRef.owner == owner)
+    )
+    if result.first() is not None:
+        return False
+
+    db.add(MediaRef(sha256=sha256, owner=owner, filename=filename))
+    await db.execute(
+        update(MediaObject)
+        .where(MediaObject.sha256 == sha256)
+        .values(ref_count=MediaObject.ref_count + 1)
+    )
+    await db.flush()
+    return True
+
+
+async def _drop_refs(db: AsyncSession, refs: List[MediaRef]) -> List[Tuple[str, str]]:
+    """删除引用并更新计数，返回引用归零的对象 (sha256, ext)"""
+    if not refs:
+        return []
+
+    affected: Dict[str, int] = {}
+    for ref in refs:
+        affected[ref.sha256] = affected.get(ref.sha256, 0) + 1
+        await db.delete(ref)
+    for sha256, count in affected.items():
+        await db.execute(
+            update(MediaObject)
+            .where(MediaObject.sha256 == sha256)
+            .values(ref_count=MediaObject.ref_count - count)
+        )
+    await db.flush()
+
+    result = await db.execute(
+        select(MediaObject)
+        .where(MediaObject.sha256.in_(list(affected)))
+        .where(MediaObject.ref_count <= 0)
+    )
+    orphans = [(obj.sha256, obj.ext) for obj in result.scalars().all()]
+    if orphans:
+        await db.execute(
+            delete(MediaObject).where(MediaObject.sha256.in_([sha for sha, _ in orphans]))
+        )
+    return orphans
+
+
+async def remove_refs(
+    db: AsyncSession,
+    owner: str,
+    sha256: Optional[str] = None,
+    filename: Optional[str] = None
+) -> List[Tuple[str, str]]:
+    """
+    删除某个引用方的引用（可按对象或文件名过滤）
+    返回引用归零的对象，调用方提交事务后应调用 delete_objects 删除文件
+    """
+    query = select(MediaRef).where(MediaRef.owner == owner)
+    if sha256 is not None:
+        query = query.where(MediaRef.sha256 == sha256)
+    if filename is not None:
+        query = query.where(MediaRef.filename == filename)
+    result = await db.execute(query)
+    return await _drop_refs(db, list(result.scalars().all()))
+
+
+async def sync_refs(db: AsyncSession, owner: str, sha256s: Iterable[str]) -> List[Tuple[str, str]]:
+    """
+    将引用方的引用集合同步为 sha256s（用于文章 Markdown 引用）
+    只为存储中已存在的对象添加引用，返回引用归零的对象
+    """
+    wanted = set(sha256s)
+    result = await db.execute(select(MediaRef).where(MediaRef.owner == owner))
+    current = {ref.sha256: ref for ref in result.scalars().all()}
+
+    to_add = wanted - set(current)
+    if to_add:
+        result = await db.execute(
+            select(MediaObject.sha256).where(MediaObject.sha256.in_(list(to_add)))
+        )
+        for sha256 in result.scalars().all():
+            await add_ref(db, sha256, owner)
+
+    stale = [ref for sha256, ref in current.items() if sha256 not in wanted]
+    return await _drop_refs(db, stale)
+
+
+async def delete_objects(orphans: List[Tuple[str, str]]) -> None:
+    """
+    登记引用归零的对象，由回收任务删除文件及其衍生图
+    删除前会再次确认对象没有被重新上传（MediaObject 记录不存在）
+    """
+    if orphans:
+        media_collector.enqueue(*(object_path(sha256, ext) for sha256, ext in orphans))
+
+
+# ========== 回收 ==========
+
+async def store_references() -> List[str]:
+    """存储中仍有记录的对象 URL（供回收任务对账）"""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(MediaObject.sha256, MediaObject.ext))
+        return [object_url(sha256, ext) for sha256, ext in result.all()]
+
+
+# 分片目录会被并发写入，不删除空目录
+media_collector.add_root(STORE_URL_PREFIX, get_store_dir, prune_dirs=False)
+media_collector.add_source('media_store', store_references)
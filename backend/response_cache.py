@@ -0,0 +1,160 @@
+"""
+进程内响应缓存（读穿透）
+- 缓存序列化后的响应字节，命中时无需查询数据库、构建模型与序列化
+- 条目带 TTL，总字节数超过上限时按 LRU 淘汰
+- 同一键的并发未命中只执行一次加载（single-flight）；加载方被取消时由等待者接手
+- 数据变更后由调用方按键或命名空间精确失效
+"""
+
+import time
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Hashable, Tuple
+
+# 缓存键：(命名空间, ...)，例如 ('photo', 12)
+CacheKey = Tuple[Hashable, ...]
+
+
+class LoadAbandoned(Exception):
+    """加载方的请求被取消，等待者需自行重新加载"""
+
+
+@dataclass
+class CachedResponse:
+    """缓存的响应"""
+    body: bytes
+    headers: Dict[str, str] = field(default_factory=dict)
+    expires_at: float = 0.0
+
+    @property
+    def size(self) -> int:
+        return len(self.body)
+
+
+class ResponseCache:
+    """带 TTL 与字节上限的 LRU 响应缓存（仅在事件循环线程中使用）"""
+
+    def __init__(self, name: str, max_bytes: int, ttl: float):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._items: "OrderedDict[CacheKey, CachedResponse]" = OrderedDict()
+        self._pending: Dict[CacheKey, asyncio.Future] = {}
+        self._bytes = 0
+        self._generation = 0  # 每次失效时递增，失效前发起的加载结果不再写入缓存
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0  # 等待同一次加载的并发请求数
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    # ---------- 内部 ----------
+
+    def _drop(self, key: CacheKey) -> None:
+        item = self._items.pop(key, None)
+        if item is not None:
+            self._bytes -= item.size
+
+    def _get(self, key: CacheKey):
+        item = self._items.get(key)
+        if item is None:
+            return None
+        if item.expires_at <= time.monotonic():
+            self._drop(key)
+            self.expirations += 1
+            return None
+        self._items.move_to_end(key)
+        return item
+
+    def _put(self, key: CacheKey, item: CachedResponse) -> None:
+        if item.size > self.max_bytes:
+            return
+        self._drop(key)
+        item.expires_at = time.monotonic() + self.ttl
+        self._items[key] = item
+        self._bytes += item.size
+        while self._bytes > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self._bytes -= evicted.size
+            self.evictions += 1
+
+    # ---------- 读取 ----------
+
+    async def get_or_load(self, key: CacheKey, loader: Callable[[], Awaitable[CachedResponse]]) -> CachedResponse:
+        """命中则直接返回，否则调用 loader 加载；同一键的并发请求共享一次加载"""
+        item = self._get(key)
+        if item is not None:
+            self.hits += 1
+            return item
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(pending)
+            except LoadAbandoned:
+                # loader 绑定在发起请求的数据库会话上，不能脱离该请求继续执行；
+                # 由等待者用自己的 loader 接手（第一个接手的成为新的加载方，其余继续等待它）
+                return await self.get_or_load(key, loader)
+
+        self.misses += 1
+        generation = self._generation
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            item = await loader()
+            if generation == self._generation:
+                self._put(key, item)
+            future.set_result(item)
+            return item
+        except asyncio.CancelledError:
+            # 只取消发起请求自身（如客户端断开），不把取消传给其他等待者
+            future.set_exception(LoadAbandoned())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 避免无人等待时出现 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        finally:
+            if self._pending.get(key) is future:
+                self._pending.pop(key)
+
+    # ---------- 失效 ----------
+
+    def invalidate(self, *keys: CacheKey) -> None:
+        """失效指定的键"""
+        self._generation += 1
+        for key in keys:
+            self._drop(key)
+            self._pending.pop(key, None)
+        self.invalidations += 1
+
+    def invalidate_namespace(self, *namespaces: Hashable) -> None:
+        """失效命名空间下的全部键（如所有分页）"""
+        self._generation += 1
+        for key in [key for key in self._items if key[0] in namespaces]:
+            self._drop(key)
+        for key in [key for key in self._pending if key[0] in namespaces]:
+            self._pending.pop(key)
+        self.invalidations += 1
+
+    def stats(self) -> dict:
+        """缓存统计"""
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            'entries': len(self._items),
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+            'hit_ratio': round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
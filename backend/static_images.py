@@ -0,0 +1,286 @@
+"""
+图片静态文件服务
+- 由后端直接提供 /images/blog、/images/life 与 /images/store，新上传的图片无需重新部署前端即可访问
+- 支持 HTTP Range（单区间）、HEAD、If-Range 与条件请求（304）
+- 服务器支持 ASGI pathsend / zerocopysend 扩展时零拷贝发送，否则在线程中分块读取
+- 内容寻址存储（/images/store）的 ETag 直接取自文件名中的哈希，并返回 immutable 长期缓存头；
+  其他目录的 ETag 由 (mtime, size, inode) 计算并缓存
+"""
+
+import os
+import stat
+import mimetypes
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+import anyio
+from fastapi import APIRouter, HTTPException, Request
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from config import STATIC_IMAGE_MAX_AGE
+from http_cache import make_etag, http_date, is_not_modified, conditional_stats
+from blog import get_images_dir as blog_images_dir
+from life import get_images_dir as life_images_dir
+from media_store import get_store_dir
+
+router = APIRouter(tags=["静态图片"])
+
+# 分块读取大小（无零拷贝扩展时）
+CHUNK_SIZE = 256 * 1024
+
+# 非内容寻址文件的 ETag 缓存条目数
+ETAG_CACHE_SIZE = 4096
+
+# 内容寻址对象的 URL 永不改变，可永久缓存
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+mimetypes.add_type('image/webp', '.webp')
+
+
+# ========== 统计 ==========
+
+class StaticStats:
+    """静态文件统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {}  # full / partial / not_modified / head / not_found / unsatisfiable
+        self.transports: Dict[str, int] = {}  # pathsend / zerocopysend / chunked
+        self.bytes_sent = 0
+
+    def record(self, outcome: str, transport: Optional[str] = None, size: int = 0) -> None:
+        with self._lock:
+            self.counts[outcome] = self.counts.get(outcome, 0) + 1
+            if transport:
+                self.transports[transport] = self.transports.get(transport, 0) + 1
+            self.bytes_sent += size
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'responses': dict(self.counts),
+                'transports': dict(self.transports),
+                'bytes_sent': self.bytes_sent,
+            }
+
+
+static_stats = StaticStats()
+
+
+# ========== ETag ==========
+
+_etag_lock = threading.Lock()
+_etag_cache: "OrderedDict[str, Tuple[Tuple[int, int, int], str]]" = OrderedDict()
+
+
+def file_etag(kind: str, path: str, st: os.stat_result) -> str:
+    """
+    文件的 ETag
+    存储对象文件名即内容哈希（衍生图同样由原图哈希唯一确定），无需读取文件；
+    其他文件按 (mtime, size, inode) 计算并缓存
+    """
+    if kind == 'store':
+        return f'"{os.path.splitext(os.path.basename(path))[0]}"'
+
+    version = (st.st_mtime_ns, st.st_size, st.st_ino)
+    with _etag_lock:
+        cached = _etag_cache.get(path)
+        if cached is not None and cached[0] == version:
+            _etag_cache.move_to_end(path)
+            return cached[1]
+    etag = make_etag(path, *version)
+    with _etag_lock:
+        _etag_cache[path] = (version, etag)
+        while len(_etag_cache) > ETAG_CACHE_SIZE:
+            _etag_cache.popitem(last=False)
+    return etag
+
+
+# ========== Range ==========
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析单区间 Range 头，返回 [start, end]（闭区间）
+    多区间或格式不支持时返回 None（按完整响应处理）；区间无法满足时抛出 ValueError
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    start_text, sep, end_text = spec.strip().partition('-')
+    if not sep:
+        return None
+    try:
+        if start_text == '':
+            # 后缀区间：最后 N 个字节
+            length = int(end_text)
+            if length <= 0:
+                raise ValueError("空区间")
+            return max(size - length, 0), size - 1
+        start = int(start_text)
+        end = int(end_text) if end_text else size - 1
+    except ValueError:
+        raise ValueError("无效的 Range")
+    if start >= size or start > end or start < 0:
+        raise ValueError("区间超出文件范围")
+    return start, min(end, size - 1)
+
+
+# ========== 响应 ==========
+
+class ImageFileResponse(Response):
+    """发送文件的全部或一个区间，优先使用零拷贝扩展"""
+
+    def __init__(
+        self,
+        path: str,
+        size: int,
+        status_code: int,
+        headers: Dict[str, str],
+        media_type: str,
+        byte_range: Optional[Tuple[int, int]] = None
+    ):
+        self.path = path
+        self.size = size
+        self.byte_range = byte_range
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background = None
+        self.init_headers(headers)
+
+    @property
+    def length(self) -> int:
+        if self.byte_range is None:
+            return self.size
+        return self.byte_range[1] - self.byte_range[0] + 1
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+        if scope["method"].upper() == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            static_stats.record('head')
+            return
+
+        extensions = scope.get("extensions") or {}
+        offset = self.byte_range[0] if self.byte_range else 0
+        outcome = 'partial' if self.byte_range else 'full'
+
+        if self.byte_range is None and "http.response.pathsend" in extensions:
+            await send({"type": "http.response.pathsend", "path": self.path})
+            static_stats.record(outcome, 'pathsend', self.length)
+            return
+
+        if "http.response.zerocopysend" in extensions:
+            with open(self.path, 'rb') as file:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": file,
+                    "offset": offset,
+                    "count": self.length,
+                    "more_body": False,
+                })
+            static_stats.record(outcome, 'zerocopysend', self.length)
+            return
+
+        remaining = self.length
+        async with await anyio.open_file(self.path, mode='rb') as file:
+            if offset:
+                await file.seek(offset)
+            while True:
+                chunk = await file.read(min(CHUNK_SIZE, remaining))
+                remaining -= len(chunk)
+                more_body = remaining > 0 and len(chunk) > 0
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+                if not more_body:
+                    break
+        static_stats.record(outcome, 'chunked', self.length - remaining)
+
+
+# ========== 路由 ==========
+
+# URL 前缀 -> 目录
+IMAGE_ROOTS: Dict[str, Callable[[], str]] = {
+    'blog': blog_images_dir,
+    'life': life_images_dir,
+    'store': get_store_dir,
+}
+
+_resolved_roots: Dict[str, str] = {}
+
+
+def _root(kind: str) -> str:
+    root = _resolved_roots.get(kind)
+    if root is None:
+        root = _resolved_roots[kind] = os.path.realpath(IMAGE_ROOTS[kind]())
+    return root
+
+
+def _resolve(kind: str, path: str) -> Optional[Tuple[str, os.stat_result]]:
+    """将 URL 路径解析为目录内的普通文件，拒绝越界与隐藏文件（上传中的临时文件等）"""
+    if kind not in IMAGE_ROOTS:
+        return None
+    parts = path.split('/')
+    if any(part in ('', '.', '..') or part.startswith('.') for part in parts):
+        return None
+    root = _root(kind)
+    full = os.path.realpath(os.path.join(root, *parts))
+    if os.path.commonpath([root, full]) != root:
+        return None
+    try:
+        st = os.stat(full)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        return None
+    return full, st
+
+
+@router.api_route("/images/{kind}/{path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def serve_image(kind: str, path: str, request: Request):
+    """图片静态文件（公开接口）"""
+    resolved = await anyio.to_thread.run_sync(_resolve, kind, path)
+    if resolved is None:
+        static_stats.record('not_found')
+        raise HTTPException(status_code=404, detail="文件不存在")
+    full, st = resolved
+
+    etag = file_etag(kind, full, st)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(st.st_mtime),
+        'Cache-Control': IMMUTABLE_CACHE_CONTROL if kind == 'store' else f'public, max-age={STATIC_IMAGE_MAX_AGE}',
+        'Accept-Ranges': 'bytes',
+        'X-Content-Type-Options': 'nosniff',
+    }
+    media_type = mimetypes.guess_type(full)[0] or 'application/octet-stream'
+
+    if is_not_modified(request, etag, st.st_mtime):
+        conditional_stats.record(True)
+        static_stats.record('not_modified')
+        return Response(status_code=304, headers=headers)
+    conditional_stats.record(False)
+
+    byte_range = None
+    range_header = request.headers.get('range')
+    if_range = request.headers.get('if-range')
+    # If-Range 与当前版本不一致时忽略 Range，返回完整文件
+    if range_header and (if_range is None or if_range.strip() in (etag, headers['Last-Modified'])):
+        try:
+            byte_range = parse_range(range_header, st.st_size)
+        except ValueError:
+            static_stats.record('unsatisfiable')
+            return Response(status_code=416, headers={**headers, 'Content-Range': f'bytes */{st.st_size}'})
+
+    if byte_range is None:
+        headers['Content-Length'] = str(st.st_size)
+        return ImageFileResponse(full, st.st_size, 200, headers, media_type)
+
+    start, end = byte_range
+    headers['Content-Range'] = f'bytes {start}-{end}/{st.st_size}'
+    headers['Content-Length'] = str(end - start + 1)
+    return ImageFileResponse(full, st.st_size, 206, headers, media_type, byte_range)
@@ -0,0 +1,194 @@
+"""
+非阻塞文件存储层
+- 所有文件操作在有界线程池中执行，不阻塞事件循环
+- 写入采用"临时文件 + 原子重命名"，读者不会看到写了一半的文件
+- 记录每类操作的次数与耗时
+"""
+
+import os
+import time
+import uuid
+import shutil
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+
+class OpStats:
+    """单类操作的耗时统计"""
+    __slots__ = ('count', 'errors', 'total', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'avg_ms': round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            'max_ms': round(self.max * 1000, 3),
+        }
+
+
+class FileStorage:
+    """基于有界线程池的文件存储"""
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-io")
+        self._lock = threading.Lock()
+        self._stats: Dict[str, OpStats] = {}
+
+    # ---------- 计时 ----------
+
+    def _timed(self, op: str, func: Callable[..., Any], *args: Any) -> Any:
+        started = time.perf_counter()
+        failed = False
+        try:
+            return func(*args)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                stats = self._stats.setdefault(op, OpStats())
+                stats.count += 1
+                stats.total += elapsed
+                stats.max = max(stats.max, elapsed)
+                if failed:
+                    stats.errors += 1
+
+    async def run(self, op: str, func: Callable[..., Any], *args: Any) -> Any:
+        """在线程池中执行任意函数并计时"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._timed, op, func, *args)
+
+    # ---------- 同步实现（在工作线程中调用） ----------
+
+    @staticmethod
+    def _read_text(path: str) -> str:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    @staticmethod
+    def _write_text(path: str, content: str) -> None:
+        directory = os.path.dirname(path)
+        tmp_path = os.path.join(directory, f".{os.path.basename(path)}.{uuid.uuid4().hex}.tmp")
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def _create_text(path: str, content: str) -> bool:
+        """仅在文件不存在时创建，返回是否创建成功（写临时文件后硬链接到目标，已存在则链接失败）"""
+        directory = os.path.dirname(path)
+        tmp_path = os.path.join(directory, f".{os.path.basename(path)}.{uuid.uuid4().hex}.tmp")
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.link(tmp_path, path)
+            return True
+        except FileExistsError:
+            return False
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    @staticmethod
+    def _rmtree(path: str) -> bool:
+        if not os.path.exists(path):
+            return False
+        shutil.rmtree(path)
+        return True
+
+    @staticmethod
+    def _listdir(path: str) -> List[str]:
+        try:
+            return os.listdir(path)
+        except FileNotFoundError:
+            return []
+
+    @staticmethod
+    def _stat(path: str) -> Optional[os.stat_result]:
+        try:
+            return os.stat(path)
+        except FileNotFoundError:
+            return None
+
+    def run_sync(self, op: str, func: Callable[..., Any], *args: Any) -> Any:
+        """在当前线程执行并计时（供已在工作线程中的代码使用）"""
+        return self._timed(op, func, *args)
+
+    def read_text_sync(self, path: str) -> str:
+        """同步读取（供已在工作线程中的代码使用，同样计入统计）"""
+        return self._timed('read', self._read_text, path)
+
+    def write_text_sync(self, path: str, content: str) -> None:
+        """同步原子写入"""
+        self._timed('write', self._write_text, path, content)
+
+    def stat_sync(self, path: str) -> Optional[os.stat_result]:
+        return self._timed('stat', self._stat, path)
+
+    # ---------- 异步接口 ----------
+
+    async def read_text(self, path: str) -> str:
+        """读取文本文件"""
+        return await self.run('read', self._read_text, path)
+
+    async def write_text(self, path: str, content: str) -> None:
+        """原子写入文本文件"""
+        await self.run('write', self._write_text, path, content)
+
+    async def create_text(self, path: str, content: str) -> bool:
+        """文件不存在时原子写入，返回是否创建"""
+        return await self.run('write', self._create_text, path, content)
+
+    async def exists(self, path: str) -> bool:
+        return await self.run('stat', os.path.exists, path)
+
+    async def stat(self, path: str) -> Optional[os.stat_result]:
+        return await self.run('stat', self._stat, path)
+
+    async def remove(self, path: str) -> bool:
+        """删除文件，文件不存在时返回 False"""
+        return await self.run('remove', self._remove, path)
+
+    async def rmtree(self, path: str) -> bool:
+        """删除目录，目录不存在时返回 False"""
+        return await self.run('rmtree', self._rmtree, path)
+
+    async def listdir(self, path: str) -> List[str]:
+        """列出目录，目录不存在时返回空列表"""
+        return await self.run('listdir', self._listdir, path)
+
+    # ---------- 统计 / 生命周期 ----------
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {op: stats.to_dict() for op, stats in sorted(self._stats.items())}
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
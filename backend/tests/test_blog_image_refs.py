@@ -0,0 +1,31 @@
+"""
+文章图片引用解析（图片回收依赖该结果判断文件是否仍被引用）
+"""
+
+from blog import article_image_urls
+
+
+def test_relative_refs_follow_frontend_rewrite():
+    text = "![a](./a.png)\n![b](../images/b.png)\n![c](images/c.png)\n"
+    assert article_image_urls('post', text) == {
+        '/images/blog/post/a.png',
+        '/images/blog/post/images/b.png',
+        '/images/blog/post/images/c.png',
+    }
+
+
+def test_only_one_leading_prefix_is_stripped():
+    assert article_image_urls('post', '![x](../../x.png)') == {'/images/blog/post/../x.png'}
+
+
+def test_percent_encoded_cjk_refs_are_decoded():
+    text = '![图](./%E5%9B%BE.png)\n<img src="/images/blog/post/%E7%85%A7%E7%89%87.jpg">'
+    assert article_image_urls('post', text) == {
+        '/images/blog/post/图.png',
+        '/images/blog/post/照片.jpg',
+    }
+
+
+def test_absolute_and_external_refs_are_not_rewritten():
+    text = '![a](/images/store/ab/x.png) ![b](https://example.com/b.png) ![c](data:image/png;base64,AA)'
+    assert article_image_urls('post', text) == {'/images/store/ab/x.png'}
@@ -0,0 +1,14 @@
+"""
+搜索结果高亮与摘要（转小写会改变长度的字符）
+"""
+
+from blog_search import highlight, make_snippet
+
+
+def test_highlight_with_chars_that_grow_when_lowercased():
+    assert highlight('İİİİ abc', ['abc']) == 'İİİİ <mark>abc</mark>'
+
+
+def test_snippet_starts_near_first_hit_in_original_text():
+    text = 'İ' * 100 + ' target here'
+    assert make_snippet(text, ['target'], 20) == '…İİİİ <mark>target</mark> here'
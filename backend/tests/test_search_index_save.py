@@ -0,0 +1,29 @@
+"""
+搜索索引并发保存
+"""
+
+import json
+import os
+import threading
+
+from blog_search import SearchIndex, build_doc
+
+
+def test_concurrent_saves_keep_latest_snapshot(tmp_path):
+    path = str(tmp_path / 'search_index.json')
+    index = SearchIndex(path)
+
+    def save_after(i):
+        index.upsert(build_doc(f'post-{i}', (i, 1), f'标题 {i}', '', [], '正文'))
+        index.save()
+
+    threads = [threading.Thread(target=save_after, args=(i,)) for i in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert os.listdir(tmp_path) == ['search_index.json']
+    with open(path, encoding='utf-8') as f:
+        slugs = {doc['slug'] for doc in json.load(f)['docs']}
+    assert slugs == {f'post-{i}' for i in range(16)}
@@ -0,0 +1,27 @@
+"""
+文件仅在不存在时创建
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from storage import FileStorage
+
+
+def test_create_text_does_not_overwrite(tmp_path):
+    path = str(tmp_path / 'post.md')
+    assert FileStorage._create_text(path, 'first') is True
+    assert FileStorage._create_text(path, 'second') is False
+    with open(path, encoding='utf-8') as f:
+        assert f.read() == 'first'
+    assert os.listdir(tmp_path) == ['post.md']
+
+
+def test_concurrent_create_text_has_single_winner(tmp_path):
+    path = str(tmp_path / 'post.md')
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda i: FileStorage._create_text(path, f'v{i}'), range(32)))
+    assert results.count(True) == 1
+    with open(path, encoding='utf-8') as f:
+        assert f.read() == f'v{results.index(True)}'
+    assert os.listdir(tmp_path) == ['post.md']
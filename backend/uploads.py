@@ -0,0 +1,258 @@
+"""
+图片上传管道（博客与生活模块共用）
+- 分块读取上传内容，在线程中写入临时文件，不阻塞事件循环
+- 尽早拒绝超过大小限制的上传（请求头 + 读取过程中双重校验）
+- 边写入边计算 SHA-256
+- 写入完成后原子重命名到目标路径
+- 统计吞吐量（字节/秒）与管道中同时持有的分块字节数峰值
+"""
+
+import os
+import time
+import uuid
+import asyncio
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile
+from starlette.types import ASGIApp, Receive, Scope, Send
+from starlette.responses import JSONResponse
+
+from config import UPLOAD_MAX_BYTES, UPLOAD_MAX_REQUEST_BYTES, UPLOAD_CHUNK_SIZE
+
+logger = logging.getLogger("uploads")
+
+# 支持的图片类型
+ALLOWED_IMAGE_TYPES = ['image/jpeg', 'image/png', 'image/gif', 'image/webp']
+
+
+def validate_image_type(file: UploadFile) -> None:
+    """验证文件类型"""
+    if file.content_type not in ALLOWED_IMAGE_TYPES:
+        raise HTTPException(status_code=400, detail="不支持的图片格式，仅支持 JPEG、PNG、GIF、WebP")
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"文件过大，最大支持 {max_bytes // (1024 * 1024)} MB")
+
+
+# ========== 统计 ==========
+
+class UploadStats:
+    """上传管道统计（线程安全，所有修改都经由 record_* 方法在锁内进行）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.uploads = 0  # 成功上传数
+        self.rejected = 0  # 因超限被拒绝数
+        self.failed = 0  # 其他失败数
+        self.total_bytes = 0  # 成功写入总字节数
+        self.total_seconds = 0.0  # 成功上传总耗时
+        self.last_bytes_per_sec = 0.0
+        self.peak_bytes_per_sec = 0.0
+        self.in_flight = 0  # 进行中的上传数
+        # 管道中同时持有的分块字节数（已读出、尚未写入磁盘的分块之和）及其峰值；
+        # 不含 multipart 解析与其临时文件占用的内存，不是进程内存峰值
+        self.chunk_bytes_in_flight = 0
+        self.peak_chunk_bytes_in_flight = 0
+
+    def record_rejected(self) -> None:
+        with self._lock:
+            self.rejected += 1
+
+    def record_failed(self) -> None:
+        with self._lock:
+            self.failed += 1
+
+    def record_started(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+
+    def record_finished(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def record_chunk_acquired(self, size: int) -> None:
+        with self._lock:
+            self.chunk_bytes_in_flight += size
+            if self.chunk_bytes_in_flight > self.peak_chunk_bytes_in_flight:
+                self.peak_chunk_bytes_in_flight = self.chunk_bytes_in_flight
+
+    def record_chunk_released(self, size: int) -> None:
+        with self._lock:
+            self.chunk_bytes_in_flight -= size
+
+    def record_upload(self, size: int, elapsed: float) -> float:
+        rate = size / elapsed if elapsed > 0 else 0.0
+        with self._lock:
+            self.uploads += 1
+            self.total_bytes += size
+            self.total_seconds += elapsed
+            self.last_bytes_per_sec = rate
+            self.peak_bytes_per_sec = max(self.peak_bytes_per_sec, rate)
+        return rate
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'uploads': self.uploads,
+                'rejected': self.rejected,
+                'failed': self.failed,
+                'in_flight': self.in_flight,
+                'total_bytes': self.total_bytes,
+                'avg_bytes_per_sec': round(self.total_bytes / self.total_seconds, 1) if self.total_seconds else 0.0,
+                'last_bytes_per_sec': round(self.last_bytes_per_sec, 1),
+                'peak_bytes_per_sec': round(self.peak_bytes_per_sec, 1),
+                'chunk_bytes_in_flight': self.chunk_bytes_in_flight,
+                'peak_chunk_bytes_in_flight': self.peak_chunk_bytes_in_flight,
+                'max_upload_bytes': UPLOAD_MAX_BYTES,
+            }
+
+
+upload_stats = UploadStats()
+
+
+# ========== 上传 ==========
+
+@dataclass
+class SavedUpload:
+    """上传结果"""
+    path: str  # 最终文件路径
+    size: int  # 文件大小（字节）
+    sha256: str  # 内容哈希
+    elapsed: float  # 耗时（秒）
+    bytes_per_sec: float  # 吞吐量
+
+
+def _open_temp(path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return open(path, 'wb')
+
+
+def _commit(f, tmp_path: str, dest_path: str) -> None:
+    """落盘并原子重命名"""
+    f.flush()
+    os.fsync(f.fileno())
+    f.close()
+    os.replace(tmp_path, dest_path)
+
+
+def _discard(f, tmp_path: str) -> None:
+    if not f.closed:
+        f.close()
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+
+async def save_upload(file: UploadFile, dest_path: str, max_bytes: Optional[int] = None) -> SavedUpload:
+    """
+    流式保存上传文件
+    先写入同目录下的临时文件，完成后原子重命名为 dest_path；
+    超过大小限制或写入失败时删除临时文件
+    """
+    max_bytes = max_bytes or UPLOAD_MAX_BYTES
+
+    # 已知大小时直接拒绝，避免无谓的读写
+    if file.size is not None and file.size > max_bytes:
+        upload_stats.record_rejected()
+        raise _too_large(max_bytes)
+
+    tmp_path = f"{dest_path}.{uuid.uuid4().hex}.part"
+    hasher = hashlib.sha256()
+    size = 0
+    started = time.perf_counter()
+
+    f = await asyncio.to_thread(_open_temp, tmp_path)
+    upload_stats.record_started()
+    try:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                upload_stats.record_rejected()
+                raise _too_large(max_bytes)
+
+            upload_stats.record_chunk_acquired(len(chunk))
+            try:
+                hasher.update(chunk)
+                await asyncio.to_thread(f.write, chunk)
+            finally:
+                upload_stats.record_chunk_released(len(chunk))
+
+        await asyncio.to_thread(_commit, f, tmp_path, dest_path)
+    except HTTPException:
+        await asyncio.to_thread(_discard, f, tmp_path)
+        raise
+    except Exception as e:
+        upload_stats.record_failed()
+        await asyncio.to_thread(_discard, f, tmp_path)
+        raise HTTPException(status_code=500, detail=f"文件保存失败: {str(e)}")
+    finally:
+        upload_stats.record_finished()
+
+    elapsed = time.perf_counter() - started
+    rate = upload_stats.record_upload(size, elapsed)
+    logger.info(f"上传完成 {os.path.basename(dest_path)}: {size} 字节, {elapsed * 1000:.1f} ms, {rate / 1024 / 1024:.2f} MB/s")
+
+    return SavedUpload(
+        path=dest_path,
+        size=size,
+        sha256=hasher.hexdigest(),
+        elapsed=elapsed,
+        bytes_per_sec=rate,
+    )
+
+
+# ========== 请求体大小限制 ==========
+
+class UploadSizeLimitMiddleware:
+    """
+    限制 multipart 上传请求体大小
+    在解析表单之前根据 Content-Length 拒绝，并在读取过程中计数，
+    防止超大请求先被完整写入临时文件
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: int = UPLOAD_MAX_REQUEST_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        content_type = headers.get(b"content-type", b"")
+        if not content_type.startswith(b"multipart/form-data"):
+            await self.app(scope, receive, send)
+            return
+
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_bytes:
+            upload_stats.record_rejected()
+            response = JSONResponse(
+                {"detail": f"请求体过大，最大支持 {self.max_bytes // (1024 * 1024)} MB"},
+                status_code=413
+            )
+            await response(scope, receive, send)
+            return
+
+        received = 0
+        max_bytes = self.max_bytes
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    upload_stats.record_rejected()
+                    raise HTTPException(status_code=413, detail=f"请求体过大，最大支持 {max_bytes // (1024 * 1024)} MB")
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,35 @@
+"""
+后台工作进程池
+CPU 密集型任务（Markdown 渲染、图片处理等）提交到进程池执行，避免阻塞事件循环
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Optional
+
+from config import WORKER_PROCESSES
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """获取全局进程池（首次使用时创建）"""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=WORKER_PROCESSES)
+    return _pool
+
+
+async def run_in_process(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """在进程池中执行函数，func 必须是模块级函数（可被 pickle）"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_pool(), functools.partial(func, *args, **kwargs))
+
+
+def shutdown_process_pool() -> None:
+    """关闭进程池（服务关闭时调用）"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -3,12 +3,37 @@ import Link from 'next/link'
 import { notFound } from 'next/navigation'
 import { getAllPostSlugs, getPostBySlug } from '@/lib/blog'
 import { AnimateIn } from '@/components/AnimateIn'
-import { ArrowLeft, Calendar, Clock, Tag } from 'lucide-react'
+import { ArrowLeft, ArrowRight, Calendar, Clock, Tag } from 'lucide-react'
+
+const API_BASE = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000'
 
 interface PageProps {
   params: { slug: string }
 }
 
+interface RelatedPost {
+  slug: string
+  title: string
+  date: string
+  description: string
+  tags: string[]
+  score: number
+}
+
+// 获取相关文章（后端预先计算，接口不可用时不显示）
+async function getRelatedPosts(slug: string): Promise<RelatedPost[]> {
+  try {
+    const response = await fetch(
+      `${API_BASE}/api/blog/articles/${encodeURIComponent(slug)}/related?limit=3`,
+      { next: { revalidate: 3600 } }
+    )
+    if (!response.ok) return []
+    return await response.json()
+  } catch {
+    return []
+  }
+}
+
 // 生成静态页面参数
 export async function generateStaticParams() {
   const slugs = getAllPostSlugs()
@@ -47,6 +72,8 @@ export default async function BlogPostPage({ params }: PageProps) {
     notFound()
   }
 
+  const relatedPosts = await getRelatedPosts(params.slug)
+
   return (
     <div className="container-main py-12 md:py-16">
       {/* 返回链接 */}
@@ -138,8 +165,48 @@ export default async function BlogPostPage({ params }: PageProps) {
         />
       </AnimateIn>
 
+      {/* 相关文章 */}
+      {relatedPosts.length > 0 && (
+        <AnimateIn delay={0.3}>
+          <section className="mt-12 pt-8 border-t border-neutral-200 dark:border-neutral-800">
+            <h2 className="text-xl font-semibold text-neutral-900 dark:text-neutral-50 mb-6">
+              相关文章
+            </h2>
+            <div className="grid gap-4 sm:grid-cols-3">
+              {relatedPosts.map((related) => (
+                <Link
+                  key={related.slug}
+                  href={`/blog/${related.slug}`}
+                  className="group flex flex-col p-4 rounded-lg border border-neutral-200 dark:border-neutral-800 hover:border-primary-300 dark:hover:border-primary-700 transition-colors"
+                >
+                  <span className="text-xs text-neutral-500 dark:text-neutral-400 mb-2">
+                    {new Date(related.date).toLocaleDateString('zh-CN', {
+                      year: 'numeric',
+                      month: 'long',
+                      day: 'numeric',
+                    })}
+                  </span>
+                  <span className="font-medium text-neutral-900 dark:text-neutral-100 group-hover:text-primary-600 dark:group-hover:text-primary-400 transition-colors line-clamp-2">
+                    {related.title}
+                  </span>
+                  {related.description && (
+                    <span className="mt-2 text-sm text-neutral-600 dark:text-neutral-400 line-clamp-2">
+                      {related.description}
+                    </span>
+                  )}
+                  <span className="mt-auto pt-3 inline-flex items-center gap-1 text-sm text-primary-600 dark:text-primary-400">
+                    阅读
+                    <ArrowRight className="w-3.5 h-3.5" />
+                  </span>
+                </Link>
+              ))}
+            </div>
+          </section>
+        </AnimateIn>
+      )}
+
       {/* 文章底部 */}
-      <AnimateIn delay={0.3}>
+      <AnimateIn delay={0.4}>
         <footer className="mt-12 pt-8 border-t border-neutral-200 dark:border-neutral-800">
           <div className="flex flex-col sm:flex-row items-center justify-between gap-4">
             <Link
@@ -12,6 +12,9 @@ interface PhotoImage {
   url: string
   is_cover: boolean
   order: number
+  width?: number | null
+  height?: number | null
+  placeholder?: string | null
 }
 
 interface Photo {
@@ -21,6 +24,9 @@ interface Photo {
   content: string | null
   date: string
   cover_image: string | null
+  cover_width?: number | null
+  cover_height?: number | null
+  cover_placeholder?: string | null
   images?: PhotoImage[]
 }
 
@@ -185,10 +191,25 @@ function FramedPicture({
       whileTap={{ scale: 0.98 }}
       onClick={onClick}
     >
-      {/* 图片容器 - 原图缩放，限制最大高度 */}
+      {/* 图片容器 - 原图缩放，限制最大高度；已知尺寸时预留空间并先显示低清占位图 */}
       <motion.img
         src={photo.cover_image || '/images/life/1.jpg'}
         alt={photo.title}
+        width={photo.cover_width ?? undefined}
+        height={photo.cover_height ?? undefined}
+        loading="lazy"
+        decoding="async"
+        style={
+          photo.cover_width && photo.cover_height
+            ? {
+                aspectRatio: `${photo.cover_width} / ${photo.cover_height}`,
+                backgroundImage: photo.cover_placeholder ? `url(${photo.cover_placeholder})` : undefined,
+                backgroundSize: 'contain',
+                backgroundPosition: 'center',
+                backgroundRepeat: 'no-repeat',
+              }
+            : undefined
+        }
         className="max-h-[300px] w-full object-contain mb-4"
         whileHover={{ scale: 1.02 }}
         transition={{ type: 'spring', stiffness: 200, damping: 20, mass: 1 }}